@@ -0,0 +1,186 @@
+import asyncio
+import os
+import random
+from typing import Awaitable, Callable, Optional
+import httpx
+import metrics
+from models import AirbnbListingImport
+
+# Hard caps whatever the caller asks for, to stay inside Beds24 rate limits
+AIRBNB_BULK_MAX_CHUNK = int(os.environ.get("AIRBNB_BULK_MAX_CHUNK", "50"))
+AIRBNB_BULK_MAX_CONCURRENCY = int(os.environ.get("AIRBNB_BULK_MAX_CONCURRENCY", "8"))
+AIRBNB_BULK_RETRY_BACKOFF = float(os.environ.get("AIRBNB_BULK_RETRY_BACKOFF", "1"))
+
+
+def listing_action(listing: AirbnbListingImport) -> dict:
+    action = {
+        "airbnbUserId": listing.airbnbUserId,
+        "airbnbListingId": listing.airbnbListingId,
+        "connect": "full"
+    }
+    if listing.propertyId:
+        action["action"] = "importToExistingProperty"
+        action["propertyId"] = listing.propertyId
+    else:
+        action["action"] = "importAsNewProperty"
+    return action
+
+
+def _item_result(index: int, listing: AirbnbListingImport, status: str, attempts: int, **details) -> dict:
+    return {
+        "index": index,
+        "airbnbUserId": listing.airbnbUserId,
+        "airbnbListingId": listing.airbnbListingId,
+        "propertyId": listing.propertyId,
+        "status": status,
+        "attempts": attempts,
+        **details
+    }
+
+
+class ImportToken:
+    """
+    The access token an import sends. When Beds24 rejects it mid-stream it is
+    renewed once for the whole import, however many chunks saw it rejected.
+    """
+
+    def __init__(self, token: str, refresh: Optional[Callable[[], Awaitable[str]]] = None):
+        self.current = token
+        self._refresh = refresh
+        self._renewal: Optional[asyncio.Task] = None
+
+    async def renew(self, rejected: str) -> Optional[str]:
+        # None when there is nothing left to try: no way to refresh, or the renewed token was rejected too
+        if rejected != self.current:
+            return self.current
+        if self._refresh is None or (self._renewal is not None and self._renewal.done()):
+            return None
+        if self._renewal is None:
+            self._renewal = asyncio.create_task(self._renew())
+        return await asyncio.shield(self._renewal)
+
+    async def _renew(self) -> str:
+        self.current = await self._refresh()
+        metrics.counter("airbnb_bulk_token_renewals").inc()
+        return self.current
+
+    def cancel(self):
+        if self._renewal is not None:
+            self._renewal.cancel()
+
+
+async def _send(api, token: str, remaining: list) -> httpx.Response:
+    headers = {"accept": "application/json", "token": token, "Content-Type": "application/json"}
+    # Retried here per item, a client-level retry would resend the whole chunk on top
+    return await api.post(
+        "/channels/airbnb", "airbnb_bulk_import",
+        headers=headers,
+        json=[listing_action(listing) for _, listing in remaining],
+        retries=0
+    )
+
+
+async def _import_chunk(api, token: ImportToken, chunk: list, max_attempts: int, results: asyncio.Queue):
+    # chunk holds (index, listing) pairs; only items Beds24 reported as failed
+    # are sent again, so succeeded listings are never imported twice.
+    remaining = chunk
+    for attempt in range(1, max_attempts + 1):
+        sent = token.current
+        try:
+            response = await _send(api, sent, remaining)
+            if response.status_code == 401:
+                # Rejected before processing, sent once more with a renewed token
+                renewed = await token.renew(sent)
+                if renewed is not None:
+                    response = await _send(api, renewed, remaining)
+        except httpx.ConnectError as e:
+            # Never reached Beds24, safe to send again
+            if attempt == max_attempts:
+                for index, listing in remaining:
+                    await results.put(_item_result(index, listing, "error", attempt, error=str(e)))
+                return
+            response = None
+        except httpx.TransportError as e:
+            # The request may or may not have been applied, retrying could duplicate properties
+            for index, listing in remaining:
+                await results.put(_item_result(index, listing, "unknown", attempt, error=str(e)))
+            return
+        retry = []
+        if response is None:
+            retry = remaining
+        elif response.status_code == 200:
+            body = response.json()
+            items = body if isinstance(body, list) else [body] * len(remaining)
+            for (index, listing), item in zip(remaining, items):
+                if isinstance(item, dict) and item.get("success") is False:
+                    if attempt < max_attempts:
+                        retry.append((index, listing))
+                    else:
+                        await results.put(_item_result(index, listing, "error", attempt, details=item))
+                else:
+                    await results.put(_item_result(index, listing, "success", attempt, details=item))
+            for index, listing in remaining[len(items):]:
+                await results.put(_item_result(index, listing, "error", attempt, error="No result returned for this listing"))
+        elif response.status_code == 429:
+            # Rejected before processing, safe to send again
+            if attempt < max_attempts:
+                retry = remaining
+            else:
+                for index, listing in remaining:
+                    await results.put(_item_result(index, listing, "error", attempt, error=response.text))
+        elif response.status_code >= 500:
+            # Beds24 may have created some properties before failing, like a transport error
+            for index, listing in remaining:
+                await results.put(_item_result(index, listing, "unknown", attempt, error=response.text))
+        else:
+            for index, listing in remaining:
+                await results.put(_item_result(index, listing, "error", attempt, error=response.text))
+        if not retry:
+            return
+        metrics.counter("airbnb_bulk_item_retries").inc(len(retry))
+        remaining = retry
+        await asyncio.sleep(random.uniform(0, AIRBNB_BULK_RETRY_BACKOFF * 2 ** attempt))
+
+
+async def import_listings(api, token: str, listings: list, chunk_size: int, concurrency: int, max_attempts: int, refresh: Optional[Callable[[], Awaitable[str]]] = None):
+    """
+    Sends the listings to /channels/airbnb in chunks, several chunks at a time,
+    and yields one result per listing as soon as its chunk answers, followed
+    by a summary. `refresh` returns a new access token when the one in use is
+    rejected.
+    """
+    token = ImportToken(token, refresh)
+    chunk_size = max(1, min(chunk_size, AIRBNB_BULK_MAX_CHUNK))
+    semaphore = asyncio.Semaphore(max(1, min(concurrency, AIRBNB_BULK_MAX_CONCURRENCY)))
+    results = asyncio.Queue()
+    reported = set()
+    indexed = list(enumerate(listings))
+    chunks = [indexed[i:i + chunk_size] for i in range(0, len(indexed), chunk_size)]
+
+    async def run(chunk):
+        async with semaphore:
+            try:
+                await _import_chunk(api, token, chunk, max(1, max_attempts), results)
+            except Exception as e:
+                # Don't leave the stream waiting on listings that will never report
+                print(f"Error importing Airbnb listings chunk: {e}")
+                for index, listing in chunk:
+                    if index not in reported:
+                        await results.put(_item_result(index, listing, "error", 0, error=str(e)))
+
+    tasks = [asyncio.create_task(run(chunk)) for chunk in chunks]
+    summary = {"total": len(listings), "success": 0, "error": 0, "unknown": 0}
+    try:
+        while len(reported) < len(listings):
+            result = await results.get()
+            if result["index"] in reported:
+                continue
+            reported.add(result["index"])
+            summary[result["status"]] += 1
+            yield result
+    finally:
+        for task in tasks:
+            task.cancel()
+        token.cancel()
+    metrics.counter("airbnb_bulk_items").inc(len(listings))
+    yield {"summary": summary}
@@ -0,0 +1,92 @@
+import datetime
+import os
+from datetime import timezone
+from typing import Optional
+import metrics
+
+# Upper bound on how long a captured login is replayed, even if Beds24 cookies
+# claim to live longer.
+AUTH_STATE_TTL = datetime.timedelta(hours=float(os.environ.get("AUTH_STATE_TTL_HOURS", "12")))
+# Cookies naming the server-side session, which holds the account picked with
+# "Log into Account"; every replaying context must start its own.
+AUTH_STATE_SERVER_SESSION_COOKIES = {
+    name.strip() for name in os.environ.get("AUTH_STATE_SERVER_SESSION_COOKIES", "PHPSESSID").split(",") if name.strip()
+}
+
+
+def shareable_state(storage_state: dict) -> dict:
+    """The storage_state without server-session cookies, safe to replay into several contexts at once."""
+    cookies = [
+        cookie for cookie in storage_state.get("cookies", [])
+        if cookie.get("name") not in AUTH_STATE_SERVER_SESSION_COOKIES
+        # Browser-session cookies (no expiry) belong to that one browsing session too
+        and not ("beds24" in cookie.get("domain", "") and (cookie.get("expires") or -1) <= 0)
+    ]
+    return {**storage_state, "cookies": cookies}
+
+
+class AuthStateCache:
+    """
+    Playwright storage_state per Beds24 identity, kept in memory and mirrored
+    to MongoDB so other workers and restarts can replay the login. Only the
+    persistent login cookies are kept: each replay gets its own server
+    session, so switching the account in one session leaves the others alone.
+    """
+
+    def __init__(self, collection, ttl: datetime.timedelta = AUTH_STATE_TTL):
+        self.collection = collection
+        self.ttl = ttl
+        self._states = {}
+
+    def _expiry(self, storage_state: dict) -> datetime.datetime:
+        # Earliest expiry of a persistent beds24 cookie, capped by the TTL
+        expires_at = datetime.datetime.now(timezone.utc) + self.ttl
+        for cookie in storage_state.get("cookies", []):
+            expires = cookie.get("expires", -1)
+            if "beds24" in cookie.get("domain", "") and expires and expires > 0:
+                expires_at = min(expires_at, datetime.datetime.fromtimestamp(expires, tz=timezone.utc))
+        return expires_at
+
+    async def get(self, identity: str) -> Optional[dict]:
+        entry = self._states.get(identity)
+        if entry is None:
+            try:
+                doc = await self.collection.find_one({"_id": identity})
+            except Exception as e:
+                print(f"Error reading auth state for {identity}: {e}")
+                doc = None
+            if doc:
+                entry = {
+                    "storage_state": doc["storage_state"],
+                    "expires_at": doc["expires_at"].replace(tzinfo=timezone.utc)
+                }
+                self._states[identity] = entry
+        if entry and entry["expires_at"] > datetime.datetime.now(timezone.utc):
+            metrics.counter("auth_state_cache_hits").inc()
+            # Entries saved before server-session cookies were stripped
+            return shareable_state(entry["storage_state"])
+        if entry:
+            metrics.counter("auth_state_cache_expired").inc()
+            await self.invalidate(identity)
+        metrics.counter("auth_state_cache_misses").inc()
+        return None
+
+    async def put(self, identity: str, storage_state: dict):
+        storage_state = shareable_state(storage_state)
+        entry = {"storage_state": storage_state, "expires_at": self._expiry(storage_state)}
+        self._states[identity] = entry
+        try:
+            await self.collection.update_one(
+                {"_id": identity},
+                {"$set": {**entry, "updated_at": datetime.datetime.now(timezone.utc)}},
+                upsert=True
+            )
+        except Exception as e:
+            print(f"Error saving auth state for {identity}: {e}")
+
+    async def invalidate(self, identity: str):
+        self._states.pop(identity, None)
+        try:
+            await self.collection.delete_one({"_id": identity})
+        except Exception as e:
+            print(f"Error deleting auth state for {identity}: {e}")
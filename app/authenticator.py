@@ -1,13 +1,9 @@
 # import asyncio
 import random
 # import time
-import traceback
 # import bezier
-import imapclient
 # import numpy as np
-import pyzmail
-from datetime import datetime, timedelta, timezone
-import re
+import otp_fetcher
 from dotenv import load_dotenv
 # import os
 
@@ -65,71 +61,5 @@ async def move_mouse_naturally(page, frame, target_selector):
         await human_like_delay()
 
 async def check_gmail(username, app_password):
-    dt = datetime.now()
-    try:
-        # Connect to the Gmail IMAP server
-        server = imapclient.IMAPClient('imap.gmail.com', ssl=True)
-        server.login(username, app_password)
-        
-        # Select the inbox
-        server.select_folder('INBOX')
-        
-        # Search for the most recent 50 emails (both seen and unseen)
-        messages = server.search(['ALL'])
-        messages = messages[-50:]  # Limit to the most recent 50 emails
-        
-        # Fetch the email details
-        response = server.fetch(messages, ['BODY.PEEK[]', 'FLAGS'])
-        
-        emails = []
-        for msgid, data in response.items():
-            email_message = pyzmail.PyzMessage.factory(data[b'BODY[]'])
-            sender = email_message.get_address('from')[1]
-            if sender in ['ticket@beds24.com', 'support@beds24.com']:
-                body = None
-                if email_message.text_part:
-                    body = email_message.text_part.get_payload().decode(email_message.text_part.charset)
-                elif email_message.html_part:
-                    body = email_message.html_part.get_payload().decode(email_message.html_part.charset)
-                
-                emails.append({
-                    'subject': email_message.get_subject(),
-                    'from': sender,
-                    'to': email_message.get_address('to'),
-                    'date': email_message.get('date'),
-                    'body': body
-                })
-        # Filter emails received within the past 15 minutes
-        philippine_timezone = timezone(timedelta(hours=8))
-        now = datetime.now(philippine_timezone)
-        twenty_four_hours_ago = now - timedelta(minutes=5)
-        recent_emails = [email for email in emails if datetime.strptime(email['date'], '%a, %d %b %Y %H:%M:%S %z').astimezone(philippine_timezone) > twenty_four_hours_ago]
-        if not recent_emails or len(recent_emails) == 0:
-            return {"status": "error", "message": "No recent emails found."}
-        # Sort emails by date in descending order
-        recent_emails.sort(key=lambda x: datetime.strptime(x['date'], '%a, %d %b %Y %H:%M:%S %z'), reverse=True)
-        
-        # Get the most recent email
-        most_recent_email = recent_emails[0] if recent_emails else None
-
-        login_code = None
-        if most_recent_email and most_recent_email['body']:
-            if most_recent_email['from'] == 'support@beds24.com':
-                match = re.search(r'Your login code for account \S+ is (\d+)', most_recent_email['body'])
-                login_code = match.group(1) if match else None
-            elif most_recent_email['from'] == 'ticket@beds24.com':
-                match = re.search(r'https://beds24\.com/control2\.php\?logincode=\w+', most_recent_email['body'])
-                login_code = match.group(0) if match else None
-                
-
-        # Logout from the server
-        server.logout()
-        
-        if most_recent_email:
-            return {"status":"success", "code": login_code, "sender": most_recent_email['from']}
-        else:
-            return {"status":"error", "code": None, "sender": None}
-    except Exception as e:
-        traceback.print_exc()
-        print("An error occurred:", e)
-        return {"status": "error", "message": str(e)}
+    # Waits for the next login code on the inbox's shared IMAP connection
+    return await otp_fetcher.get_fetcher(username, app_password).wait_for_code()
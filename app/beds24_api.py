@@ -0,0 +1,92 @@
+import asyncio
+import os
+import random
+import time
+from typing import Optional
+import httpx
+import metrics
+
+BEDS24_API_URL = os.environ.get("BEDS24_API_URL", "https://beds24.com/api/v2")
+BEDS24_API_TIMEOUT = float(os.environ.get("BEDS24_API_TIMEOUT", "30"))
+BEDS24_API_CONNECT_TIMEOUT = float(os.environ.get("BEDS24_API_CONNECT_TIMEOUT", "10"))
+BEDS24_API_MAX_CONNECTIONS = int(os.environ.get("BEDS24_API_MAX_CONNECTIONS", "20"))
+BEDS24_API_MAX_KEEPALIVE = int(os.environ.get("BEDS24_API_MAX_KEEPALIVE", "10"))
+BEDS24_API_RETRIES = int(os.environ.get("BEDS24_API_RETRIES", "3"))
+BEDS24_API_BACKOFF = float(os.environ.get("BEDS24_API_BACKOFF", "0.5"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class Beds24ApiClient:
+    """
+    One pooled HTTP/2 client for every Beds24 API v2 call of this worker, so
+    requests reuse warm connections instead of a TCP+TLS handshake each.
+    """
+
+    def __init__(self, base_url: str = BEDS24_API_URL):
+        self.base_url = base_url
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _create(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=BEDS24_API_MAX_CONNECTIONS,
+                max_keepalive_connections=BEDS24_API_MAX_KEEPALIVE
+            ),
+            timeout=httpx.Timeout(BEDS24_API_TIMEOUT, connect=BEDS24_API_CONNECT_TIMEOUT)
+        )
+
+    async def start(self):
+        if self._client is None:
+            self._client = self._create()
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = self._create()
+        return self._client
+
+    def _delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        # Full jitter exponential backoff
+        return random.uniform(0, BEDS24_API_BACKOFF * 2 ** attempt)
+
+    async def request(self, method: str, path: str, endpoint: str, idempotent: bool = True, retries: Optional[int] = None, **kwargs) -> httpx.Response:
+        # Non-idempotent calls (imports) are only retried when Beds24 clearly
+        # did not process them: 429 or a connection that never opened.
+        # retries=0 leaves retrying to callers that do their own.
+        retries = BEDS24_API_RETRIES if retries is None else retries
+        for attempt in range(retries + 1):
+            start = time.perf_counter()
+            try:
+                response = await self.client.request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                metrics.counter(f"beds24_api_transport_errors.{endpoint}").inc()
+                retryable = idempotent or isinstance(e, httpx.ConnectError)
+                if not retryable or attempt == retries:
+                    raise
+                await asyncio.sleep(self._delay(attempt))
+                continue
+            metrics.histogram(f"beds24_api_ms.{endpoint}").observe((time.perf_counter() - start) * 1000)
+            retryable = response.status_code == 429 or (idempotent and response.status_code in RETRY_STATUSES)
+            if not retryable or attempt == retries:
+                if response.status_code >= 400:
+                    metrics.counter(f"beds24_api_errors.{endpoint}").inc()
+                return response
+            metrics.counter(f"beds24_api_retries.{endpoint}").inc()
+            await asyncio.sleep(self._delay(attempt, response))
+
+    async def get(self, path: str, endpoint: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, endpoint, **kwargs)
+
+    async def post(self, path: str, endpoint: str, idempotent: bool = False, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, endpoint, idempotent=idempotent, **kwargs)
@@ -0,0 +1,92 @@
+"""
+Per-page table extraction time and memory, original per-table BeautifulSoup
+parsing against the single-pass backends of html_tables.
+
+    python benchmarks/bench_html_tables.py [--repeat 50]
+
+Run from the app directory. Memory is the tracemalloc peak, which only sees
+Python allocations: lxml and selectolax build their trees in C, so their
+figure understates the real footprint.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+import html_tables  # noqa: E402
+from fixtures import AIRBNB_VIEW_TABLES, fixture_pages  # noqa: E402
+
+
+def legacy_parse_table(table_html: str) -> dict:
+    # parse_table as it was before html_tables
+    soup = BeautifulSoup(table_html, "html.parser")
+    data = {}
+    rows = soup.find_all("tr")[1:]
+    for row in rows:
+        cols = row.find_all("td")
+        if len(cols) >= 3:
+            data[cols[0].text.strip()] = cols[2].text.strip()
+    return data
+
+
+def legacy_inner_html(page: str) -> dict:
+    # What element.inner_html() used to hand over, one string per table
+    soup = BeautifulSoup(page, "html.parser")
+    found = {}
+    for key, selector in AIRBNB_VIEW_TABLES.items():
+        table = soup.select_one(selector)
+        if table is not None:
+            found[key] = table.decode_contents()
+    return found
+
+
+def measure(run, repeat: int):
+    run()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    result = run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, statistics.median(timings), min(timings), peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    backends = []
+    for name in html_tables.BACKENDS:
+        try:
+            html_tables.get_backend(name)
+            backends.append(name)
+        except ImportError:
+            print(f"skipping {name}: not installed")
+
+    print(f"{'page':<18} {'KiB':>6} {'method':<22} {'median ms':>10} {'min ms':>8} {'peak KiB':>9} {'same':>5}")
+    for page_name, page in fixture_pages().items():
+        tables_html = legacy_inner_html(page)
+        runs = {"legacy bs4 per table": lambda: {key: legacy_parse_table(html) for key, html in tables_html.items()}}
+        for name in backends:
+            runs[f"{name} single pass"] = lambda name=name: html_tables.extract_tables(page, AIRBNB_VIEW_TABLES, name)
+        expected = None
+        for method, run in runs.items():
+            result, median, fastest, peak = measure(run, args.repeat)
+            expected = result if expected is None else expected
+            print(
+                f"{page_name:<18} {len(page) // 1024:>6} {method:<22} {median:>10.2f} {fastest:>8.2f} "
+                f"{peak // 1024:>9} {'yes' if result == expected else 'NO':>5}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Event loop lag and wall time while the fixture pages are parsed concurrently
+through loop_monitor.run_cpu, on the blocking thread pool (CPU_POOL_SIZE=0)
+against process pools of a few sizes.
+
+    python benchmarks/bench_run_cpu.py [--requests 64] [--pools 0,1,2,4]
+
+Run from the app directory. Lag is how late a 10 ms heartbeat wakes up while
+the parses run: a thread parsing holds the GIL, so the loop stalls with it.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import html_tables  # noqa: E402
+import loop_monitor  # noqa: E402
+from fixtures import AIRBNB_VIEW_TABLES, fixture_pages  # noqa: E402
+
+HEARTBEAT = 0.01
+
+
+async def heartbeat(lags: list):
+    while True:
+        expected = time.monotonic() + HEARTBEAT
+        await asyncio.sleep(HEARTBEAT)
+        lags.append(max(0.0, time.monotonic() - expected) * 1000)
+
+
+async def run(pool_size: int, pages: list, requests: int):
+    loop_monitor.CPU_POOL_SIZE = pool_size
+    loop_monitor.start_executors()
+    try:
+        # Start the workers outside the measurement
+        await asyncio.gather(*(loop_monitor.run_cpu(html_tables.extract_tables, page, AIRBNB_VIEW_TABLES) for page in pages))
+        lags = []
+        beat = asyncio.create_task(heartbeat(lags))
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            loop_monitor.run_cpu(html_tables.extract_tables, pages[i % len(pages)], AIRBNB_VIEW_TABLES)
+            for i in range(requests)
+        ))
+        wall = (time.perf_counter() - start) * 1000
+        beat.cancel()
+    finally:
+        loop_monitor.shutdown_executors()
+    return wall, statistics.median(lags or [0]), max(lags or [0])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--pools", default="0,1,2,4")
+    args = parser.parse_args()
+
+    pages = list(fixture_pages().values())
+    print(f"{'pool':<12} {'wall ms':>9} {'median lag ms':>14} {'max lag ms':>11}")
+    for pool_size in (int(size) for size in args.pools.split(",")):
+        wall, median, worst = asyncio.run(run(pool_size, pages, args.requests))
+        label = "threads" if pool_size <= 0 else f"{pool_size} processes"
+        print(f"{label:<12} {wall:>9.1f} {median:>14.2f} {worst:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
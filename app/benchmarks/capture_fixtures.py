@@ -0,0 +1,47 @@
+"""
+Saves Beds24 Airbnb view pages into benchmarks/fixtures/ for
+bench_html_tables.py, using a logged-in Playwright storage state such as a
+session's storage_state document from MongoDB.
+
+    python benchmarks/capture_fixtures.py state.json 533105 [room_id ...]
+
+Run from the app directory. The pages hold account data, read them before
+committing.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from playwright.async_api import async_playwright  # noqa: E402
+from fixtures import AIRBNB_VIEW_TABLES, FIXTURES_DIR  # noqa: E402
+
+
+async def capture(storage_state: str, room_ids: list):
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch()
+        context = await browser.new_context(storage_state=storage_state)
+        page = await context.new_page()
+        for room_id in room_ids:
+            await page.goto(f"https://beds24.com/control3.php?pagetype=syncroniserairbnbview&id={room_id}")
+            await page.wait_for_selector(next(iter(AIRBNB_VIEW_TABLES.values())))
+            path = os.path.join(FIXTURES_DIR, f"airbnb_view_{room_id}.html")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(await page.content())
+            print(f"saved {path}")
+        await browser.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("storage_state")
+    parser.add_argument("room_ids", nargs="+")
+    args = parser.parse_args()
+    asyncio.run(capture(args.storage_state, args.room_ids))
+
+
+if __name__ == "__main__":
+    main()
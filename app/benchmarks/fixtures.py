@@ -0,0 +1,64 @@
+import glob
+import os
+import random
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+MAIN = "body > div.container-fluid.b24container-fluid > div > main"
+AIRBNB_VIEW_TABLES = {
+    "listingdetails": f"{MAIN} > table:nth-child(13)",
+    "listingdescriptions": f"{MAIN} > table:nth-child(17)",
+    "priceandavailability": f"{MAIN} > table:nth-child(25)",
+    "listingrooms": f"{MAIN} > table:nth-child(29)",
+    "listingpictures": f"{MAIN} > table:nth-child(33)",
+}
+
+
+def _table(rows: int, rng: random.Random) -> str:
+    body = ["<tr><th>Setting</th><th>Beds24</th><th>Airbnb</th></tr>"]
+    for i in range(rows):
+        text = " ".join(rng.choice(("lorem", "ipsum", "dolor", "sit", "amet", "beds", "guest")) for _ in range(rng.randint(2, 40)))
+        body.append(
+            f'<tr><td class="setting">Field {i}</td><td><span>{text}</span></td>'
+            f'<td><div class="value">{text}</div></td><td><a href="#">edit</a></td></tr>'
+        )
+    return f'<table class="table table-sm">{"".join(body)}</table>'
+
+
+def synthetic_view_page(rows_per_table: int = 20, seed: int = 0) -> str:
+    """
+    A page shaped like syncroniserairbnbview: the content tables sit at the
+    nth-child positions the endpoints select, between headings and forms.
+    """
+    rng = random.Random(seed)
+    table_positions = {13, 17, 25, 29, 33}
+    children = []
+    for position in range(1, 41):
+        if position in table_positions:
+            children.append(_table(rows_per_table, rng))
+        elif position % 4 == 0:
+            children.append(f'<form method="post"><select name="s{position}">' + "".join(
+                f'<option value="{i}">Option {i}</option>' for i in range(30)
+            ) + "</select></form>")
+        else:
+            children.append(f"<h3>Section {position}</h3>" if position % 2 else f"<div><p>{'text ' * 50}</p></div>")
+    scripts = "".join(f'<script src="/js/lib{i}.js"></script>' for i in range(10))
+    return (
+        f"<!DOCTYPE html><html><head><title>Beds24</title>{scripts}</head><body>"
+        f'<nav class="navbar">{"<a href=#>menu</a>" * 80}</nav>'
+        f'<div class="container-fluid b24container-fluid"><div><main>{"".join(children)}</main></div></div>'
+        "</body></html>"
+    )
+
+
+def fixture_pages() -> dict:
+    # Saved pages (e.g. from page.content()) in fixtures/ take part too
+    pages = {
+        "synthetic_small": synthetic_view_page(rows_per_table=10),
+        "synthetic_medium": synthetic_view_page(rows_per_table=40),
+        "synthetic_large": synthetic_view_page(rows_per_table=200),
+    }
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            pages[os.path.splitext(os.path.basename(path))[0]] = f.read()
+    return pages
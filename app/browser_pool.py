@@ -0,0 +1,178 @@
+import asyncio
+import os
+from typing import Callable, Optional
+from playwright.async_api import async_playwright, Browser, BrowserContext, Playwright
+
+# Number of long-lived Chromium processes per worker and how many session
+# contexts each of them may host before placement moves on to the next one.
+BROWSER_POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", "2"))
+BROWSER_POOL_MAX_CONTEXTS = int(os.environ.get("BROWSER_POOL_MAX_CONTEXTS", "25"))
+BROWSER_LAUNCH_TIMEOUT = int(os.environ.get("BROWSER_LAUNCH_TIMEOUT", "300000"))
+
+
+class BrowserPoolExhausted(Exception):
+    pass
+
+
+class BrowserPool:
+    """
+    Shares a single Playwright driver and a handful of Chromium processes
+    between all sessions. Every session gets its own isolated BrowserContext.
+    """
+
+    def __init__(self, size: int = BROWSER_POOL_SIZE, max_contexts: int = BROWSER_POOL_MAX_CONTEXTS):
+        self.size = size
+        self.max_contexts = max_contexts
+        self.playwright: Optional[Playwright] = None
+        # headless flag -> browsers launched in that mode
+        self._browsers: dict[bool, list[Browser]] = {True: [], False: []}
+        self._contexts: dict[Browser, set[BrowserContext]] = {}
+        self._pending: dict[Browser, int] = {}
+        self._lock = asyncio.Lock()
+        # Launches in progress per headless flag, they count towards the pool size
+        self._launching: dict[bool, int] = {True: 0, False: 0}
+        self._launched = asyncio.Condition(self._lock)
+        self._stopping = False
+        # Called with the dead Browser so owners of its contexts can drop them
+        self.on_browser_crash: Optional[Callable[[Browser], None]] = None
+
+    async def start(self):
+        self.playwright = await async_playwright().start()
+        async with self._lock:
+            self._launching[True] += self.size
+        await asyncio.gather(*(self._launch(headless=True) for _ in range(self.size)))
+
+    async def stop(self):
+        self._stopping = True
+        for browsers in self._browsers.values():
+            for browser in list(browsers):
+                try:
+                    await browser.close()
+                except Exception as e:
+                    print(f"Error closing pooled browser: {e}")
+        self._browsers = {True: [], False: []}
+        self._contexts.clear()
+        self._pending.clear()
+        if self.playwright:
+            await self.playwright.stop()
+            self.playwright = None
+
+    async def _launch(self, headless: bool, place: bool = False) -> Browser:
+        # Runs with a slot reserved in _launching; Chromium starts without holding the
+        # lock so placements on the running browsers go on meanwhile
+        try:
+            browser = await self.playwright.chromium.launch(
+                headless=headless,
+                args=["--no-sandbox"],
+                timeout=BROWSER_LAUNCH_TIMEOUT
+            )
+        except BaseException:
+            async with self._lock:
+                self._launching[headless] -= 1
+                self._launched.notify_all()
+            raise
+        async with self._lock:
+            self._launching[headless] -= 1
+            self._launched.notify_all()
+            if not self._stopping:
+                browser.on("disconnected", self._on_disconnected)
+                self._browsers[headless].append(browser)
+                self._contexts[browser] = set()
+                self._pending[browser] = 1 if place else 0
+                return browser
+        await browser.close()
+        raise BrowserPoolExhausted("Browser pool is stopping")
+
+    def _load(self, browser: Browser) -> int:
+        return len(self._contexts.get(browser, ())) + self._pending.get(browser, 0)
+
+    def _on_disconnected(self, browser: Browser):
+        headless = browser in self._browsers[True]
+        for browsers in self._browsers.values():
+            if browser in browsers:
+                browsers.remove(browser)
+        self._contexts.pop(browser, None)
+        self._pending.pop(browser, None)
+        if self._stopping:
+            return
+        print("Pooled browser disconnected, recycling it")
+        if self.on_browser_crash:
+            try:
+                self.on_browser_crash(browser)
+            except Exception as e:
+                print(f"Error handling browser crash: {e}")
+        if headless:
+            asyncio.create_task(self._replace())
+
+    async def _replace(self):
+        async with self._lock:
+            if self._stopping or len(self._browsers[True]) + self._launching[True] >= self.size:
+                return
+            self._launching[True] += 1
+        try:
+            await self._launch(headless=True)
+        except Exception as e:
+            print(f"Error relaunching pooled browser: {e}")
+
+    async def _place(self, headless: bool) -> Browser:
+        # Least-loaded placement among connected browsers with spare capacity,
+        # launching a new one only when all existing browsers are full.
+        async with self._lock:
+            while True:
+                candidates = [
+                    browser for browser in self._browsers[headless]
+                    if browser.is_connected() and self._load(browser) < self.max_contexts
+                ]
+                if candidates:
+                    browser = min(candidates, key=self._load)
+                    self._pending[browser] += 1
+                    return browser
+                if len(self._browsers[headless]) + self._launching[headless] < self.size:
+                    self._launching[headless] += 1
+                    break
+                if not self._launching[headless]:
+                    raise BrowserPoolExhausted("All pooled browsers are at their context limit")
+                # Every slot is taken or starting, the browser being launched may have room
+                await self._launched.wait()
+        return await self._launch(headless=headless, place=True)
+
+    async def new_context(self, headless: bool = True, **kwargs) -> tuple[Browser, BrowserContext]:
+        browser = await self._place(headless)
+        try:
+            context = await browser.new_context(**kwargs)
+        finally:
+            if browser in self._pending:
+                self._pending[browser] -= 1
+        if browser in self._contexts:
+            self._contexts[browser].add(context)
+            context.on("close", lambda ctx: self._contexts.get(browser, set()).discard(ctx))
+        return browser, context
+
+    async def release(self, context: BrowserContext):
+        for contexts in self._contexts.values():
+            contexts.discard(context)
+        try:
+            await context.close()
+        except Exception as e:
+            print(f"Error closing browser context: {e}")
+
+    def browsers(self) -> list[Browser]:
+        return [browser for browsers in self._browsers.values() for browser in browsers if browser.is_connected()]
+
+    def is_headless(self, browser: Browser) -> bool:
+        return browser not in self._browsers[False]
+
+    def stats(self) -> dict:
+        return {
+            "browsers": [
+                {
+                    "headless": headless,
+                    "connected": browser.is_connected(),
+                    "contexts": self._load(browser)
+                }
+                for headless, browsers in self._browsers.items()
+                for browser in browsers
+            ],
+            "size": self.size,
+            "max_contexts_per_browser": self.max_contexts
+        }
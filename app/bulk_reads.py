@@ -0,0 +1,63 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable
+import metrics
+
+# Hard cap on pages opened in one session for a bulk read
+BULK_READ_MAX_CONCURRENCY = int(os.environ.get("BULK_READ_MAX_CONCURRENCY", "6"))
+
+
+async def read_rooms(context, room_ids: list, reader: Callable[..., Awaitable[dict]], concurrency: int, flow: str):
+    """
+    Reads every room with `reader(page, room_id)` on a few extra pages of the
+    session's context (they share its login) and yields one result per room
+    as soon as it is read, followed by a summary.
+    """
+    queue = asyncio.Queue()
+    for index, room_id in enumerate(room_ids):
+        queue.put_nowait((index, room_id))
+    results = asyncio.Queue()
+    workers = min(max(1, min(concurrency, BULK_READ_MAX_CONCURRENCY)), len(room_ids))
+
+    async def work():
+        page = await context.new_page()
+        try:
+            while not queue.empty():
+                index, room_id = queue.get_nowait()
+                start = time.perf_counter()
+                try:
+                    values = await reader(page, room_id)
+                    result = {"index": index, "room_id": room_id, "status": "success", "values": values}
+                except Exception as e:
+                    print(f"Error reading room {room_id}: {e}")
+                    result = {"index": index, "room_id": room_id, "status": "error", "error": str(e)}
+                metrics.histogram(f"bulk_read_room_ms.{flow}").observe((time.perf_counter() - start) * 1000)
+                await results.put(result)
+        finally:
+            await page.close()
+
+    async def run():
+        # A worker that could not open its page leaves its rooms to the others,
+        # unless none could, then the remaining rooms are reported as failed
+        outcomes = await asyncio.gather(*(work() for _ in range(workers)), return_exceptions=True)
+        failures = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+        while not queue.empty():
+            index, room_id = queue.get_nowait()
+            await results.put({"index": index, "room_id": room_id, "status": "error", "error": str(failures[0])})
+
+    task = asyncio.create_task(run())
+    summary = {"total": len(room_ids), "success": 0, "error": 0}
+    start = time.perf_counter()
+    try:
+        for _ in range(len(room_ids)):
+            result = await results.get()
+            summary[result["status"]] += 1
+            yield result
+        # Let the workers close their pages
+        await task
+    finally:
+        task.cancel()
+    summary["elapsed_ms"] = round((time.perf_counter() - start) * 1000)
+    metrics.counter(f"bulk_read_rooms.{flow}").inc(len(room_ids))
+    yield {"summary": summary}
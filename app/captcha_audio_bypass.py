@@ -4,6 +4,7 @@ from openai import OpenAI
 import os
 import requests
 from dotenv import load_dotenv
+from loop_monitor import run_blocking
 import uuid
 
 load_dotenv()
@@ -19,9 +20,10 @@ class BypassAudioCaptcha:
         return f"{base_name}_{random_string}.{extension}"
 
     async def run(self):
-        self.download_audio()
-        text = self.transcribe_audio()
-        os.remove(self.audio_file_path)
+        # requests and the OpenAI client are synchronous, keep them off the event loop
+        await run_blocking(self.download_audio)
+        text = await run_blocking(self.transcribe_audio)
+        await run_blocking(os.remove, self.audio_file_path)
         return text
     
     def download_audio(self):
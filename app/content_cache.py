@@ -0,0 +1,140 @@
+import datetime
+import os
+import time
+from collections import OrderedDict
+from datetime import timezone
+from typing import Optional
+from pymongo.errors import DuplicateKeyError
+import metrics
+
+CONTENT_CACHE_TTL = float(os.environ.get("CONTENT_CACHE_TTL", "300"))
+CONTENT_CACHE_SIZE = int(os.environ.get("CONTENT_CACHE_SIZE", "1000"))
+# Share cached reads between workers through MongoDB, required as soon as more than one
+# worker (or pod) serves the same accounts: a local cache can't see other workers' invalidations
+CONTENT_CACHE_MONGO = os.environ.get(
+    "CONTENT_CACHE_MONGO", "true" if int(os.environ.get("WEB_CONCURRENCY", "1")) > 1 else "false"
+).lower() in ("1", "true", "yes")
+
+
+def no_cache(cache_control: Optional[str]) -> bool:
+    if not isinstance(cache_control, str):
+        return False
+    directives = {directive.strip().lower() for directive in cache_control.split(",")}
+    return bool(directives & {"no-cache", "no-store", "max-age=0"})
+
+
+class ContentCache:
+    """
+    Property content reads per (account, channel, room_id, view), kept for
+    CONTENT_CACHE_TTL seconds either in an in-process LRU or, with a
+    collection, only in MongoDB so every worker sees an invalidation at once.
+
+    All views of a room live under one entry so a modify invalidates them
+    together. Each room also has a generation that invalidate() bumps: a
+    read records it before fetching and its put() is dropped when a modify
+    invalidated the room meanwhile, so old content is never written back.
+    """
+
+    def __init__(self, collection=None, ttl: float = CONTENT_CACHE_TTL, size: int = CONTENT_CACHE_SIZE):
+        self.collection = collection
+        self.ttl = ttl
+        self.size = size
+        self._rooms = OrderedDict()
+        self._generations = {}
+
+    @staticmethod
+    def _doc_id(room_key: tuple) -> str:
+        return "|".join(room_key)
+
+    async def start(self):
+        if self.collection is None:
+            return
+        try:
+            await self.collection.create_index("expires_at", expireAfterSeconds=0)
+        except Exception as e:
+            print(f"Error creating content cache index: {e}")
+
+    def _remember(self, room_key: tuple, view: str, value, expires_at: float):
+        self._rooms.setdefault(room_key, {})[view] = (expires_at, value)
+        self._rooms.move_to_end(room_key)
+        while len(self._rooms) > self.size:
+            self._rooms.popitem(last=False)
+
+    async def get(self, account: str, channel: str, room_id: str, view: str):
+        room_key = (account, channel, room_id)
+        if self.collection is None:
+            entry = self._rooms.get(room_key, {}).get(view)
+            if entry and entry[0] > time.time():
+                self._rooms.move_to_end(room_key)
+                metrics.counter(f"content_cache_hits.{channel}.{view}").inc()
+                return entry[1]
+        else:
+            try:
+                doc = await self.collection.find_one({"_id": self._doc_id(room_key)}, {f"views.{view}": 1})
+            except Exception as e:
+                print(f"Error reading content cache: {e}")
+                doc = None
+            cached = (doc or {}).get("views", {}).get(view)
+            if cached and cached["expires_at"].replace(tzinfo=timezone.utc).timestamp() > time.time():
+                metrics.counter(f"content_cache_hits.{channel}.{view}").inc()
+                return cached["value"]
+        metrics.counter(f"content_cache_misses.{channel}.{view}").inc()
+        return None
+
+    async def generation(self, account: str, channel: str, room_id: str) -> Optional[int]:
+        """Current generation of the room, None when it can't be read."""
+        room_key = (account, channel, room_id)
+        if self.collection is None:
+            return self._generations.get(room_key, 0)
+        try:
+            doc = await self.collection.find_one({"_id": self._doc_id(room_key)}, {"generation": 1})
+        except Exception as e:
+            print(f"Error reading content cache: {e}")
+            return None
+        return (doc or {}).get("generation", 0)
+
+    async def put(self, account: str, channel: str, room_id: str, view: str, value, generation: Optional[int] = None):
+        # generation: as read before the content was fetched, None writes unconditionally
+        room_key = (account, channel, room_id)
+        expires_at = time.time() + self.ttl
+        if self.collection is None:
+            if generation is not None and self._generations.get(room_key, 0) != generation:
+                metrics.counter(f"content_cache_stale_puts.{channel}").inc()
+                return
+            self._remember(room_key, view, value, expires_at)
+            return
+        expires = datetime.datetime.fromtimestamp(expires_at, timezone.utc)
+        query = {"_id": self._doc_id(room_key)}
+        if generation:
+            query["generation"] = generation
+        elif generation == 0:
+            query["generation"] = {"$exists": False}
+        try:
+            await self.collection.update_one(
+                query,
+                {"$set": {f"views.{view}": {"value": value, "expires_at": expires}}, "$max": {"expires_at": expires}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # The room's generation moved on, the upsert collided with its document
+            metrics.counter(f"content_cache_stale_puts.{channel}").inc()
+        except Exception as e:
+            print(f"Error writing content cache: {e}")
+
+    async def invalidate(self, account: str, channel: str, room_id: str):
+        room_key = (account, channel, room_id)
+        self._rooms.pop(room_key, None)
+        metrics.counter(f"content_cache_invalidations.{channel}").inc()
+        if self.collection is None:
+            self._generations[room_key] = self._generations.get(room_key, 0) + 1
+            return
+        # Kept for a TTL so reads that started before this can't write their content back
+        expires = datetime.datetime.fromtimestamp(time.time() + self.ttl, timezone.utc)
+        try:
+            await self.collection.update_one(
+                {"_id": self._doc_id(room_key)},
+                {"$unset": {"views": ""}, "$inc": {"generation": 1}, "$max": {"expires_at": expires}},
+                upsert=True
+            )
+        except Exception as e:
+            print(f"Error invalidating content cache: {e}")
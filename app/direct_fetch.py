@@ -0,0 +1,185 @@
+import os
+import time
+from http.cookiejar import CookieJar
+from typing import Awaitable, Callable, Optional
+from urllib.parse import urljoin
+import httpx
+from bs4 import BeautifulSoup
+import metrics
+from loop_monitor import run_blocking
+
+DIRECT_FETCH = os.environ.get("DIRECT_FETCH", "true").lower() in ("1", "true", "yes")
+DIRECT_FETCH_TIMEOUT = float(os.environ.get("DIRECT_FETCH_TIMEOUT", "20"))
+DIRECT_FETCH_MAX_CONNECTIONS = int(os.environ.get("DIRECT_FETCH_MAX_CONNECTIONS", "50"))
+# How long a session's cookies are reused before being read from its context again
+DIRECT_FETCH_COOKIE_TTL = float(os.environ.get("DIRECT_FETCH_COOKIE_TTL", "30"))
+DIRECT_FETCH_MAX_REDIRECTS = int(os.environ.get("DIRECT_FETCH_MAX_REDIRECTS", "5"))
+
+BEDS24_URL = "https://beds24.com"
+# Beds24 serves its login form from control2.php, a page showing it means the cookies no longer log in
+LOGIN_PAGE = "/control2.php"
+LOGIN_FORM_MARKERS = ('name="loginpass"', "name='loginpass'", 'name="logincode"', "name='logincode'")
+
+
+def logged_out(response: httpx.Response) -> bool:
+    return response.url.path.lower() == LOGIN_PAGE or any(marker in response.text for marker in LOGIN_FORM_MARKERS)
+
+
+class NoCookies(CookieJar):
+    # The client is shared by every session: cookies only ever come from _headers(),
+    # never from what a response set, or one session's PHPSESSID reaches another's requests.
+    # httpx drops the Cookie header on redirects, so _request follows them itself.
+    def set_cookie(self, cookie):
+        pass
+
+    def extract_cookies(self, response, request):
+        pass
+
+
+class DirectFetcher:
+    """
+    Fetches server-rendered Beds24 control pages with plain pooled HTTP
+    requests, authenticated with the cookies (and user agent) of a
+    session's browser context, so read-only pages don't need Chromium.
+
+    Anything that doesn't look like the logged-in page returns None and the
+    caller falls back to the browser.
+    """
+
+    def __init__(self, enabled: bool = DIRECT_FETCH, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.enabled = enabled
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._credentials = {}
+
+    def _create(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            cookies=NoCookies(),
+            transport=self.transport,
+            limits=httpx.Limits(max_connections=DIRECT_FETCH_MAX_CONNECTIONS),
+            timeout=DIRECT_FETCH_TIMEOUT
+        )
+
+    async def start(self):
+        if self.enabled and self._client is None:
+            self._client = self._create()
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = self._create()
+        return self._client
+
+    def forget(self, session_id: str):
+        # Cookies change when the session logs into another account
+        self._credentials.pop(session_id, None)
+
+    async def _headers(self, session_id: str, context) -> dict:
+        cached = self._credentials.get(session_id)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        # Only kept if nothing forgot the session meanwhile, its cookies may be an older account's
+        pending = self._credentials[session_id] = (0, None)
+        cookies = await context.cookies(BEDS24_URL)
+        headers = {"Cookie": "; ".join(f"{cookie['name']}={cookie['value']}" for cookie in cookies)}
+        if context.pages:
+            headers["User-Agent"] = await context.pages[0].evaluate("navigator.userAgent")
+        if self._credentials.get(session_id) is pending:
+            self._credentials[session_id] = (time.monotonic() + DIRECT_FETCH_COOKIE_TTL, headers)
+        return headers
+
+    async def _request(self, session_id: str, context, method: str, url: str, flow: str, **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            headers = await self._headers(session_id, context)
+            response = await self.client.request(method, url, headers=headers, **kwargs)
+            for _ in range(DIRECT_FETCH_MAX_REDIRECTS):
+                redirect = response.next_request
+                if redirect is None or not redirect.url.host.endswith("beds24.com"):
+                    break
+                redirect.headers["Cookie"] = headers["Cookie"]
+                response = await self.client.send(redirect)
+        except Exception as e:
+            print(f"Error fetching {url} directly: {e}")
+            metrics.counter(f"direct_fetch_errors.{flow}").inc()
+            return None
+        metrics.histogram(f"direct_fetch_ms.{flow}").observe((time.perf_counter() - start) * 1000)
+        if response.status_code != 200 or logged_out(response):
+            # Logged out or bounced elsewhere, the browser knows how to recover
+            self.forget(session_id)
+            return None
+        return response
+
+    async def get(self, session_id: str, context, url: str, flow: str, extract: Callable[[str], Awaitable[Optional[dict]]]) -> Optional[dict]:
+        """
+        GETs a page and returns `extract(html)`, None when the page or what
+        was extracted from it is not usable.
+        """
+        if not self.enabled:
+            return None
+        response = await self._request(session_id, context, "GET", url, flow)
+        return await self._extract(response, flow, extract)
+
+    async def submit_select(self, session_id: str, context, url: str, flow: str, select_selector: str, value: str, extract: Callable[[str], Awaitable[Optional[dict]]]) -> Optional[dict]:
+        """
+        Loads a page and submits the form around `select_selector` with
+        `value` selected, like choosing the option in the browser does.
+        """
+        if not self.enabled:
+            return None
+        response = await self._request(session_id, context, "GET", url, flow)
+        form = await run_blocking(select_form, response.text, select_selector) if response is not None else None
+        if form is None:
+            metrics.counter(f"direct_fetch_fallbacks.{flow}").inc()
+            return None
+        name, method, action, data = form
+        data[name] = value
+        action = urljoin(str(response.url), action or str(response.url))
+        if method == "post":
+            response = await self._request(session_id, context, "POST", action, flow, data=data)
+        else:
+            response = await self._request(session_id, context, "GET", action, flow, params=data)
+        return await self._extract(response, flow, extract)
+
+    async def _extract(self, response: Optional[httpx.Response], flow: str, extract: Callable[[str], Awaitable[Optional[dict]]]) -> Optional[dict]:
+        data = await extract(response.text) if response is not None else None
+        if not data:
+            metrics.counter(f"direct_fetch_fallbacks.{flow}").inc()
+            return None
+        metrics.counter(f"direct_fetch_hits.{flow}").inc()
+        return data
+
+
+def select_form(html: str, select_selector: str):
+    # (select name, method, action, fields) of the form around the select, None when there is none
+    select = BeautifulSoup(html, "html.parser").select_one(select_selector)
+    form = select.find_parent("form") if select is not None else None
+    if form is None or not select.get("name"):
+        return None
+    return select["name"], form.get("method", "get").lower(), form.get("action"), form_data(form)
+
+
+def form_data(form) -> dict:
+    # The fields a browser would send for this form, buttons excluded
+    data = {}
+    for field in form.select("input[name], select[name], textarea[name]"):
+        name = field["name"]
+        if field.name == "input":
+            kind = field.get("type", "text").lower()
+            if kind in ("submit", "button", "image", "file", "reset"):
+                continue
+            if kind in ("checkbox", "radio") and not field.has_attr("checked"):
+                continue
+            data[name] = field.get("value", "on" if kind in ("checkbox", "radio") else "")
+        elif field.name == "select":
+            option = field.select_one("option[selected]") or field.select_one("option")
+            if option is not None:
+                data[name] = option.get("value", option.text)
+        else:
+            data[name] = field.text
+    return data
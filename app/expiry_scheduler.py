@@ -0,0 +1,171 @@
+import asyncio
+import datetime
+import heapq
+import os
+import time
+from datetime import timezone
+from typing import Awaitable, Callable, Optional
+import metrics
+
+SESSION_TTL = datetime.timedelta(seconds=float(os.environ.get("SESSION_TTL", "3600")))
+# Sessions torn down at once when many expire together
+SESSION_EXPIRY_CONCURRENCY = int(os.environ.get("SESSION_EXPIRY_CONCURRENCY", "4"))
+# A session busy with a request when it expires is looked at again after this
+SESSION_EXPIRY_BUSY_RETRY = float(os.environ.get("SESSION_EXPIRY_BUSY_RETRY", "30"))
+# Above this RSS (the worker and its browsers) idle sessions are evicted early, LRU first; 0 disables
+SESSION_MEMORY_LIMIT_MB = float(os.environ.get("SESSION_MEMORY_LIMIT_MB", "0"))
+SESSION_MEMORY_CHECK_INTERVAL = float(os.environ.get("SESSION_MEMORY_CHECK_INTERVAL", "15"))
+
+
+def process_tree_rss() -> int:
+    """RSS in bytes of this process and all its descendants (the browsers), from /proc."""
+    parents = {}
+    rss = {}
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+            with open(f"/proc/{entry}/statm") as f:
+                resident = int(f.read().split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        # The command name may contain spaces, fields resume after its closing parenthesis
+        parents[int(entry)] = int(stat.rsplit(")", 1)[1].split()[1])
+        rss[int(entry)] = resident * page_size
+    children = {}
+    for pid, ppid in parents.items():
+        children.setdefault(ppid, []).append(pid)
+    total = 0
+    stack = [os.getpid()]
+    while stack:
+        pid = stack.pop()
+        total += rss.get(pid, 0)
+        stack.extend(children.get(pid, ()))
+    return total
+
+
+class ExpiryScheduler:
+    """
+    Expires idle sessions exactly when their TTL runs out: a min-heap of
+    deadlines, and a task sleeping until the soonest one. Touching a session
+    pushes a new deadline; superseded heap entries are skipped when popped.
+
+    Under memory pressure the least recently used `evictable` sessions are
+    closed early through `evict`, which keeps them restorable.
+    """
+
+    def __init__(
+        self,
+        expire: Callable[[str], Awaitable[None]],
+        evict: Callable[[str], Awaitable[None]],
+        is_busy: Callable[[str], bool],
+        evictable: Callable[[str], bool],
+        ttl: datetime.timedelta = SESSION_TTL,
+        concurrency: int = SESSION_EXPIRY_CONCURRENCY,
+        memory_limit_mb: float = SESSION_MEMORY_LIMIT_MB
+    ):
+        self.expire = expire
+        self.evict = evict
+        self.is_busy = is_busy
+        self.evictable = evictable
+        self.ttl = ttl
+        self.memory_limit = memory_limit_mb * 1024 * 1024
+        self.concurrency = concurrency
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._heap = []
+        self._deadlines = {}
+        self._wake = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def touch(self, session_id: str, last_access: Optional[datetime.datetime] = None):
+        last_access = last_access or datetime.datetime.now(timezone.utc)
+        if last_access.tzinfo is None:
+            # Mongo hands back naive UTC datetimes
+            last_access = last_access.replace(tzinfo=timezone.utc)
+        self._schedule(session_id, (last_access + self.ttl).timestamp())
+
+    def _schedule(self, session_id: str, deadline: float):
+        self._deadlines[session_id] = deadline
+        heapq.heappush(self._heap, (deadline, session_id))
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            # Mostly superseded entries, rebuild from the live deadlines
+            self._heap = [(deadline, sid) for sid, deadline in self._deadlines.items()]
+            heapq.heapify(self._heap)
+        if self._heap[0] == (deadline, session_id):
+            self._wake.set()
+
+    def forget(self, session_id: str):
+        self._deadlines.pop(session_id, None)
+
+    def _due(self, now: float) -> list:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, session_id = heapq.heappop(self._heap)
+            if self._deadlines.get(session_id) != deadline:
+                continue
+            if self.is_busy(session_id):
+                self._schedule(session_id, now + SESSION_EXPIRY_BUSY_RETRY)
+                continue
+            del self._deadlines[session_id]
+            due.append(session_id)
+        return due
+
+    async def _close(self, action, session_id: str, kind: str):
+        async with self._semaphore:
+            try:
+                await action(session_id)
+                metrics.counter(f"sessions_{kind}").inc()
+            except Exception as e:
+                print(f"Error closing {kind} session {session_id}: {e}")
+
+    async def _run(self):
+        next_memory_check = time.time()
+        while True:
+            now = time.time()
+            due = self._due(now)
+            if due:
+                await asyncio.gather(*(self._close(self.expire, session_id, "expired") for session_id in due))
+            if self.memory_limit and now >= next_memory_check:
+                pressured = await self._relieve_memory()
+                # Check again soon while evictions are still bringing memory down
+                next_memory_check = now + (2 if pressured else SESSION_MEMORY_CHECK_INTERVAL)
+            metrics.gauge("session_expiry_scheduled").set(len(self._deadlines))
+            wakeup = self._heap[0][0] if self._heap else now + 3600
+            if self.memory_limit:
+                wakeup = min(wakeup, next_memory_check)
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=max(0, wakeup - time.time()))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _relieve_memory(self) -> bool:
+        rss = await asyncio.to_thread(process_tree_rss)
+        metrics.gauge("process_tree_rss_mb").set(round(rss / 1024 / 1024))
+        if rss <= self.memory_limit:
+            return False
+        metrics.counter("memory_pressure_events").inc()
+        # Deadlines follow last access, so the earliest ones are the least recently used
+        candidates = [
+            session_id for deadline, session_id in sorted((d, s) for s, d in self._deadlines.items())
+            if self.evictable(session_id) and not self.is_busy(session_id)
+        ][:self.concurrency]
+        print(f"RSS {rss // 1024 // 1024} MB over the {self.memory_limit // 1024 // 1024:.0f} MB limit, evicting {len(candidates)} sessions")
+        await asyncio.gather(*(self._close(self.evict, session_id, "evicted") for session_id in candidates))
+        return True
@@ -0,0 +1,97 @@
+import os
+from typing import Optional
+
+# Which parser extracts tables: "selectolax" or "lxml"; unset picks the fastest one installed
+HTML_TABLES_BACKEND = os.environ.get("HTML_TABLES_BACKEND")
+
+
+def _rows_to_dict(rows) -> dict:
+    # rows are lists of cell texts; first row is the header, key/value are cells 1 and 3
+    data = {}
+    for cols in rows[1:]:
+        if len(cols) >= 3:
+            data[cols[0].strip()] = cols[2].strip()
+    return data
+
+
+class LxmlBackend:
+    name = "lxml"
+
+    def __init__(self):
+        import lxml.html
+        from lxml.cssselect import CSSSelector
+        self._html = lxml.html
+        self._selector = CSSSelector
+        self._compiled = {}
+
+    def parse(self, html: str):
+        return self._html.document_fromstring(html)
+
+    def tables(self, document, selectors: dict) -> dict:
+        data = {}
+        for key, selector in selectors.items():
+            compiled = self._compiled.get(selector)
+            if compiled is None:
+                compiled = self._compiled[selector] = self._selector(selector)
+            found = compiled(document)
+            if found:
+                data[key] = _rows_to_dict([
+                    [col.text_content() for col in row.iter("td")] for row in found[0].iter("tr")
+                ])
+        return data
+
+
+class SelectolaxBackend:
+    name = "selectolax"
+
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+        self._parser = LexborHTMLParser
+
+    def parse(self, html: str):
+        return self._parser(html)
+
+    def tables(self, document, selectors: dict) -> dict:
+        data = {}
+        for key, selector in selectors.items():
+            table = document.css_first(selector)
+            if table is not None:
+                data[key] = _rows_to_dict([
+                    [col.text() for col in row.css("td")] for row in table.css("tr")
+                ])
+        return data
+
+
+BACKENDS = {
+    "selectolax": SelectolaxBackend,
+    "lxml": LxmlBackend,
+}
+
+_backends = {}
+
+
+def get_backend(name: Optional[str] = None):
+    name = name or HTML_TABLES_BACKEND
+    candidates = [name] if name else list(BACKENDS)
+    for candidate in candidates:
+        if candidate in _backends:
+            return _backends[candidate]
+        try:
+            backend = BACKENDS[candidate]()
+        except ImportError:
+            if name:
+                raise
+            continue
+        _backends[candidate] = backend
+        return backend
+    raise ImportError("No HTML parser available for table extraction")
+
+
+def extract_tables(html: str, selectors: dict, backend: Optional[str] = None) -> dict:
+    """
+    Parses a whole page once and returns every table found for `selectors`
+    ({key: css}) as {key: {first cell: third cell}}, skipping header rows.
+    """
+    parser = get_backend(backend)
+    return parser.tables(parser.parse(html), selectors)
+
@@ -0,0 +1,244 @@
+import asyncio
+import datetime
+import json
+import os
+import random
+import time
+import traceback
+import uuid
+from contextlib import nullcontext
+from contextvars import ContextVar
+from datetime import timezone
+from typing import AsyncContextManager, Awaitable, Callable, Iterable, Optional
+from urllib.parse import urlsplit
+import httpx
+from fastapi import HTTPException
+import metrics
+
+# Jobs running at once across all accounts, and per Beds24 account
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+JOB_ACCOUNT_CONCURRENCY = int(os.environ.get("JOB_ACCOUNT_CONCURRENCY", "2"))
+# Jobs accepted but not finished before submissions are refused with 429
+JOB_QUEUE_LIMIT = int(os.environ.get("JOB_QUEUE_LIMIT", "5000"))
+# A job queued behind another one on the same session waits this long for it
+JOB_SESSION_WAIT_TIMEOUT = float(os.environ.get("JOB_SESSION_WAIT_TIMEOUT", "3600"))
+JOB_RETENTION_HOURS = float(os.environ.get("JOB_RETENTION_HOURS", "72"))
+JOB_WEBHOOK_TIMEOUT = float(os.environ.get("JOB_WEBHOOK_TIMEOUT", "10"))
+JOB_WEBHOOK_ATTEMPTS = int(os.environ.get("JOB_WEBHOOK_ATTEMPTS", "3"))
+# Hosts webhooks may be sent to (a host also allows its subdomains); none configured refuses webhook_url
+JOB_WEBHOOK_HOSTS = [host.strip().lower() for host in os.environ.get("JOB_WEBHOOK_HOSTS", "").split(",") if host.strip()]
+JOB_WEBHOOK_SCHEMES = [scheme.strip().lower() for scheme in os.environ.get("JOB_WEBHOOK_SCHEMES", "https").split(",") if scheme.strip()]
+# How often jobs left queued or running by a worker that is gone are marked failed
+JOB_SWEEP_INTERVAL = float(os.environ.get("JOB_SWEEP_INTERVAL", "60"))
+
+# Job the current task is running, so the operation can report its progress
+_current_job = ContextVar("current_job", default=None)
+
+
+def report_progress(step: str):
+    manager_job = _current_job.get()
+    if manager_job is not None:
+        manager, job_id = manager_job
+        task = asyncio.create_task(manager._write(job_id, {"progress": step}, status="running"))
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+
+
+def webhook_allowed(url: str) -> bool:
+    try:
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+    except ValueError:
+        return False
+    if parts.scheme.lower() not in JOB_WEBHOOK_SCHEMES or not host:
+        return False
+    return any(host == allowed or host.endswith(f".{allowed}") for allowed in JOB_WEBHOOK_HOSTS)
+
+
+class JobManager:
+    """
+    Runs long browser operations in the background: submit() stores a job
+    in MongoDB and returns its id at once, the operation then waits for its
+    session (if any), a slot of its account and a slot of the worker pool
+    before it runs.
+
+    The job document is the only place status and results are kept, so any
+    worker can answer GET /jobs/{id}. Jobs run in the process that accepted
+    them; ones whose worker is no longer live are marked failed.
+    """
+
+    def __init__(self, collection, workers: int = JOB_WORKERS, account_concurrency: int = JOB_ACCOUNT_CONCURRENCY):
+        self.collection = collection
+        self.account_concurrency = account_concurrency
+        self._workers = asyncio.Semaphore(workers)
+        self._accounts = {}
+        self._tasks = {}
+        self._client: Optional[httpx.AsyncClient] = None
+        self.worker_id = None
+        self.live_workers: Callable[[], Iterable[str]] = lambda: ()
+        self._sweep_task = None
+
+    async def start(self, worker_id: str, live_workers: Callable[[], Iterable[str]]):
+        self.worker_id = worker_id
+        self.live_workers = live_workers
+        self._client = httpx.AsyncClient(timeout=JOB_WEBHOOK_TIMEOUT)
+        try:
+            await self.collection.create_index("finished_at", expireAfterSeconds=int(JOB_RETENTION_HOURS * 3600))
+        except Exception as e:
+            print(f"Error creating jobs index: {e}")
+        self._sweep_task = asyncio.create_task(self._sweep())
+
+    async def stop(self):
+        if self._sweep_task is not None:
+            self._sweep_task.cancel()
+            try:
+                await self._sweep_task
+            except asyncio.CancelledError:
+                pass
+            self._sweep_task = None
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _sweep(self):
+        while True:
+            try:
+                await self.fail_orphans()
+            except Exception as e:
+                print(f"Error failing orphaned jobs: {e}")
+            await asyncio.sleep(JOB_SWEEP_INTERVAL)
+
+    async def fail_orphans(self):
+        # Older than a sweep, so a worker started since the last lease refresh isn't taken for dead
+        live = [self.worker_id, *self.live_workers()]
+        cutoff = datetime.datetime.now(timezone.utc) - datetime.timedelta(seconds=JOB_SWEEP_INTERVAL)
+        query = {"status": {"$in": ["queued", "running"]}, "worker": {"$nin": live}, "created_at": {"$lt": cutoff}}
+        async for job in self.collection.find(query):
+            outcome = {
+                "status": "failed",
+                "error": {"message": "Job lost, the worker running it stopped"},
+                "progress": None,
+                "finished_at": datetime.datetime.now(timezone.utc)
+            }
+            result = await self.collection.update_one({"_id": job["_id"], "status": job["status"]}, {"$set": outcome})
+            if not result.modified_count:
+                continue
+            metrics.counter(f"jobs_orphaned.{job['kind']}").inc()
+            if job.get("webhook_url"):
+                await self._notify(job, outcome)
+
+    async def _write(self, job_id: str, fields: dict, status: Optional[str] = None):
+        # Progress writes are conditional on the status, a late one can't undo a finished job
+        query = {"_id": job_id} if status is None else {"_id": job_id, "status": status}
+        try:
+            await self.collection.update_one(query, {"$set": fields})
+        except Exception as e:
+            print(f"Error updating job {job_id}: {e}")
+
+    async def submit(
+        self,
+        kind: str,
+        account: str,
+        operation: Callable[[], Awaitable[dict]],
+        params: Optional[dict] = None,
+        webhook_url: Optional[str] = None,
+        session_slot: Optional[Callable[[], AsyncContextManager]] = None
+    ) -> dict:
+        if webhook_url and not webhook_allowed(webhook_url):
+            raise HTTPException(status_code=400, detail="webhook_url is not an allowed destination")
+        if len(self._tasks) >= JOB_QUEUE_LIMIT:
+            metrics.counter("jobs_rejected").inc()
+            raise HTTPException(status_code=429, detail="Too many jobs queued", headers={"Retry-After": "30"})
+        job = {
+            "_id": str(uuid.uuid4()),
+            "kind": kind,
+            "account": account,
+            "params": params or {},
+            "status": "queued",
+            "progress": None,
+            "webhook_url": webhook_url,
+            "worker": self.worker_id,
+            "created_at": datetime.datetime.now(timezone.utc)
+        }
+        await self.collection.insert_one(job)
+        task = asyncio.create_task(self._run(job, operation, session_slot))
+        self._tasks[job["_id"]] = task
+        task.add_done_callback(lambda done: self._job_done(job["_id"]))
+        metrics.counter(f"jobs_submitted.{kind}").inc()
+        metrics.gauge("jobs_pending").set(len(self._tasks))
+        return {"job_id": job["_id"], "status": "queued"}
+
+    def _job_done(self, job_id: str):
+        self._tasks.pop(job_id, None)
+        metrics.gauge("jobs_pending").set(len(self._tasks))
+
+    async def _run(self, job: dict, operation: Callable[[], Awaitable[dict]], session_slot=None):
+        job_id, kind = job["_id"], job["kind"]
+        queued = time.perf_counter()
+        slot = self._accounts.setdefault(job["account"], [asyncio.Semaphore(self.account_concurrency), 0])
+        slot[1] += 1
+        try:
+            # Session first, so a job queued behind another one on its session holds no account or pool
+            # slot while it waits; account before pool, so one busy account never holds pool slots
+            async with session_slot() if session_slot is not None else nullcontext():
+                async with slot[0], self._workers:
+                    metrics.histogram(f"job_queue_ms.{kind}").observe((time.perf_counter() - queued) * 1000)
+                    await self._write(job_id, {"status": "running", "started_at": datetime.datetime.now(timezone.utc)})
+                    token = _current_job.set((self, job_id))
+                    start = time.perf_counter()
+                    try:
+                        result = await operation()
+                    finally:
+                        _current_job.reset(token)
+                        metrics.histogram(f"job_run_ms.{kind}").observe((time.perf_counter() - start) * 1000)
+            if isinstance(result, dict) and result.get("status") == "error":
+                outcome = {"status": "failed", "error": {"message": result.get("message")}, "result": result}
+            else:
+                outcome = {"status": "succeeded", "result": result}
+        except HTTPException as e:
+            outcome = {"status": "failed", "error": {"status_code": e.status_code, "detail": e.detail}}
+        except asyncio.CancelledError:
+            outcome = {"status": "failed", "error": {"message": "Job interrupted by shutdown"}}
+            await self._finish(job, outcome)
+            raise
+        except Exception as e:
+            traceback.print_exc()
+            outcome = {"status": "failed", "error": {"message": str(e)}}
+        finally:
+            slot[1] -= 1
+            if not slot[1]:
+                self._accounts.pop(job["account"], None)
+        await self._finish(job, outcome)
+
+    async def _finish(self, job: dict, outcome: dict):
+        metrics.counter(f"jobs_{outcome['status']}.{job['kind']}").inc()
+        outcome["progress"] = None
+        outcome["finished_at"] = datetime.datetime.now(timezone.utc)
+        await self._write(job["_id"], outcome)
+        if job.get("webhook_url"):
+            await self._notify(job, outcome)
+
+    async def _notify(self, job: dict, outcome: dict):
+        payload = json.dumps({"job_id": job["_id"], "kind": job["kind"], **outcome}, default=str)
+        for attempt in range(JOB_WEBHOOK_ATTEMPTS):
+            try:
+                response = await self._client.post(
+                    job["webhook_url"], content=payload, headers={"Content-Type": "application/json"}
+                )
+                if response.status_code < 500:
+                    await self._write(job["_id"], {"webhook_status": response.status_code})
+                    return
+            except Exception as e:
+                print(f"Error calling webhook for job {job['_id']}: {e}")
+            await asyncio.sleep(random.uniform(0, 2 ** attempt))
+        metrics.counter("job_webhook_failures").inc()
+        await self._write(job["_id"], {"webhook_status": "failed"})
+
+    async def get(self, job_id: str) -> dict:
+        job = await self.collection.find_one({"_id": job_id}, {"webhook_url": 0})
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        job["job_id"] = job.pop("_id")
+        return job
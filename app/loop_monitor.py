@@ -0,0 +1,131 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import metrics
+
+LOOP_MONITOR_INTERVAL = float(os.environ.get("LOOP_MONITOR_INTERVAL", "0.1"))
+# A loop stuck this long gets its stack logged by the watchdog
+LOOP_SLOW_CALLBACK_MS = float(os.environ.get("LOOP_SLOW_CALLBACK_MS", "250"))
+# Threads for blocking I/O and sync client calls
+BLOCKING_POOL_SIZE = int(os.environ.get("BLOCKING_POOL_SIZE", "8"))
+# Processes for CPU-bound parsing, which holds the GIL on a thread; 0 keeps it
+# on the blocking thread pool (benchmarks/bench_run_cpu.py compares the two)
+CPU_POOL_SIZE = int(os.environ.get("CPU_POOL_SIZE", str(min(2, os.cpu_count() or 1))))
+
+_blocking_pool = None
+_cpu_pool = None
+
+
+def start_executors():
+    """Creates the pools, once per lifespan so a restarted app gets working ones."""
+    global _blocking_pool, _cpu_pool
+    if _blocking_pool is None:
+        _blocking_pool = ThreadPoolExecutor(max_workers=BLOCKING_POOL_SIZE, thread_name_prefix="blocking")
+    if _cpu_pool is None and CPU_POOL_SIZE > 0:
+        # Spawned, a forked child would inherit the browser and client threads' locks
+        _cpu_pool = ProcessPoolExecutor(max_workers=CPU_POOL_SIZE, mp_context=multiprocessing.get_context("spawn"))
+
+
+async def _submit(executor, name: str, func, *args, **kwargs):
+    start = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+    finally:
+        metrics.histogram(f"offloaded_ms.{name}").observe((time.perf_counter() - start) * 1000)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Runs a blocking call on the bounded thread pool."""
+    if _blocking_pool is None:
+        start_executors()
+    return await _submit(_blocking_pool, getattr(func, "__name__", "call"), func, *args, **kwargs)
+
+
+async def run_cpu(func, *args, **kwargs):
+    """Runs CPU-bound work (module-level function, picklable arguments) off the loop."""
+    if CPU_POOL_SIZE <= 0:
+        return await run_blocking(func, *args, **kwargs)
+    if _cpu_pool is None:
+        start_executors()
+    return await _submit(_cpu_pool, func.__name__, func, *args, **kwargs)
+
+
+def shutdown_executors():
+    global _blocking_pool, _cpu_pool
+    if _blocking_pool is not None:
+        _blocking_pool.shutdown(wait=False, cancel_futures=True)
+        _blocking_pool = None
+    if _cpu_pool is not None:
+        _cpu_pool.shutdown(wait=False, cancel_futures=True)
+        _cpu_pool = None
+
+
+class LoopMonitor:
+    """
+    Measures event loop lag with a heartbeat task (loop_lag_ms histogram)
+    and runs a watchdog thread that logs the loop thread's stack whenever
+    the heartbeat stalls for longer than LOOP_SLOW_CALLBACK_MS, which
+    points straight at the synchronous code holding the loop.
+    """
+
+    def __init__(self, interval: float = LOOP_MONITOR_INTERVAL, threshold_ms: float = LOOP_SLOW_CALLBACK_MS):
+        self.interval = interval
+        self.threshold = threshold_ms / 1000
+        self._beat = time.monotonic()
+        self._task = None
+        self._thread = None
+        self._stopped = threading.Event()
+        self._loop_thread_id = None
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._beat = now
+            metrics.histogram("loop_lag_ms").observe(max(0.0, now - expected) * 1000)
+
+    def _watch(self):
+        stalled_since = None
+        while not self._stopped.wait(self.interval / 2):
+            stalled = time.monotonic() - self._beat - self.interval
+            if stalled < self.threshold:
+                if stalled_since is not None:
+                    print(f"Event loop resumed after {(time.monotonic() - stalled_since) * 1000:.0f} ms blocked")
+                    stalled_since = None
+                continue
+            if stalled_since is not None:
+                continue
+            # Log once per stall, with where the loop thread is stuck right now
+            stalled_since = self._beat + self.interval
+            metrics.counter("loop_stalls").inc()
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "unavailable\n"
+            print(f"Event loop blocked for more than {stalled * 1000:.0f} ms, loop thread stack:\n{stack}")
@@ -4,22 +4,44 @@ from datetime import timedelta, timezone
 from bson import json_util
 import json
 import traceback
-from fastapi import Body, FastAPI, HTTPException, BackgroundTasks, Request, logger
-from fastapi.responses import JSONResponse, RedirectResponse
+from fastapi import Body, FastAPI, Header, HTTPException, BackgroundTasks, Request, logger
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import httpx
-from playwright.async_api import async_playwright, Browser, TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import Browser, TimeoutError as PlaywrightTimeoutError
 from motor.motor_asyncio import AsyncIOMotorClient
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, nullcontext
 import uuid
 import os
+import time
 import authenticator
+import metrics
+from auth_state_cache import AuthStateCache
+from session_store import SessionStateStore
+from page_forms import AIRBNB_ROOM_FORM, BOOKINGCOM_PROPERTY_FORM, extract_fields, fill_fields
+from browser_pool import BrowserPool, BrowserPoolExhausted
+from beds24_api import Beds24ApiClient
+from token_manager import TokenManager
 from hardBypass import HardBypass
+from warm_pool import WarmSessionPool
+from session_scheduler import SessionScheduler
+from airbnb_bulk import import_listings
+from bulk_reads import read_rooms
+from resource_blocking import ResourceBlocker
+from direct_fetch import DirectFetcher
+from loop_monitor import LoopMonitor, run_blocking, run_cpu, shutdown_executors, start_executors
+from expiry_scheduler import ExpiryScheduler
+from resource_governor import GOVERNOR_RETRY_AFTER, HostAtCapacity, ResourceGovernor
+from session_registry import FORWARDED_HEADER, SessionRegistry
+import otp_fetcher
+from content_cache import CONTENT_CACHE_MONGO, ContentCache, no_cache
+from jobs import JOB_SESSION_WAIT_TIMEOUT, JobManager, report_progress
+import waits
 from dotenv import load_dotenv
 from models import CheckOutInstructions, Descriptions, ListingDetails, PricingSettings, SessionRequest, BookingRules
 from models import Custom, PropertyDetails, PropertyProfile, InvoicesContact, ReservationsContact, Policies
-from bs4 import BeautifulSoup
-from typing import Optional
+from models import AirbnbBulkImportRequest, BulkReadRequest
+from html_tables import extract_tables
+from typing import Literal, Optional
 from bson import json_util
 # import captcha_audio_bypass
 
@@ -30,188 +52,427 @@ client = AsyncIOMotorClient(MONGODB_URL)
 db = client["test"]
 sessions_collection = db["sessions"]
 refresh_tokens_collection = db["integrations_refresh_tokens"]
+auth_states_collection = db["auth_states"]
+jobs_collection = db["jobs"]
+workers_collection = db["session_workers"]
 
 # In-memory storage of active Playwright instances
 active_playwrights = {}
 last_access_times = {}
+# Beds24 account each session is logged into
+session_accounts = {}
 
-TIMEOUT_PERIOD = datetime.timedelta(hours=1)
+# Long-lived Chromium processes shared by all sessions of this worker
+browser_pool = BrowserPool()
+
+# Pooled keep-alive HTTP/2 client for the Beds24 API v2
+beds24_api = Beds24ApiClient()
+
+# One request at a time drives a session's page
+session_scheduler = SessionScheduler()
+
+# Holds back new sessions near the memory limit and recycles sessions that grow too large
+resource_governor = ResourceGovernor(
+    browsers=browser_pool.browsers,
+    sessions=lambda: ((session_id, browser, page) for session_id, (_, browser, _, page) in active_playwrights.items()),
+    recycle=lambda session_id: recycle_session(session_id),
+    is_busy=session_scheduler.busy
+)
+
+# Aborts images, fonts and trackers on session pages, stylesheets too while reading
+resource_blocker = ResourceBlocker()
+
+# Loop lag histogram plus a watchdog logging what blocks the loop
+loop_monitor = LoopMonitor()
+
+# Plain HTTP reads of server-rendered pages with a session's cookies
+direct_fetcher = DirectFetcher()
+
+# Property content reads, dropped for a room whenever it is modified
+content_cache = ContentCache(db["content_cache"] if CONTENT_CACHE_MONGO else None)
+
+# Background runner for the long browser operations behind /jobs
+job_manager = JobManager(jobs_collection)
+
+# Replayable logins per Beds24 identity
+auth_state_cache = AuthStateCache(auth_states_collection)
+
+# Per-session documents in the sessions collection, written in coalesced batches
+session_store = SessionStateStore(sessions_collection)
+
+# Sessions persisted in MongoDB whose browser context has not been rebuilt yet
+restorable_sessions = {}
+restore_locks = {}
+SESSION_RESTORE_MODE = os.environ.get("SESSION_RESTORE_MODE", "lazy")
+SESSION_RESTORE_CONCURRENCY = int(os.environ.get("SESSION_RESTORE_CONCURRENCY", "4"))
+restore_progress = {"mode": SESSION_RESTORE_MODE, "indexed": False, "eager_done": False, "total": 0, "restored": 0, "failed": 0}
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    start_executors()
+    loop_monitor.start()
+    await beds24_api.start()
+    await browser_pool.start()
+    browser_pool.on_browser_crash = drop_sessions_on_browser
+    resource_governor.start()
+    await session_registry.start()
+    await otp_fetcher.start(db["otp_claims"])
+
     # Load state from MongoDB on startup
     await load_state_from_mongodb()
 
     # Startup logic
-    asyncio.create_task(periodic_cleanup())
+    if SESSION_RESTORE_MODE == "eager":
+        asyncio.create_task(restore_sessions_eagerly())
+    expiry_scheduler.start()
+    warm_pool.start()
+    await job_manager.start(session_registry.worker_id, session_registry.live_workers)
+    await content_cache.start()
+    await direct_fetcher.start()
     yield
+    await job_manager.stop()
+    await expiry_scheduler.stop()
+    await warm_pool.stop()
+    await session_store.close()
+    await session_registry.stop()
+    otp_fetcher.stop_all()
+    await direct_fetcher.close()
+    await resource_governor.stop()
+    await browser_pool.stop()
+    await beds24_api.close()
+    await loop_monitor.stop()
+    shutdown_executors()
 
 app = FastAPI(lifespan=lifespan)
 
-async def save_state_to_mongodb():
+# Which worker holds each session, requests for another worker's sessions are forwarded to it
+session_registry = SessionRegistry(
+    sessions_collection,
+    workers_collection,
+    app,
+    on_adopt=lambda session_data: index_session(session_data),
+    on_lost=lambda session_id: drop_lost_session(session_id)
+)
+
+@app.middleware("http")
+async def route_to_session_owner(request: Request, call_next):
+    session_id = request.query_params.get("session_id")
+    if not session_id or session_registry.owns(session_id):
+        return await call_next(request)
     try:
-        state = {
-            "active_playwrights": {
-                session_id: {
-                    "url": page.url,
-                    "cookies": await context.cookies(),
-                    "local_storage": await context.storage_state()
-                }
-                for session_id, (playwright, browser, context, page) in active_playwrights.items()
-                if browser.is_connected() and not page.is_closed()
-            },
-            "last_access_times": last_access_times
-        }
-        serialized_state = json.loads(json_util.dumps(state))
-        await sessions_collection.update_one(
-            {"_id": "playwright_state"},
-            {"$set": {"data": serialized_state}},
-            upsert=True
+        address = await session_registry.route(session_id)
+    except Exception as e:
+        print(f"Error looking up session owner: {e}")
+        address = None
+    if address is None:
+        return await call_next(request)
+    if request.headers.get(FORWARDED_HEADER):
+        # Ownership moved while the request was in flight, never forward twice
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Session is moving between workers"},
+            headers={"Retry-After": "1"}
         )
+    return await session_registry.forward(request, address)
+
+async def save_session_state(session_id: str):
+    # Queue a targeted update of this session's document only
+    instance = active_playwrights.get(session_id)
+    if not instance:
+        return
+    playwright, browser, context, page = instance
+    try:
+        if browser.is_connected() and not page.is_closed():
+            session_store.update(
+                session_id,
+                url=page.url,
+                storage_state=await context.storage_state(),
+                last_access=last_access_times.get(session_id)
+            )
     except Exception as e:
         print(f"Error saving state to MongoDB: {e}")
-    
+
+async def migrate_legacy_state():
+    # Split the old single {"_id": "playwright_state"} document into per-session documents
+    state_data = await sessions_collection.find_one({"_id": "playwright_state"})
+    if not state_data:
+        return
+    state = await run_blocking(lambda: json_util.loads(json.dumps(state_data["data"])))
+    legacy_access_times = state.get("last_access_times", {})
+    for session_id, session_data in state.get("active_playwrights", {}).items():
+        session_store.update(
+            session_id,
+            in_use=True,
+            url=session_data["url"],
+            storage_state=session_data["local_storage"],
+            last_access=legacy_access_times.get(session_id)
+        )
+    await session_store.flush()
+    await sessions_collection.delete_one({"_id": "playwright_state"})
+
+def index_session(session_data: dict):
+    session_id = session_data["_id"]
+    if session_id in active_playwrights:
+        return
+    restorable_sessions[session_id] = session_data.get("url")
+    session_accounts[session_id] = session_data.get("username") or beds24_identity()
+    touch_session(session_id, session_data.get("last_access"))
+
 async def load_state_from_mongodb():
-    global active_playwrights, last_access_times
+    # Only index the saved sessions no live worker holds, their contexts are rebuilt on first access
     try:
-        state_data = await sessions_collection.find_one({"_id": "playwright_state"})
-        if state_data:
-            state = json_util.loads(json.dumps(state_data["data"]))
-            last_access_times = state.get("last_access_times", {})
-
-            for session_id, session_data in state.get("active_playwrights", {}).items():
-                playwright = await async_playwright().start()
-                browser = await playwright.chromium.launch(
-                    headless=True,  # Use the new headless mode
-                    args=["--no-sandbox"],
-                    timeout=300000  # Increase the timeout to 300 seconds
-                )
-                context = await browser.new_context()
-                page = await context.new_page()
-                await page.goto(session_data["url"])
-                await context.add_cookies(session_data["cookies"])
-
-                local_storage_data = session_data["local_storage"].get('origins', [])
-                if local_storage_data:
-                    local_storage_entries = local_storage_data[0].get('localStorage', [])
-                    await context.add_init_script(f"""
-                        window.localStorage.clear();
-                        const entries = {json.dumps(local_storage_entries)};
-                        for (const [key, value] of entries) {{
-                            window.localStorage.setItem(key, value);
-                        }}
-                    """)
-
-                active_playwrights[session_id] = (playwright, browser, context, page)
+        await migrate_legacy_state()
+        async for session_data in session_registry.adopt_orphans({"url": 1, "last_access": 1, "username": 1}):
+            index_session(session_data)
+        restore_progress["total"] = len(restorable_sessions)
     except Exception as e:
         traceback.print_exc()
         print(f"Error loading state from MongoDB: {e}")
-        
-async def start_playwright(session_id: str, username: str):
+    restore_progress["indexed"] = True
+
+async def restore_session(session_id: str):
+    lock = restore_locks.setdefault(session_id, asyncio.Lock())
+    async with lock:
+        if session_id in active_playwrights or session_id not in restorable_sessions:
+            return
+        start = time.perf_counter()
+        try:
+            session_data = await sessions_collection.find_one({"_id": session_id}, {"url": 1, "storage_state": 1})
+            if not session_data or "storage_state" not in session_data:
+                raise Exception("No saved browser state")
+            browser, context, page = await open_session_context(session_id, storage_state=session_data["storage_state"])
+            if SESSION_RESTORE_MODE == "eager" and session_data.get("url"):
+                await page.goto(session_data["url"])
+            active_playwrights[session_id] = (browser_pool.playwright, browser, context, page)
+            restore_progress["restored"] += 1
+            metrics.histogram("session_restore_ms").observe((time.perf_counter() - start) * 1000)
+            restorable_sessions.pop(session_id, None)
+        except HostAtCapacity as e:
+            # Left restorable, the client retries once memory frees up
+            print(f"Error restoring session {session_id}: {e}")
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(GOVERNOR_RETRY_AFTER)})
+        except Exception as e:
+            print(f"Error restoring session {session_id}: {e}")
+            restore_progress["failed"] += 1
+            restorable_sessions.pop(session_id, None)
+            last_access_times.pop(session_id, None)
+            expiry_scheduler.forget(session_id)
+            raise HTTPException(status_code=500, detail="Error restoring session")
+        finally:
+            restore_locks.pop(session_id, None)
+
+async def restore_sessions_eagerly():
+    semaphore = asyncio.Semaphore(SESSION_RESTORE_CONCURRENCY)
+
+    async def restore_one(session_id):
+        async with semaphore:
+            try:
+                await restore_session(session_id)
+            except HTTPException:
+                pass
+
     try:
-        playwright = await async_playwright().start()
-        browser = await playwright.chromium.launch()
-        
-        # Create a new context and a blank page
-        context = await browser.new_context()
+        await asyncio.gather(*(restore_one(session_id) for session_id in list(restorable_sessions)))
+    finally:
+        restore_progress["eager_done"] = True
+
+async def open_session_context(session_id: str, headless: bool = True, admit: bool = True, **kwargs):
+    # A pooled-browser context with the session's request blocking in place,
+    # once the governor has room for it (recycling replaces a context, it skips admission)
+    async with resource_governor.admit() if admit else nullcontext():
+        browser, context = await browser_pool.new_context(headless=headless, **kwargs)
+        await resource_blocker.install(context, session_id)
         page = await context.new_page()
+    return browser, context, page
+
+async def ensure_session(session_id: str):
+    if session_id not in active_playwrights and session_id in restorable_sessions:
+        await restore_session(session_id)
+        
+async def start_playwright(session_id: str, username: str, storage_state: Optional[dict] = None):
+    try:
+        # Create an isolated context and a blank page on a pooled browser,
+        # seeded with a cached login when we have one
+        browser, context, page = await open_session_context(session_id, storage_state=storage_state)
         
         # Store the sessions in memory
-        active_playwrights[session_id] = (playwright, browser, context, page)
-        last_access_times[session_id] = datetime.datetime.now(timezone.utc)
-        await save_state_to_mongodb()
+        active_playwrights[session_id] = (browser_pool.playwright, browser, context, page)
+        touch_session(session_id)
+        session_accounts[session_id] = username or beds24_identity()
+        await session_registry.claim(session_id)
+    except BrowserPoolExhausted as e:
+        print(f"Error starting Playwright: {e}")
+        raise HTTPException(status_code=503, detail="No browser capacity available")
+    except HostAtCapacity as e:
+        print(f"Error starting Playwright: {e}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(GOVERNOR_RETRY_AFTER)})
     except Exception as e:
         print(f"Error starting Playwright: {e}")
         raise HTTPException(status_code=500, detail="Error starting Playwright")
 
-    # Record only the session ID and status in the database
-    await sessions_collection.insert_one({
-        "_id": session_id,
-        "username": username,
-        "in_use": True,
-        "created_at": datetime.datetime.now(timezone.utc)
-    })
+    # Record the session and its status in its own document
+    session_store.update(
+        session_id,
+        username=username,
+        in_use=True,
+        created_at=datetime.datetime.now(timezone.utc)
+    )
+    await save_session_state(session_id)
 
 async def access_playwright(session_id: str):
     # Update the last access time whenever the session is accessed
     if session_id in last_access_times:
-        last_access_times[session_id] = datetime.datetime.now(timezone.utc)
+        touch_session(session_id)
+        session_store.update(session_id, last_access=last_access_times[session_id])
     else:
         raise HTTPException(status_code=404, detail="Session not found")
 
 async def cleanup_playwright_instance(session_id: str):
     # Retrieve the Playwright instance from memory
     instance = active_playwrights.pop(session_id, None)
+    if session_id in restorable_sessions:
+        # Never rebuilt since startup, only its saved state needs dropping
+        restorable_sessions.pop(session_id, None)
+        session_store.update(session_id, unset=("url", "storage_state"), in_use=False)
     if instance:
         playwright, browser, context, page = instance
 
-        # Close the browser and Playwright instance
-        await page.close()
-        await context.close()
-        await browser.close()
-        await playwright.stop()
-
-        # Update the database to mark the session as not in use
-        await sessions_collection.update_one(
-            {"_id": session_id},
-            {"$set": {"in_use": False}}
-        )
-
-async def periodic_cleanup():
-    while True:
-        await asyncio.sleep(3600)  # Run the cleanup task every hour
-        current_time = datetime.datetime.now(timezone.utc)
-        for session_id, last_access in list(last_access_times.items()):
-            last_access = last_access.replace(tzinfo=timezone.utc)  # Ensure last_access is offset-aware
-            if current_time - last_access > TIMEOUT_PERIOD:
-                await cleanup_playwright_instance(session_id)
-        await save_state_to_mongodb()
+        # Close the session's context, the pooled browser stays up
+        await browser_pool.release(context)
+        resource_blocker.forget(session_id)
+        direct_fetcher.forget(session_id)
+        resource_governor.forget(session_id)
+
+        # Mark the session as not in use and drop its browser state
+        session_store.update(session_id, unset=("url", "storage_state"), in_use=False)
+
+def touch_session(session_id: str, last_access: Optional[datetime.datetime] = None):
+    # Record the access and push the session's expiry deadline back
+    last_access = (last_access or datetime.datetime.now(timezone.utc)).replace(tzinfo=timezone.utc)
+    last_access_times[session_id] = last_access
+    expiry_scheduler.touch(session_id, last_access)
+
+async def expire_session(session_id: str):
+    await cleanup_playwright_instance(session_id)
+    last_access_times.pop(session_id, None)
+    session_accounts.pop(session_id, None)
+    await session_registry.release(session_id)
+
+async def drop_lost_session(session_id: str):
+    # Another worker took the session over, let go of it here without touching its saved state
+    instance = active_playwrights.pop(session_id, None)
+    restorable_sessions.pop(session_id, None)
+    last_access_times.pop(session_id, None)
+    session_accounts.pop(session_id, None)
+    expiry_scheduler.forget(session_id)
+    resource_blocker.forget(session_id)
+    direct_fetcher.forget(session_id)
+    resource_governor.forget(session_id)
+    if instance:
+        playwright, browser, context, page = instance
+        await browser_pool.release(context)
+
+async def evict_session(session_id: str):
+    # Free the context under memory pressure, the session is rebuilt from its saved state on next access
+    async with session_scheduler.slot(session_id):
+        if session_id not in active_playwrights:
+            return
+        await save_session_state(session_id)
+        await session_store.flush()
+        playwright, browser, context, page = active_playwrights.pop(session_id)
+        restorable_sessions[session_id] = page.url
+        resource_blocker.forget(session_id)
+        direct_fetcher.forget(session_id)
+        resource_governor.forget(session_id)
+        await browser_pool.release(context)
+
+async def recycle_session(session_id: str):
+    # Swap an oversized context for a fresh one with the same cookies, storage and page
+    async with session_scheduler.slot(session_id):
+        if session_id not in active_playwrights:
+            return
+        # Persisted first, a failed reopen leaves the session restorable
+        await save_session_state(session_id)
+        await session_store.flush()
+        playwright, browser, context, page = active_playwrights[session_id]
+        url = page.url
+        headless = browser_pool.is_headless(browser)
+        storage_state = await context.storage_state()
+        active_playwrights.pop(session_id)
+        await browser_pool.release(context)
+        direct_fetcher.forget(session_id)
+        try:
+            browser, context, page = await open_session_context(
+                session_id, headless=headless, admit=False, storage_state=storage_state
+            )
+        except Exception as e:
+            print(f"Error reopening recycled session {session_id}: {e}")
+            restorable_sessions[session_id] = url
+            return
+        active_playwrights[session_id] = (browser_pool.playwright, browser, context, page)
+        if url and url != "about:blank":
+            try:
+                await page.goto(url)
+            except Exception as e:
+                print(f"Error reloading recycled session {session_id}: {e}")
+
+# Closes idle sessions when their TTL runs out and sheds the oldest ones under memory pressure
+expiry_scheduler = ExpiryScheduler(
+    expire=expire_session,
+    evict=evict_session,
+    is_busy=session_scheduler.busy,
+    evictable=lambda session_id: session_id in active_playwrights and not warm_pool.owns(session_id)
+)
 
 async def close_playwright(session_id: str):
-    playwright, browser, context, page = active_playwrights[session_id]
-    try:
-        await browser.close()
-    except Exception as e:
-        print(f"Error closing browser for session {session_id}: {e}")
-    try:
-        await playwright.stop()
-    except Exception as e:
-        print(f"Error stopping playwright for session {session_id}: {e}")
-    await sessions_collection.delete_one({"_id": session_id})
+    instance = active_playwrights.pop(session_id, None)
+    last_access_times.pop(session_id, None)
+    expiry_scheduler.forget(session_id)
+    restorable_sessions.pop(session_id, None)
+    session_accounts.pop(session_id, None)
+    resource_blocker.forget(session_id)
+    direct_fetcher.forget(session_id)
+    resource_governor.forget(session_id)
+    if instance:
+        playwright, browser, context, page = instance
+        await browser_pool.release(context)
+    await session_registry.release(session_id)
+    session_store.delete(session_id)
+
+def drop_sessions_on_browser(browser: Browser):
+    # A pooled browser died, every context it hosted is gone with it
+    for session_id, (_, session_browser, _, _) in list(active_playwrights.items()):
+        if session_browser is browser:
+            # Rebuilt from its last saved state on next access
+            print(f"Dropping session {session_id} after browser crash")
+            active_playwrights.pop(session_id, None)
+            restorable_sessions[session_id] = None
 
 async def get_browser(session_id: str) -> Browser:
     # Retrieve the browser for the given session ID
+    await ensure_session(session_id)
     if session_id not in active_playwrights:
         raise HTTPException(status_code=404, detail="Session not found")
     _, browser, _, _ = active_playwrights[session_id]
     return browser
 
 async def switch_to_non_headless(session_id: str):
-    browser = await get_browser(session_id)
-    context = browser.contexts[0]
-    await context.close()
-    await browser.close()
-    playwright = await async_playwright().start()
-    browser = await playwright.chromium.launch(headless=False)
-    context = await browser.new_context()
-    page = await context.new_page()
-    active_playwrights[session_id] = (active_playwrights[session_id][0], browser, context, page)
-    await save_state_to_mongodb()
+    context = await get_context(session_id)
+    await browser_pool.release(context)
+    browser, context, page = await open_session_context(session_id, headless=False)
+    active_playwrights[session_id] = (browser_pool.playwright, browser, context, page)
+    await save_session_state(session_id)
 
 async def switch_to_headless(session_id: str):
-    browser = await get_browser(session_id)
-    context = browser.contexts[0]
-    await context.close()
-    await browser.close()
-    playwright = await async_playwright().start()
-    browser = await playwright.chromium.launch()
-    context = await browser.new_context()
-    page = await context.new_page()
-    active_playwrights[session_id] = (active_playwrights[session_id][0], browser, context, page)
-    await save_state_to_mongodb()
+    context = await get_context(session_id)
+    await browser_pool.release(context)
+    browser, context, page = await open_session_context(session_id)
+    active_playwrights[session_id] = (browser_pool.playwright, browser, context, page)
+    await save_session_state(session_id)
 
 async def get_context(session_id: str):
     # Retrieve the context for the given session ID
+    await ensure_session(session_id)
     if session_id not in active_playwrights:
         raise HTTPException(status_code=404, detail="Session not found")
     _, _, context, _ = active_playwrights[session_id]
@@ -229,36 +490,39 @@ async def restore_context_state(context, cookies, local_storage):
 
 async def get_session_instance(session_id: str):
     # Retrieve the Playwright instance for the given session ID
+    await ensure_session(session_id)
     if session_id not in active_playwrights:
         raise HTTPException(status_code=404, detail="Session not found")
-    browser = await get_browser(session_id)
-    context = browser.contexts[0]
+    _, browser, context, _ = active_playwrights[session_id]
     page = context.pages[0]
     return browser, context, page
 
 async def authenticate(session_id: str, phpsessid: str = None):
     if phpsessid:
-        browser = await get_browser(session_id)
-        context = browser.contexts[0]
-        page = context.pages[0]
+        browser, context, page = await get_session_instance(session_id)
         await page.set_extra_http_headers({"Cookie": f"PHPSESSID={phpsessid}"})
         await page.goto("https://beds24.com/control2.php")
         cookies = await authenticator.get_cookies_from_page(page)
         return {"status": "success", "cookies": cookies}
-    username = os.environ.get("BEDS24_USERNAME") if os.environ.get("BEDS24_USERNAME") else "channel.manager"
+    username = beds24_identity()
     password = os.environ.get("BEDS24_PASSWORD") if os.environ.get("BEDS24_PASSWORD") else "P0s>b.m2s4]e"
     # await switch_to_non_headless(session_id)
-    browser = await get_browser(session_id)
-    context = browser.contexts[0]
-    page = context.pages[0]
+    browser, context, page = await get_session_instance(session_id)
     await page.goto("https://beds24.com/control2.php")
-    await page.wait_for_timeout(3000)
+    # Either a cached login redirects us away or the login form's captcha shows up
+    await waits.settle(
+        "login_page", 3000,
+        waits.url_changed_from(page, "https://beds24.com/control2.php"),
+        waits.selector(page, "iframe[src*='recaptcha']"),
+        any_of=True
+    )
     try:
        # Wait for the reCAPTCHA iframe to load
         current_url = page.url
         if current_url != "https://beds24.com/control2.php":
+            # Already logged in, the context was seeded with a valid cached login
             cookies = await authenticator.get_cookies_from_page(page)
-            return {"status": "success", "cookies": cookies}
+            return {"status": "success", "cookies": cookies, "reused_login": True}
             
         # Move mouse naturally to username field
         # await authenticator.move_mouse_naturally(page, page, "input[name='username']")
@@ -381,24 +645,16 @@ async def authenticate(session_id: str, phpsessid: str = None):
             username = os.environ.get("GMAIL_APP_EMAIL") if os.environ.get("GMAIL_APP_EMAIL") else "channel.manager@findahost.io"
             app_password = os.environ.get("GMAIL_APP_PASSWORD") if os.environ.get("GMAIL_APP_PASSWORD") else "efbdsqfyxefvtptb"
             code = await authenticator.check_gmail(username, app_password)
-            print(f"Code on iteration -1: {code}")
-            f_attempt = 0
-            while code.get('status') != 'success':
-                await page.wait_for_timeout(10000)
-                code = await authenticator.check_gmail(username, app_password)
-                print(f"Code on iteration {f_attempt}: {code}")
-                f_attempt += 1
-                await asyncio.sleep(10)
-                if f_attempt == 10:
-                    return {"status": "error", "message": "Failed to retrieve OTP code"}
+            print(f"OTP retrieval: {code}")
+            if code.get('status') != 'success':
+                return {"status": "error", "message": "Failed to retrieve OTP code"}
             if code.get('sender') == 'support@beds24.com':
                 print("Code is login code")
                 login_code = code.get('code')
                 await page.fill("input[name='logincode']", str(login_code))
-                await page.wait_for_timeout(1000)
-                await page.click("button[type='submit']")
+                async with waits.navigation(page, "login_code", 4000):
+                    await page.click("button[type='submit']")
                 print("Login code entered and submitted")
-                await page.wait_for_timeout(3000)
                 current_url = page.url
                 if current_url != "https://beds24.com/control2.php":
                     print("Logged in successfully")
@@ -416,7 +672,7 @@ async def authenticate(session_id: str, phpsessid: str = None):
             elif code.get('sender') == 'ticket@beds24.com':
                 print("Code is URL")
                 await page.goto(code.get('code'))
-                await page.wait_for_timeout(3000)
+                await waits.settle("login_link", 3000, waits.network_idle(page))
                 current_url = page.url
                 if current_url != "https://beds24.com/control2.php":
                     print("Logged in successfully")
@@ -427,7 +683,7 @@ async def authenticate(session_id: str, phpsessid: str = None):
                     # context = browser.contexts[0]
                     # await restore_context_state(context, cookies, local_storage)
                     return {"status": "success", "cookies": cookies_}
-            await save_state_to_mongodb()
+            await save_session_state(session_id)
         
         # Move to and click login button
         
@@ -435,15 +691,19 @@ async def authenticate(session_id: str, phpsessid: str = None):
         traceback.print_exc()
         return {"status":"error", "message":"reCAPTCHA not found or timeout"}
 
+# The XHRs sent by the API invite scope submit and the channel push confirms,
+# each posted back to the control page its modal lives on
+INVITE_SCOPE_RESPONSE = waits.xhr(os.environ.get("INVITE_SCOPE_XHR_URL", "beds24.com/control3.php?pagetype=apiv2"))
+AIRBNB_PUSH_RESPONSE = waits.xhr(os.environ.get("AIRBNB_PUSH_XHR_URL", "beds24.com/control3.php?pagetype=syncroniserairbnbmap"))
+BOOKINGCOM_PUSH_RESPONSE = waits.xhr(os.environ.get("BOOKINGCOM_PUSH_XHR_URL", "beds24.com/control3.php?pagetype=syncroniserbookingcomxmlsend"))
+
 async def get_invite_code(session_id: str):
-    browser = await get_browser(session_id)
-    context = browser.contexts[0]
-    page = context.pages[0]
+    browser, context, page = await get_session_instance(session_id)
     await page.goto("https://beds24.com/control3.php?pagetype=apiv2")
-    await page.wait_for_timeout(2000)
+    await waits.settle("invite_code_page", 2000, waits.selector(page, "#settingformid > div > div > div > div.card-body > button", "visible"))
     button = await page.query_selector("#settingformid > div > div > div > div.card-body > button") 
     await button.click()
-    await page.wait_for_timeout(2000)
+    await waits.settle("invite_code_modal", 2000, waits.selector(page, "#scopeModalSubmit", "visible"))
     readall = await page.query_selector("#massSelectorReadAll")
     await readall.click()
     writeall = await page.query_selector("#massSelectorWriteAll")
@@ -453,8 +713,9 @@ async def get_invite_code(session_id: str):
     access_selector = await page.query_selector("#scopePropertySelect")
     await access_selector.select_option("1")
     submite = await page.query_selector("#scopeModalSubmit")
-    await submite.click()
-    await page.wait_for_timeout(1000)
+    async with waits.response(page, "invite_code_submit", 1000, INVITE_SCOPE_RESPONSE):
+        await submite.click()
+    await waits.settle("invite_code_modal_close", 0, waits.selector(page, "#scopeModalSubmit", "hidden"))
     invite_code = await page.query_selector("#invitetokenlisttable > tbody > tr > td.sorting_1 > span")
     return await invite_code.inner_text()
 
@@ -466,50 +727,75 @@ async def get_current_user_refresh_token(invite_code):
     #     return user.get("refresh_token")
     # else:
     #     return None
-    url = "https://beds24.com/api/v2/authentication/setup"
+    path = "/authentication/setup"
     headers = {
         "accept": "application/json",
         "code": invite_code,
         "deviceName": "findahost"
     }
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=headers)
-        if response.status_code == 200:
-            r = response.json()
-            return r
-        else:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
+    response = await beds24_api.get(path, "authentication_setup", headers=headers, idempotent=False)
+    if response.status_code == 200:
+        r = response.json()
+        return r
+    else:
+        raise HTTPException(status_code=response.status_code, detail=response.text)
 
-async def get_authtoken_from_refresh_token(refresh_token):
-    url = "https://beds24.com/api/v2/authentication/token"
+async def fetch_authtoken_from_refresh_token(refresh_token):
+    path = "/authentication/token"
     headers = {
         "accept": "application/json",
         "refreshToken": refresh_token
     }
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=headers)
-        if response.status_code == 200:
-            r = response.json()
-            return r.get("token")
-        else:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
+    response = await beds24_api.get(path, "authentication_token", headers=headers)
+    if response.status_code == 200:
+        return response.json()
+    else:
+        raise HTTPException(status_code=response.status_code, detail=response.text)
 
-@app.post("/generate_session", tags=["Utilities"])
-async def generate_session(request: SessionRequest, background_tasks: BackgroundTasks):
-    load_dotenv()
+# Access tokens cached per refresh token, shared across workers
+token_manager = TokenManager(refresh_tokens_collection, fetch_authtoken_from_refresh_token)
+
+async def get_authtoken_from_refresh_token(refresh_token):
+    return await token_manager.get(refresh_token)
+
+async def resolve_api_token(token: Optional[str], refresh_token: Optional[str]):
+    if token:
+        return token
+    if refresh_token:
+        return await get_authtoken_from_refresh_token(refresh_token)
+    raise HTTPException(status_code=400, detail="Either token or refresh_token is required")
+
+async def raise_api_error(response, token: Optional[str], refresh_token: Optional[str]):
+    # A rejected cached token must not be served again
+    if response.status_code == 401 and refresh_token and not token:
+        await token_manager.invalidate(refresh_token)
+    raise HTTPException(status_code=response.status_code, detail=response.text)
+
+def beds24_identity():
+    return os.environ.get("BEDS24_USERNAME") if os.environ.get("BEDS24_USERNAME") else "channel.manager"
+
+async def create_authenticated_session(username: Optional[str] = None, max_retries: int = 5):
     # Persist authentication
     auth_retries = 0
-    session_id = str(uuid.uuid4())
-
+    identity = beds24_identity()
     while True:
         session_id = str(uuid.uuid4())
-        await start_playwright(session_id, request.username)
+        storage_state = await auth_state_cache.get(identity)
+        await start_playwright(session_id, username, storage_state)
         try:
-            authenticated = await authenticate(session_id, None)
+            with resource_blocker.flow(session_id, "login"):
+                authenticated = await authenticate(session_id, None)
             if authenticated.get("status") == "success":
-                break
+                if authenticated.pop("reused_login", False) and storage_state:
+                    metrics.counter("auth_state_replays_valid").inc()
+                else:
+                    if storage_state:
+                        metrics.counter("auth_state_replays_stale").inc()
+                    context = await get_context(session_id)
+                    await auth_state_cache.put(identity, await context.storage_state())
+                return session_id, authenticated
             else:
                 print(f"Error authenticating session {session_id} Retrying...")
                 await close_playwright(session_id)
@@ -517,10 +803,37 @@ async def generate_session(request: SessionRequest, background_tasks: Background
             traceback.print_exc()
             print(f"Error authenticating session {session_id}: {e}. Retrying...")
             await close_playwright(session_id)
+        if storage_state:
+            # Don't replay a login that just failed us
+            await auth_state_cache.invalidate(identity)
         auth_retries += 1
-        if(auth_retries >= 5):
+        if(auth_retries >= max_retries):
+            return None
+
+# Authenticated master-account sessions refilled in the background
+warm_pool = WarmSessionPool(
+    create_session=lambda: create_authenticated_session(max_retries=1),
+    is_alive=lambda session_id: session_id in active_playwrights
+)
+
+@app.post("/generate_session", tags=["Utilities"])
+async def generate_session(request: SessionRequest, background_tasks: BackgroundTasks):
+    load_dotenv()
+    start = time.perf_counter()
+    warm = warm_pool.acquire()
+    if warm:
+        session_id, authenticated = warm
+        touch_session(session_id)
+        session_store.update(session_id, username=request.username, created_at=datetime.datetime.now(timezone.utc))
+    else:
+        report_progress("authenticating")
+        created = await create_authenticated_session(request.username)
+        if not created:
             return {"status": "error", "message": "Failed to authenticate session"}
+        session_id, authenticated = created
+    metrics.histogram("generate_session_ms." + ("warm" if warm else "cold")).observe((time.perf_counter() - start) * 1000)
     if request.username:
+        report_progress("switching_user")
         user_switched = await switch_user(session_id, request.username)
         if user_switched.get("status") == "error":
             return {"status": "error", "session_id": session_id, "message": user_switched.get("message")}
@@ -529,21 +842,22 @@ async def generate_session(request: SessionRequest, background_tasks: Background
         return {"status": "success", "session_id": session_id, "cookies": authenticated.get("cookies")}
 
 @app.get("/test_session_authentication", tags=["Utilities"])
+@session_scheduler.exclusive
 async def test_session(session_id: str):
     await access_playwright(session_id)
-    browser = await get_browser(session_id)
-    context = browser.contexts[0] 
+    context = await get_context(session_id)
     if not context.pages:
         raise HTTPException(status_code=404, detail="No open pages found")
     page = context.pages[0]
     await page.goto("https://beds24.com/control3.php?pagetype=properties")
-    await page.wait_for_timeout(3000)
+    await waits.settle("test_session", 3000, waits.network_idle(page))
     if page.url == "https://beds24.com/control3.php?pagetype=properties":
         return {"status": "success", "message": "Session is authenticated"}
     else:
         return {"status": "error", "message": "Session is not authenticated"}
 
 @app.get("/get_session_information", tags=["Utilities"])
+@session_scheduler.exclusive
 async def get_session_information(session_id: str):
     is_authenticated = await test_session(session_id)
     if is_authenticated.get("status") == "success":
@@ -553,12 +867,13 @@ async def get_session_information(session_id: str):
         user_element = await page.query_selector("body > div.container-fluid.b24container-fluid > div > main > div.background_box > div.innerbackground_boxhide > div.innerbackground_box > div.twelvecol.first.setting_row.menusetting-AdministratorEmail > div.ninecol.last > div > div")
         user_name = await user_element.inner_text()
         cookies = await context.cookies()
-        await save_state_to_mongodb()
+        await save_session_state(session_id)
         return {"status":"success", "username":user_name, "cookies":cookies}
     else:
         return {"status": "error", "message": "Session is not authenticated"}
 
 @app.get("/switch-user", tags=["Utilities"])
+@session_scheduler.exclusive
 async def switch_user(session_id: str, username: str):
     try:
         browser, context, page = await get_session_instance(session_id)
@@ -570,14 +885,18 @@ async def switch_user(session_id: str, username: str):
             await page.click("#settingformid > div > div.innerbackground_boxhide > div.setting_footer_section > button")
             await page.wait_for_selector('#_accountlist_admintable')
         selector = f'//table[@id="_accountlist_admintable"]//tr[td[2][normalize-space()="{username}"]]//button[@value="Log into Account"]'
-        await page.click(selector)
-        await page.wait_for_timeout(1000)
-        await save_state_to_mongodb()
+        async with waits.navigation(page, "switch_user", 1000):
+            await page.click(selector)
+        session_accounts[session_id] = username
+        session_store.update(session_id, username=username)
+        direct_fetcher.forget(session_id)
+        await save_session_state(session_id)
         return {"status": "success"}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 @app.get("/get_refresh_token_from_session", tags=["Utilities"])
+@session_scheduler.exclusive
 async def get_fresh_token_from_session(session_id: str):
     is_authenticated = await test_session(session_id)
     if is_authenticated.get("status") == "success":
@@ -594,26 +913,25 @@ async def get_fresh_token_from_session(session_id: str):
             return {"status": "error", "message": "Refresh token not found for user "+username}
         
 @app.get("/get_airbnb_userIds_on_an_account", tags=["Airbnb"])
-async def get_airbnb_userIds_on_an_account(token: str):
-    url = "https://beds24.com/api/v2/channels/airbnb/users"
+async def get_airbnb_userIds_on_an_account(token: Optional[str] = None, refresh_token: Optional[str] = None):
+    path = "/channels/airbnb/users"
     headers = {
         "accept": "application/json",
-        "token": token
+        "token": await resolve_api_token(token, refresh_token)
     }
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=headers)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
+    response = await beds24_api.get(path, "airbnb_users", headers=headers)
+    if response.status_code == 200:
+        return response.json()
+    else:
+        await raise_api_error(response, token, refresh_token)
 
 @app.post("/import_new_property_from_airbnb", tags=["Airbnb"])
-async def import_new_property_from_airbnb(token: str, airbnb_user_id: str, airbnb_listing_id: str):
-    url = "https://beds24.com/api/v2/channels/airbnb"
+async def import_new_property_from_airbnb(airbnb_user_id: str, airbnb_listing_id: str, token: Optional[str] = None, refresh_token: Optional[str] = None):
+    path = "/channels/airbnb"
     headers = {
         "accept": "application/json",
-        "token": token,
+        "token": await resolve_api_token(token, refresh_token),
         "Content-Type": "application/json"
     }
     data = [
@@ -625,23 +943,22 @@ async def import_new_property_from_airbnb(token: str, airbnb_user_id: str, airbn
         }
     ]
 
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, headers=headers, json=data)
-        if response.status_code == 200:
-            r = response.json()
-            return {
-                "status": "success",
-                "details": r
-            }
-        else:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
+    response = await beds24_api.post(path, "airbnb_import_new", headers=headers, json=data)
+    if response.status_code == 200:
+        r = response.json()
+        return {
+            "status": "success",
+            "details": r
+        }
+    else:
+        await raise_api_error(response, token, refresh_token)
 
 @app.post("/sync_properties_from_airbnb", tags=["Airbnb"])
-async def sync_properties_from_airbnb(token: str, airbnb_user_id: str, airbnb_listing_id: str, beds24_propertyId: str):
-    url = "https://beds24.com/api/v2/channels/airbnb"
+async def sync_properties_from_airbnb(airbnb_user_id: str, airbnb_listing_id: str, beds24_propertyId: str, token: Optional[str] = None, refresh_token: Optional[str] = None):
+    path = "/channels/airbnb"
     headers = {
         "accept": "application/json",
-        "token": token,
+        "token": await resolve_api_token(token, refresh_token),
         "Content-Type": "application/json"
     }
     data = [
@@ -654,120 +971,155 @@ async def sync_properties_from_airbnb(token: str, airbnb_user_id: str, airbnb_li
         }
     ]
 
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, headers=headers, json=data)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-
-@app.get("/get_airbnb_property_content_extensive", tags=["Airbnb"])
-async def get_airbnb_property_content_extensive(session_id: str, beds24roomId: str = "533105"):
-    browser, context, page = await get_session_instance(session_id)
+    response = await beds24_api.post(path, "airbnb_import_existing", headers=headers, json=data)
+    if response.status_code == 200:
+        return response.json()
+    else:
+        await raise_api_error(response, token, refresh_token)
+
+@app.post("/bulk_import_from_airbnb", tags=["Airbnb"])
+async def bulk_import_from_airbnb(request: AirbnbBulkImportRequest, token: Optional[str] = None, refresh_token: Optional[str] = None):
+    # Streams one NDJSON line per listing as its chunk completes, then a summary line
+    api_token = await resolve_api_token(token, refresh_token)
+
+    async def renew_api_token():
+        # The cached token was rejected mid-import, don't serve it to anyone again
+        await token_manager.invalidate(refresh_token)
+        return await token_manager.get(refresh_token)
+
+    refresh = renew_api_token if refresh_token and not token else None
+
+    async def stream():
+        async for result in import_listings(beds24_api, api_token, request.listings, request.chunk_size, request.concurrency, request.max_attempts, refresh):
+            yield json.dumps(result, default=str) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+async def cached_read(session_id: str, channel: str, room_id: str, view: str, cache_control: Optional[str], read, fetch=None):
+    # Cache hits and direct fetches are answered without waiting for the session's page
+    account = session_accounts.get(session_id)
+    if account and not no_cache(cache_control):
+        cached = await content_cache.get(account, channel, room_id, view)
+        if cached is not None:
+            return cached
+    # Recorded before reading, a modify invalidating the room meanwhile makes the put a no-op
+    generation = await content_cache.generation(account, channel, room_id) if account else None
+    value = await fetch(session_id, room_id) if fetch is not None else None
+    if value is not None and session_accounts.get(session_id) != account:
+        # Fetched outside the session's slot and the session switched accounts meanwhile
+        value = None
+    if value is None:
+        async with session_scheduler.slot(session_id):
+            browser, context, page = await get_session_instance(session_id)
+            with resource_blocker.flow(session_id, "read"):
+                value = await read(page, room_id)
+    # Not cached when the session switched accounts while reading
+    if generation is not None and session_accounts.get(session_id) == account:
+        await content_cache.put(account, channel, room_id, view, value, generation)
+    return value
+
+async def invalidate_room_content(session_id: str, channel: str, room_id: str):
+    account = session_accounts.get(session_id)
+    if account:
+        await content_cache.invalidate(account, channel, room_id)
+
+async def cache_room_content(session_id: str, channel: str, room_id: str, view: str, value: dict):
+    account = session_accounts.get(session_id)
+    if account:
+        await content_cache.put(account, channel, room_id, view, value)
+
+VIEW_MAIN = "body > div.container-fluid.b24container-fluid > div > main"
+AIRBNB_VIEW_TABLES = {
+    "listingdetails": f"{VIEW_MAIN} > table:nth-child(13)",
+    "listingdescriptions": f"{VIEW_MAIN} > table:nth-child(17)",
+    "priceandavailability": f"{VIEW_MAIN} > table:nth-child(25)",
+    "listingrooms": f"{VIEW_MAIN} > table:nth-child(29)",
+    "listingpictures": f"{VIEW_MAIN} > table:nth-child(33)",
+}
+BOOKINGCOM_VIEW_TABLES = {
+    "address": f"{VIEW_MAIN} > table:nth-child(15)",
+    "property_details": f"{VIEW_MAIN} > table:nth-child(19)",
+    "rules": f"{VIEW_MAIN} > table:nth-child(23)",
+    "profile": f"{VIEW_MAIN} > table:nth-child(27)",
+    "pictures": f"{VIEW_MAIN} > table:nth-child(31)",
+    "bookingcom_content": f"{VIEW_MAIN} > table:nth-child(36)",
+}
+BOOKINGCOM_VIEW_SELECT = f"{VIEW_MAIN} > form > select"
+
+async def fetch_airbnb_view(session_id: str, beds24roomId: str) -> Optional[dict]:
+    return await direct_fetcher.get(
+        session_id, await get_context(session_id),
+        f"https://beds24.com/control3.php?pagetype=syncroniserairbnbview&id={beds24roomId}",
+        "airbnb_view", lambda html: run_cpu(extract_tables, html, AIRBNB_VIEW_TABLES)
+    )
+
+async def fetch_bookingcom_view(session_id: str, beds24roomId: str) -> Optional[dict]:
+    return await direct_fetcher.submit_select(
+        session_id, await get_context(session_id),
+        "https://beds24.com/control3.php?pagetype=syncroniserbookingcomxmlview",
+        "bookingcom_view", BOOKINGCOM_VIEW_SELECT, beds24roomId,
+        lambda html: run_cpu(extract_tables, html, BOOKINGCOM_VIEW_TABLES)
+    )
+
+async def read_airbnb_view(page, beds24roomId: str) -> dict:
     await page.goto(f"https://beds24.com/control3.php?pagetype=syncroniserairbnbview&id={beds24roomId}")
-    await page.wait_for_timeout(3000)
-    
-    elements_selectors = {
-        "listingdetails": "body > div.container-fluid.b24container-fluid > div > main > table:nth-child(13)",
-        "listingdescriptions": "body > div.container-fluid.b24container-fluid > div > main > table:nth-child(17)",
-        "priceandavailability": "body > div.container-fluid.b24container-fluid > div > main > table:nth-child(25)",
-        "listingrooms": "body > div.container-fluid.b24container-fluid > div > main > table:nth-child(29)",
-        "listingpictures": "body > div.container-fluid.b24container-fluid > div > main > table:nth-child(33)",
-    }
-    
-    data = {}
-
-    for key, selector in elements_selectors.items():
-        element_handle = await page.query_selector(selector)
-        if element_handle:
-            html_content = await element_handle.inner_html()
-            # Parse the HTML table to a dictionary
-            table_data = parse_table(html_content)
-            data[key] = table_data
-    return data
+    await waits.settle("airbnb_view", 3000, waits.selector(page, f"{VIEW_MAIN} > table"))
+    # One snapshot of the page, every table parsed from it in a single pass
+    return await run_cpu(extract_tables, await page.content(), AIRBNB_VIEW_TABLES)
 
-@app.get("/get_airbnb_property_content", tags=["Airbnb"])
-async def get_airbnb_property_content(session_id: str, beds24roomId: str = "533105"):
-    browser, context, page = await get_session_instance(session_id)
-    await page.goto(f"https://beds24.com/control3.php?pagetype=syncroniserairbnbroom&id={beds24roomId}")
-    await page.wait_for_timeout(3000)
-    results = {}
-
-    listing_details = {
-        "publish": await page.eval_on_selector("#publish option:checked", "el => el.innerText"),
-        "propertytypegroup": await page.eval_on_selector("#proptypegroup option:checked", "el => el.innerText"),
-        "listingtype": await page.eval_on_selector("#listingtype option:checked", "el => el.innerText"),
-        "updateaddress": await page.eval_on_selector("#hideaddress option:checked", "el => el.innerText"),
-        "picsource": await page.eval_on_selector("#picsource option:checked", "el => el.innerText"),
-        "bathroomshared": await page.eval_on_selector("#bathroomshared option:checked", "el => el.innerText"),
-        "commonshared": await page.eval_on_selector("#commonshared option:checked", "el => el.innerText"),
-        "checkincategory": await page.eval_on_selector("#checkincategory option:checked", "el => el.innerText"),
-        "checkindesc": await page.eval_on_selector("#checkindesc", "el => el.value"),
-        "housemanual": await page.eval_on_selector("#housemanual", "el => el.value")
-    }
-
-    checkout_instructions = {
-        "checkoutrk": await page.eval_on_selector("#checkoutrk", "el => el.value"),
-        "checkouttto": await page.eval_on_selector("#checkouttto", "el => el.value"),
-        "checkoutt": await page.eval_on_selector("#checkoutt", "el => el.value"),
-        "checkoutlu": await page.eval_on_selector("#checkoutlu", "el => el.value"),
-        "checkoutgt": await page.eval_on_selector("#checkoutgt", "el => el.value"),
-        "checkoutar": await page.eval_on_selector("#checkoutar", "el => el.value")
-    }
+async def read_airbnb_room(page, room_id: str) -> dict:
+    await page.goto(f"https://beds24.com/control3.php?pagetype=syncroniserairbnbroom&id={room_id}")
+    await waits.settle("airbnb_room", 3000, waits.selector(page, 'button[name="dosubmit"]'))
+    return await extract_fields(page, AIRBNB_ROOM_FORM)
 
-    descriptions = {
-        "multilang": await page.eval_on_selector("#multilang option:checked", "el => el.innerText"),
-        "propnameEN": await page.eval_on_selector("#propnameEN", "el => el.value"),
-        "summaryEN": await page.eval_on_selector("#summaryEN", "el => el.value"),
-        "spaceEN": await page.eval_on_selector("#spaceEN", "el => el.value"),
-        "accessEN": await page.eval_on_selector("#accessEN", "el => el.value"),
-        "interactionEN": await page.eval_on_selector("#interactionEN", "el => el.value"),
-        "neighborhoodEN": await page.eval_on_selector("#neighborhoodEN", "el => el.value"),
-        "transitEN": await page.eval_on_selector("#transitEN", "el => el.value"),
-        "notesEN": await page.eval_on_selector("#notesEN", "el => el.value"),
-    }
+@app.get("/get_airbnb_property_content_extensive", tags=["Airbnb"])
+async def get_airbnb_property_content_extensive(session_id: str, beds24roomId: str = "533105", cache_control: Optional[str] = Header(None)):
+    return await cached_read(session_id, "airbnb", beds24roomId, "extensive", cache_control, read_airbnb_view, fetch_airbnb_view)
 
-    booking_rules = {
-        "prebookmsg": await page.eval_on_selector("#prebookmsg", "el => el.value"),
-        "instantbookallow": await page.eval_on_selector("#instantbookallow option:checked", "el => el.innerText"),
-        "cancelpolicy": await page.eval_on_selector("#cancelpolicy option:checked", "el => el.innerText"),
-        "nonrefundfactor": await page.eval_on_selector("#nonrefundfactor option:checked", "el => el.innerText"),
-    }
+@app.get("/get_airbnb_property_content", tags=["Airbnb"])
+async def get_airbnb_property_content(session_id: str, beds24roomId: str = "533105", cache_control: Optional[str] = Header(None)):
+    return await cached_read(session_id, "airbnb", beds24roomId, "room", cache_control, read_airbnb_room)
 
-    pricing_settings = {
-        "extraPersonPrice": await page.eval_on_selector("#extraperson", "el => el.value"),
-        "pricingstrategy": await page.eval_on_selector("#losprices option:checked", "el => el.innerText"),
-        "guestsincluded": await page.eval_on_selector("#guestinc option:checked", "el => el.innerText"),
-        "dateswithnoprice": await page.eval_on_selector("#datenoprice option:checked", "el => el.innerText"),
-        "twodaydiscounts": await page.eval_on_selector("#day2disc option:checked", "el => el.innerText"),
-        "threedaydiscounts": await page.eval_on_selector("#day3disc option:checked", "el => el.innerText"),
-        "fourdaydiscounts": await page.eval_on_selector("#day4disc option:checked", "el => el.innerText"),
-        "fivedaydiscounts": await page.eval_on_selector("#day5disc option:checked", "el => el.innerText"),
-        "sixdaydiscounts": await page.eval_on_selector("#day6disc option:checked", "el => el.innerText"),
-        "sevendaydiscounts": await page.eval_on_selector("#day7disc option:checked", "el => el.innerText"),
-        "fourteendaydiscounts": await page.eval_on_selector("#day14disc option:checked", "el => el.innerText"),
-        "twentyonedaydiscounts": await page.eval_on_selector("#day21disc option:checked", "el => el.innerText"),
-        "twentyeightdaydiscounts": await page.eval_on_selector("#day28disc option:checked", "el => el.innerText"),
-        "maxdaysinadvance": await page.eval_on_selector("#maxnotice option:checked", "el => el.innerText"),
-        "advancenotice": await page.eval_on_selector("#leadtime option:checked", "el => el.innerText"),
-        "advancenoticerequest": await page.eval_on_selector("#leadrequest option:checked", "el => el.innerText"),
-        "earlybirddaystocheckin": await page.eval_on_selector("#bookbeyondd option:checked", "el => el.innerText"),
-        "earlybirddiscountpercent": await page.eval_on_selector("#bookbeyondp option:checked", "el => el.innerText"),
-        "lastminutedaystocheckin": await page.eval_on_selector("#bookwithind option:checked", "el => el.innerText"),
-        "lastminutediscountpercent": await page.eval_on_selector("#bookwithinp option:checked", "el => el.innerText"),
-    }
-    custom = await page.eval_on_selector("#custom", "el => el.value")
+@app.post("/bulk_get_airbnb_property_content", tags=["Airbnb"])
+async def bulk_get_airbnb_property_content(session_id: str, request: BulkReadRequest):
+    return await bulk_read_response(session_id, request, read_airbnb_room, "airbnb_room")
 
-    results["listing_details"] = listing_details
-    results["checkout_instructions"] = checkout_instructions
-    results["descriptions"] = descriptions
-    results["booking_rules"] = booking_rules
-    results["pricing_settings"] = pricing_settings
-    results["custom"] = custom
+async def bulk_read_response(session_id: str, request: BulkReadRequest, reader, flow: str):
+    # Streams one NDJSON line per room as it is read, then a summary line
+    browser, context, page = await get_session_instance(session_id)
 
-    return results
+    async def stream():
+        # Held while streaming so nothing switches the session's account mid-read
+        try:
+            async with session_scheduler.slot(session_id):
+                with resource_blocker.flow(session_id, "read"):
+                    async for result in read_rooms(context, request.room_ids, reader, request.concurrency, flow):
+                        yield json.dumps(result, default=str) + "\n"
+        except HTTPException as e:
+            yield json.dumps({"status": "error", "status_code": e.status_code, "error": e.detail}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+async def saved_form_values(page, form, submitted: bool) -> Optional[dict]:
+    # The submit lands back on the saved form, read it in place when it did.
+    # Without the navigation the page still holds the unsaved values just filled.
+    if not submitted or await page.query_selector('button[name="dosubmit"]') is None:
+        metrics.counter("modify_dom_verify_fallbacks").inc()
+        return None
+    return await extract_fields(page, form)
+
+def check_filled_form(filled: dict):
+    # Refuse to submit a half-written form
+    if filled["missing"]:
+        raise HTTPException(
+            status_code=422,
+            detail={"message": "Fields or options not found on the page", "fields": filled["missing"]}
+        )
+    if filled["mismatched"]:
+        print(f"Fields did not keep their new value: {filled['mismatched']}")
 
 @app.patch("/modify_property_content", tags=["Airbnb"])
+@session_scheduler.exclusive
 async def modify_property_content(
     session_id: str,
     room_id: str,
@@ -776,94 +1128,78 @@ async def modify_property_content(
     descriptions: Descriptions = Body(...),
     booking_rules: BookingRules = Body(...),
     pricing_settings: PricingSettings = Body(...),
-    custom: Optional[str] = Body(None)
+    custom: Optional[str] = Body(None),
+    diff: bool = False,
+    verify: Literal["dom", "full"] = "dom"
 ):
     browser, context, page = await get_session_instance(session_id)
     await page.goto(f"https://beds24.com/control3.php?pagetype=syncroniserairbnbroom&id={room_id}")
-    await page.wait_for_timeout(3000)
-    await page.select_option("#publish", listing_details.publish)
-    await page.select_option("#proptypegroup", listing_details.propertytypegroup)
-    await page.select_option("#listingtype", listing_details.listingtype)
-    await page.select_option("#hideaddress", listing_details.updateaddress)
-    await page.select_option("#picsource", listing_details.picsource)
-    await page.select_option("#bathroomshared", listing_details.bathroomshared)
-    await page.select_option("#commonshared", listing_details.commonshared)
-    await page.select_option("#checkincategory", listing_details.checkincategory)
-    await page.fill("#checkindesc", listing_details.checkindesc)
-    await page.fill("#housemanual", listing_details.housemanual)
-    
-    await page.fill("#checkoutrk", checkout_instructions.checkoutrk)
-    await page.fill("#checkouttto", checkout_instructions.checkouttto)
-    await page.fill("#checkoutt", checkout_instructions.checkoutt)
-    await page.fill("#checkoutlu", checkout_instructions.checkoutlu)
-    await page.fill("#checkoutgt", checkout_instructions.checkoutgt)
-    await page.fill("#checkoutar", checkout_instructions.checkoutar)
-    
-    await page.select_option("#multilang", descriptions.multilang)
-    await page.fill("#propnameEN", descriptions.propnameEN)
-    await page.fill("#summaryEN", descriptions.summaryEN)
-    await page.fill("#spaceEN", descriptions.spaceEN)
-    await page.fill("#accessEN", descriptions.accessEN)
-    await page.fill("#interactionEN", descriptions.interactionEN)
-    await page.fill("#neighborhoodEN", descriptions.neighborhoodEN)
-    await page.fill("#transitEN", descriptions.transitEN)
-    await page.fill("#notesEN", descriptions.notesEN)
-
-    await page.fill("#prebookmsg", booking_rules.prebookmsg)
-    await page.select_option("#instantbookallow", booking_rules.instantbookallow)
-    await page.select_option("#cancelpolicy", booking_rules.cancelpolicy)
-    await page.select_option("#nonrefundfactor", booking_rules.nonrefundfactor)
-
-    await page.fill("#extraperson", pricing_settings.extraPersonPrice)
-    await page.select_option("#losprices", pricing_settings.pricingstrategy)
-    await page.select_option("#guestinc", pricing_settings.guestsincluded)
-    await page.select_option("#datenoprice", pricing_settings.dateswithnoprice)
-    await page.select_option("#day2disc", pricing_settings.twodaydiscounts)
-    await page.select_option("#day3disc", pricing_settings.threedaydiscounts)
-    await page.select_option("#day4disc", pricing_settings.fourdaydiscounts)
-    await page.select_option("#day5disc", pricing_settings.fivedaydiscounts)
-    await page.select_option("#day6disc", pricing_settings.sixdaydiscounts)
-    await page.select_option("#day7disc", pricing_settings.sevendaydiscounts)
-    await page.select_option("#day14disc", pricing_settings.fourteendaydiscounts)
-    await page.select_option("#day21disc", pricing_settings.twentyonedaydiscounts)
-    await page.select_option("#day28disc", pricing_settings.twentyeightdaydiscounts)
-    await page.select_option("#maxnotice", pricing_settings.maxdaysinadvance)
-    await page.select_option("#leadtime", pricing_settings.advancenotice)
-    await page.select_option("#leadrequest", pricing_settings.advancenoticerequest)
-    await page.select_option("#bookbeyondd", pricing_settings.earlybirddaystocheckin)
-    await page.select_option("#bookbeyondp", pricing_settings.earlybirddiscountpercent)
-    await page.select_option("#bookwithind", pricing_settings.lastminutedaystocheckin)
-    await page.select_option("#bookwithinp", pricing_settings.lastminutediscountpercent)
-
-    await page.fill("#custom", custom)
+    await waits.settle("airbnb_room", 3000, waits.selector(page, 'button[name="dosubmit"]'))
+    report_progress("filling_form")
+    filled = await fill_fields(page, AIRBNB_ROOM_FORM, {
+        "listing_details": listing_details,
+        "checkout_instructions": checkout_instructions,
+        "descriptions": descriptions,
+        "booking_rules": booking_rules,
+        "pricing_settings": pricing_settings,
+        "custom": custom
+    }, only_changed=diff)
+    check_filled_form(filled)
+    if diff and not filled["changed"]:
+        # Nothing to save, skip the submit and the channel push
+        return {
+            "status": "success",
+            "changed_fields": [],
+            "new_values": await extract_fields(page, AIRBNB_ROOM_FORM)
+        }
 
+    report_progress("saving")
     button_elements = await page.query_selector_all('button[name="dosubmit"]')
+    submitted = False
     for button_element in button_elements:
-        await button_element.click()
-        await page.wait_for_timeout(3000)
+        async with waits.navigation(page, "form_submit", 3000) as navigation:
+            await button_element.click()
+        submitted = not navigation.timed_out
         break
     
-    await page.goto('https://beds24.com/control3.php?pagetype=syncroniserairbnbmap')
-    await page.wait_for_load_state("load")
-    update_button = await page.query_selector('body > div.container-fluid.b24container-fluid > div > main > form:nth-child(9) > div.form-group.row.settingrow3.overflowxvisible > div > div > div.card-body > div.table-responsive.overflowxvisible > table > tbody > tr > td:nth-child(6) > div > button.btn.btn-primary.btn-xs.rounded.mb-1.mr-1.airbnbupdatebtn')
-    await update_button.click()
-    await page.wait_for_timeout(1000)
-    select_all = await page.wait_for_selector('#bookingUpdateSelector > tfoot > tr > td:nth-child(1) > span.fakelink.select-all')
-    select_all_button = await page.query_selector('#bookingUpdateSelector > tfoot > tr > td:nth-child(1) > span.fakelink.select-all')
-    await select_all_button.click()
-    confirm_button =  await page.query_selector('#confirmationmodal > div > div > div.modal-footer > button.btn.btn-primary')
-    await confirm_button.click()
-    await page.wait_for_timeout(7000)
+    await invalidate_room_content(session_id, "airbnb", room_id)
+    new_values = None
+    if verify == "dom":
+        new_values = await saved_form_values(page, AIRBNB_ROOM_FORM, submitted)
+        if new_values is not None:
+            await cache_room_content(session_id, "airbnb", room_id, "room", new_values)
+
+    report_progress("pushing_to_channel")
+    with resource_blocker.flow(session_id, "channel_push"):
+        await page.goto('https://beds24.com/control3.php?pagetype=syncroniserairbnbmap')
+        await page.wait_for_load_state("load")
+        update_button = await page.query_selector('body > div.container-fluid.b24container-fluid > div > main > form:nth-child(9) > div.form-group.row.settingrow3.overflowxvisible > div > div > div.card-body > div.table-responsive.overflowxvisible > table > tbody > tr > td:nth-child(6) > div > button.btn.btn-primary.btn-xs.rounded.mb-1.mr-1.airbnbupdatebtn')
+        await update_button.click()
+        select_all = await page.wait_for_selector('#bookingUpdateSelector > tfoot > tr > td:nth-child(1) > span.fakelink.select-all')
+        select_all_button = await page.query_selector('#bookingUpdateSelector > tfoot > tr > td:nth-child(1) > span.fakelink.select-all')
+        await select_all_button.click()
+        confirm_button =  await page.query_selector('#confirmationmodal > div > div > div.modal-footer > button.btn.btn-primary')
+        # The push is an XHR, leaving the page before its response arrives aborts it
+        async with waits.response(page, "channel_push", 7000, AIRBNB_PUSH_RESPONSE):
+            await confirm_button.click()
+        await waits.settle("channel_push_modal_close", 0, waits.selector(page, "#confirmationmodal", "hidden"))
     
-    new_values = await get_airbnb_property_content(session_id, room_id)
+    if new_values is None:
+        # Re-open the form for a fresh read, slower but independent of the submit response
+        report_progress("verifying")
+        new_values = await get_airbnb_property_content(session_id, room_id, cache_control="no-cache")
     response = {
         "status": "success",
+        "changed_fields": filled["changed"],
         "new_values": new_values
     }
+    if filled["mismatched"]:
+        response["unverified_fields"] = filled["mismatched"]
     
     return response
 
 @app.post("/import_new_property_from_bookingcom", tags=["Booking.com"])
+@session_scheduler.exclusive
 async def import_new_property_from_bookingcom(session_id: str, bookingcom_property_id: str):
     browser, context, page = await get_session_instance(session_id)
     await page.goto(f"https://beds24.com/control3.php?pagetype=syncroniserbookingcomxmlimport")
@@ -872,12 +1208,13 @@ async def import_new_property_from_bookingcom(session_id: str, bookingcom_proper
     return {"status": "success"}
 
 @app.post("/connect_bookingcom_to_existing_room", tags=["Booking.com"])
+@session_scheduler.exclusive
 async def connect_bookingcom_to_existing_room(session_id: str, beds24_property_id: str):
     browser, context, page = await get_session_instance(session_id)
     await page.goto("https://beds24.com/control3.php?pagetype=syncroniserbookingcomxml")
     await page.wait_for_selector("body > div.container-fluid.b24container-fluid > div > main > form:nth-child(8) > select")
     await page.select_option("body > div.container-fluid.b24container-fluid > div > main > form:nth-child(8) > select", beds24_property_id)
-    await page.wait_for_timeout(3000)
+    await waits.settle("bookingcom_connect", 3000, waits.network_idle(page))
     button = await page.wait_for_selector("#booking-widget")
     if button:
         link_element = await page.query_selector("#booking-widget")
@@ -886,162 +1223,32 @@ async def connect_bookingcom_to_existing_room(session_id: str, beds24_property_i
     else:
         return {"status": "error", "message": "Booking.com connection failed: Given id does not exist or already been connected"}
     
-def parse_table(table_html: str) -> dict:
-    soup = BeautifulSoup(table_html, "html.parser")
-    data = {}
-    rows = soup.find_all("tr")[1:]  # Skip header row
-    for row in rows:
-        cols = row.find_all("td")
-        if len(cols) >= 3:
-            key = cols[0].text.strip()
-            value = cols[2].text.strip()
-            data[key] = value
-    return data
-
-@app.get("/get_bookingcom_property_content_extensive", tags=["Booking.com"])
-async def get_bookingcom_property_content_extensive(session_id: str, beds24roomId: str = "253855"):
-    browser, context, page = await get_session_instance(session_id)
+async def read_bookingcom_view(page, beds24roomId: str) -> dict:
     await page.goto(f"https://beds24.com/control3.php?pagetype=syncroniserbookingcomxmlview")
-    await page.wait_for_selector("body > div.container-fluid.b24container-fluid > div > main > form > select")
-    await page.select_option("body > div.container-fluid.b24container-fluid > div > main > form > select", beds24roomId)
-    await page.wait_for_timeout(3000)
-    
-    elements_selectors = {
-        "address": "body > div.container-fluid.b24container-fluid > div > main > table:nth-child(15)",
-        "property_details": "body > div.container-fluid.b24container-fluid > div > main > table:nth-child(19)",
-        "rules": "body > div.container-fluid.b24container-fluid > div > main > table:nth-child(23)",
-        "profile": "body > div.container-fluid.b24container-fluid > div > main > table:nth-child(27)",
-        "pictures": "body > div.container-fluid.b24container-fluid > div > main > table:nth-child(31)",
-        "bookingcom_content": "body > div.container-fluid.b24container-fluid > div > main > table:nth-child(36)",
-    }
-    
-    data = {}
+    await page.wait_for_selector(BOOKINGCOM_VIEW_SELECT)
+    async with waits.navigation(page, "bookingcom_view", 3000):
+        await page.select_option(BOOKINGCOM_VIEW_SELECT, beds24roomId)
+    return await run_cpu(extract_tables, await page.content(), BOOKINGCOM_VIEW_TABLES)
 
-    for key, selector in elements_selectors.items():
-        element_handle = await page.query_selector(selector)
-        if element_handle:
-            html_content = await element_handle.inner_html()
-            # Parse the HTML table to a dictionary
-            table_data = parse_table(html_content)
-            data[key] = table_data
-    return data
-
-@app.get("/get_bookingcom_property_content", tags=["Booking.com"])
-async def get_bookingcom_property_content(session_id: str, beds24roomId: str = "253855"):
-    browser, context, page = await get_session_instance(session_id)
-    await page.goto(f"https://beds24.com/control3.php?pagetype=syncroniserbookingcomxmlprop&id={beds24roomId}")
-    await page.wait_for_timeout(3000)
-    results = {}
-
-    custom_element = await page.query_selector("#custom")
-    custom = await custom_element.input_value()
-    results['custom'] = {
-        "custom": custom
-    }
-
-    pd_number_of_floors_element = await page.query_selector("#qtyfloor option:checked")
-    pd_number_of_floors = await pd_number_of_floors_element.inner_text()
-    pd_max_lenght_stay_element = await page.query_selector("#maxlos option:checked")
-    pd_max_lenght_stay = await pd_max_lenght_stay_element.inner_text()
-    results['property_details'] = {
-        "number_of_floors": pd_number_of_floors,
-        "max_lenght_stay": pd_max_lenght_stay
-    }
-
-    pp_host_name_element = await page.query_selector("#hostname")
-    pp_host_name = await pp_host_name_element.input_value()
-    pp_host_location_element = await page.query_selector("#hostloc option:checked")
-    pp_host_location = await pp_host_location_element.inner_text()
-    pp_company_element = await page.query_selector("#hosttype option:checked")
-    pp_company = await pp_company_element.inner_text()
-    pp_built_element = await page.query_selector("#hostbuild")
-    pp_built = await pp_built_element.input_value()
-    pp_last_renovation_element = await page.query_selector("#hostreno")
-    pp_last_renovation = await pp_last_renovation_element.input_value()
-    pp_rented_since_element = await page.query_selector("#hostrent")
-    pp_rented_since = await pp_rented_since_element.input_value()
-    pp_host_pic_url_element = await page.query_selector("#hostpic")
-    pp_host_pic = await pp_host_pic_url_element.input_value()
-    pp_welcome_msg_element = await page.query_selector("#welcomemsgEN")
-    pp_welcome_msg = await pp_welcome_msg_element.input_value()
-    pp_owner_listing_story_element = await page.query_selector("#liststoryEN")
-    pp_owner_listing_story = await pp_owner_listing_story_element.input_value()
-    pp_neighborhood_overview_element = await page.query_selector("#neighborhoodEN")
-    pp_neighborhood_overview = await pp_neighborhood_overview_element.input_value()
-    pp_local_tips_element = await page.query_selector("#localtipsEN")
-    pp_local_tips = await pp_local_tips_element.input_value()
-    results['property_profile'] = {
-        "host_name": pp_host_name,
-        "host_location": pp_host_location,
-        "company": pp_company,
-        "built": pp_built,
-        "last_renovation": pp_last_renovation,
-        "rented_since": pp_rented_since,
-        "host_pic": pp_host_pic,
-        "welcome_msg": pp_welcome_msg,
-        "owner_listing_story": pp_owner_listing_story,
-        "neighborhood_overview": pp_neighborhood_overview,
-        "local_tips": pp_local_tips
-    }
-
-    ic_first_name_element = await page.query_selector('input[name="coninvfn"]')
-    ic_first_name = await ic_first_name_element.input_value()
-    ic_last_name_element = await page.query_selector('input[name="coninvln"]')
-    ic_last_name = await ic_last_name_element.input_value()
-    ic_email_element = await page.query_selector('input[name="coninvem"]')
-    ic_email = await ic_email_element.input_value()
-    ic_phone_element = await page.query_selector('input[name="coninvph"]')
-    ic_phone = await ic_phone_element.input_value()
-    ic_address_element = await page.query_selector('input[name="coninvad"]')
-    ic_address = await ic_address_element.input_value()
-    ic_city_element = await page.query_selector('input[name="coninvac"]')
-    ic_city = await ic_city_element.input_value()
-    ic_postcode_element = await page.query_selector('input[name="coninvap"]')
-    ic_postcode = await ic_postcode_element.input_value()
-    results['invoices_contact'] = {
-        'first_name': ic_first_name,
-        'last_name': ic_last_name,
-        'email': ic_email,
-        'phone': ic_phone,
-        'address': ic_address,
-        'city': ic_city,
-        'postcode': ic_postcode
-    }
-
-    rc_first_name_element = await page.query_selector('input[name="conresfn"]')
-    rc_first_name = await rc_first_name_element.input_value()
-    rc_last_name_element = await page.query_selector('input[name="conresln"]')
-    rc_last_name = await rc_last_name_element.input_value()
-    rc_email_element = await page.query_selector('input[name="conresem"]')
-    rc_email = await rc_email_element.input_value()
-    rc_phone_element = await page.query_selector('input[name="conresph"]')
-    rc_phone = await rc_phone_element.input_value()
-    results['reservations_contact'] = {
-        'first_name': rc_first_name,
-        'last_name': rc_last_name,
-        'email': rc_email,
-        'phone': rc_phone
-    }
-
-    # List to store policies
-    checked_policies = []
+async def read_bookingcom_property(page, room_id: str) -> dict:
+    await page.goto(f"https://beds24.com/control3.php?pagetype=syncroniserbookingcomxmlprop&id={room_id}")
+    await waits.settle("bookingcom_property", 3000, waits.selector(page, 'button[name="dosubmit"]'))
+    return await extract_fields(page, BOOKINGCOM_PROPERTY_FORM)
 
-    # Select all checkbox elements within the policy section
-    checkboxes = await page.query_selector_all('.settingrow3 input[type="checkbox"]')
+@app.get("/get_bookingcom_property_content_extensive", tags=["Booking.com"])
+async def get_bookingcom_property_content_extensive(session_id: str, beds24roomId: str = "253855", cache_control: Optional[str] = Header(None)):
+    return await cached_read(session_id, "bookingcom", beds24roomId, "extensive", cache_control, read_bookingcom_view, fetch_bookingcom_view)
 
-    # Iterate through all checkboxes to find the checked ones
-    for checkbox in checkboxes:
-        is_checked = await checkbox.is_checked()
-        if is_checked:
-            # Get the parent label element's text if the checkbox is checked
-            parent_label = await checkbox.evaluate_handle("checkbox => checkbox.closest('label')")
-            policy_text = await parent_label.inner_text()
-            checked_policies.append(policy_text.strip())
-    results["policies"] = checked_policies
+@app.get("/get_bookingcom_property_content", tags=["Booking.com"])
+async def get_bookingcom_property_content(session_id: str, beds24roomId: str = "253855", cache_control: Optional[str] = Header(None)):
+    return await cached_read(session_id, "bookingcom", beds24roomId, "room", cache_control, read_bookingcom_property)
 
-    return results
+@app.post("/bulk_get_bookingcom_property_content", tags=["Booking.com"])
+async def bulk_get_bookingcom_property_content(session_id: str, request: BulkReadRequest):
+    return await bulk_read_response(session_id, request, read_bookingcom_property, "bookingcom_property")
 
 @app.patch("/modify_bookingcom_property_content", tags=["Booking.com"])
+@session_scheduler.exclusive
 async def modify_bookingcom_property_content(
     session_id: str,
     room_id: str,
@@ -1050,71 +1257,198 @@ async def modify_bookingcom_property_content(
     property_profile: PropertyProfile = Body(...),
     invoices_contact: InvoicesContact = Body(...),
     reservations_contact: ReservationsContact = Body(...),
-    policies: Policies = Body(...)
+    policies: Policies = Body(...),
+    diff: bool = False,
+    verify: Literal["dom", "full"] = "dom"
 ):
     browser, context, page = await get_session_instance(session_id)
     await page.goto(f"https://beds24.com/control3.php?pagetype=syncroniserbookingcomxmlprop&id={room_id}")
-    await page.wait_for_timeout(3000)
-    await page.fill("#custom", custom.custom)
-
-    await page.select_option("#qtyfloor", property_details.numberoffloors)
-    await page.select_option("#maxlos", property_details.maxstay)
-
-    await page.fill("#hostname", property_profile.hostname)
-    await page.select_option("#hostloc", property_profile.hostlocation)
-    await page.select_option("#hosttype", property_profile.company)
-    built_str = property_profile.built.strftime("%A, %d %B, %Y")
-    lastrenovated_str = property_profile.lastrenovated.strftime("%A, %d %B, %Y")
-    rentedSince_str = property_profile.rentedSince.strftime("%A, %d %B, %Y")
-    await page.fill("#hostbuild", built_str)
-    await page.fill("#hostreno", lastrenovated_str)
-    await page.fill("#hostrent", rentedSince_str)
-    await page.fill("#hostpic", property_profile.host_pic_url)
-    await page.fill("#welcomemsgEN", property_profile.welcome_msg)
-    await page.fill("#liststoryEN", property_profile.owner_listing_story)
-    await page.fill("#neighborhoodEN", property_profile.neighborhood_overview)
-    await page.fill("#localtipsEN", property_profile.local_tips)
-
-    await page.fill('input[name="coninvfn"]', invoices_contact.firstname)
-    await page.fill('input[name="coninvln"]', invoices_contact.lastname)
-    await page.fill('input[name="coninvem"]', invoices_contact.email)
-    await page.fill('input[name="coninvph"]', invoices_contact.phone)
-    await page.fill('input[name="coninvad"]', invoices_contact.address)
-    await page.fill('input[name="coninvac"]', invoices_contact.city)
-    await page.fill('input[name="coninvap"]', invoices_contact.postcode)
-
-    await page.fill('input[name="conresfn"]', reservations_contact.firstname)
-    await page.fill('input[name="conresln"]', reservations_contact.lastname)
-    await page.fill('input[name="conresem"]', reservations_contact.email)
-    await page.fill('input[name="conresph"]', reservations_contact.phone)
+    await waits.settle("bookingcom_property", 3000, waits.selector(page, 'button[name="dosubmit"]'))
+    report_progress("filling_form")
+    filled = await fill_fields(page, BOOKINGCOM_PROPERTY_FORM, {
+        "custom": custom,
+        "property_details": property_details,
+        "property_profile": property_profile,
+        "invoices_contact": invoices_contact,
+        "reservations_contact": reservations_contact
+    }, only_changed=diff)
+    check_filled_form(filled)
+    if diff and not filled["changed"]:
+        # Nothing to save, skip the submit and the channel push
+        return {
+            "status": "success",
+            "changed_fields": [],
+            "new_values": await extract_fields(page, BOOKINGCOM_PROPERTY_FORM)
+        }
 
+    report_progress("saving")
     button_elements = await page.query_selector_all('button[name="dosubmit"]')
+    submitted = False
     for button_element in button_elements:
-        await button_element.click()
-        await page.wait_for_timeout(3000)
+        async with waits.navigation(page, "form_submit", 3000) as navigation:
+            await button_element.click()
+        submitted = not navigation.timed_out
         break
     
-    await page.goto('https://beds24.com/control3.php?pagetype=syncroniserbookingcomxmlsend')
-    await page.wait_for_load_state("load")
-    update_button = await page.query_selector('#settingformid > div:nth-child(7) > div > div > div.card-body > button.btn.btn-primary.btn-sm.rounded.mr-1.mb-1.float-right')
-    await update_button.click()
-    await page.wait_for_timeout(3000)
-    select_all = await page.wait_for_selector('#bookingUpdateSelector > tfoot > tr > td:nth-child(1) > span.fakelink.select-all')
-    select_all_button = await page.query_selector('#bookingUpdateSelector > tfoot > tr > td:nth-child(1) > span.fakelink.select-all')
-    await select_all_button.click()
-    confirm_button =  await page.query_selector('#confirmationmodal > div > div > div.modal-footer > button.btn.btn-primary')
-    await confirm_button.click()
-    await page.wait_for_timeout(7000)
-
-    new_values = await get_bookingcom_property_content(session_id, room_id)
+    await invalidate_room_content(session_id, "bookingcom", room_id)
+    new_values = None
+    if verify == "dom":
+        new_values = await saved_form_values(page, BOOKINGCOM_PROPERTY_FORM, submitted)
+        if new_values is not None:
+            await cache_room_content(session_id, "bookingcom", room_id, "room", new_values)
+
+    report_progress("pushing_to_channel")
+    with resource_blocker.flow(session_id, "channel_push"):
+        await page.goto('https://beds24.com/control3.php?pagetype=syncroniserbookingcomxmlsend')
+        await page.wait_for_load_state("load")
+        update_button = await page.query_selector('#settingformid > div:nth-child(7) > div > div > div.card-body > button.btn.btn-primary.btn-sm.rounded.mr-1.mb-1.float-right')
+        await update_button.click()
+        select_all = await page.wait_for_selector('#bookingUpdateSelector > tfoot > tr > td:nth-child(1) > span.fakelink.select-all')
+        select_all_button = await page.query_selector('#bookingUpdateSelector > tfoot > tr > td:nth-child(1) > span.fakelink.select-all')
+        await select_all_button.click()
+        confirm_button =  await page.query_selector('#confirmationmodal > div > div > div.modal-footer > button.btn.btn-primary')
+        # The push is an XHR, leaving the page before its response arrives aborts it
+        async with waits.response(page, "channel_push", 7000, BOOKINGCOM_PUSH_RESPONSE):
+            await confirm_button.click()
+        await waits.settle("channel_push_modal_close", 0, waits.selector(page, "#confirmationmodal", "hidden"))
+
+    if new_values is None:
+        # Re-open the form for a fresh read, slower but independent of the submit response
+        report_progress("verifying")
+        new_values = await get_bookingcom_property_content(session_id, room_id, cache_control="no-cache")
     response = {
         "status": "success",
+        "changed_fields": filled["changed"],
         "new_values": new_values
     }
+    if filled["mismatched"]:
+        response["unverified_fields"] = filled["mismatched"]
 
     return response
     
 
+def job_session_account(session_id: str) -> str:
+    # Refuse jobs for unknown sessions up front rather than failing them later
+    if session_id not in active_playwrights and session_id not in restorable_sessions:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session_accounts.get(session_id) or beds24_identity()
+
+def job_session_slot(session_id: str):
+    # Jobs queue on the session as long as it takes, not the request timeout
+    return lambda: session_scheduler.slot(session_id, timeout=JOB_SESSION_WAIT_TIMEOUT)
+
+@app.post("/jobs/generate_session", tags=["Jobs"], status_code=202)
+async def generate_session_job(request: SessionRequest, webhook_url: Optional[str] = None):
+    return await job_manager.submit(
+        "generate_session",
+        request.username or beds24_identity(),
+        lambda: generate_session(request, BackgroundTasks()),
+        params={"username": request.username},
+        webhook_url=webhook_url
+    )
+
+@app.post("/jobs/modify_property_content", tags=["Jobs"], status_code=202)
+async def modify_property_content_job(
+    session_id: str,
+    room_id: str,
+    listing_details: ListingDetails = Body(...),
+    checkout_instructions: CheckOutInstructions = Body(...),
+    descriptions: Descriptions = Body(...),
+    booking_rules: BookingRules = Body(...),
+    pricing_settings: PricingSettings = Body(...),
+    custom: Optional[str] = Body(None),
+    diff: bool = False,
+    verify: Literal["dom", "full"] = "dom",
+    webhook_url: Optional[str] = None
+):
+    return await job_manager.submit(
+        "modify_property_content",
+        job_session_account(session_id),
+        lambda: modify_property_content(
+            session_id=session_id,
+            room_id=room_id,
+            listing_details=listing_details,
+            checkout_instructions=checkout_instructions,
+            descriptions=descriptions,
+            booking_rules=booking_rules,
+            pricing_settings=pricing_settings,
+            custom=custom,
+            diff=diff,
+            verify=verify
+        ),
+        params={"session_id": session_id, "room_id": room_id, "diff": diff, "verify": verify},
+        webhook_url=webhook_url,
+        session_slot=job_session_slot(session_id)
+    )
+
+@app.post("/jobs/modify_bookingcom_property_content", tags=["Jobs"], status_code=202)
+async def modify_bookingcom_property_content_job(
+    session_id: str,
+    room_id: str,
+    custom: Custom = Body(None),
+    property_details: PropertyDetails = Body(...),
+    property_profile: PropertyProfile = Body(...),
+    invoices_contact: InvoicesContact = Body(...),
+    reservations_contact: ReservationsContact = Body(...),
+    policies: Policies = Body(...),
+    diff: bool = False,
+    verify: Literal["dom", "full"] = "dom",
+    webhook_url: Optional[str] = None
+):
+    return await job_manager.submit(
+        "modify_bookingcom_property_content",
+        job_session_account(session_id),
+        lambda: modify_bookingcom_property_content(
+            session_id=session_id,
+            room_id=room_id,
+            custom=custom,
+            property_details=property_details,
+            property_profile=property_profile,
+            invoices_contact=invoices_contact,
+            reservations_contact=reservations_contact,
+            policies=policies,
+            diff=diff,
+            verify=verify
+        ),
+        params={"session_id": session_id, "room_id": room_id, "diff": diff, "verify": verify},
+        webhook_url=webhook_url,
+        session_slot=job_session_slot(session_id)
+    )
+
+@app.get("/jobs/{job_id}", tags=["Jobs"])
+async def get_job(job_id: str):
+    return await job_manager.get(job_id)
+
+@app.get("/resource_blocking_stats", tags=["Utilities"])
+async def resource_blocking_stats(session_id: str):
+    return {"session_id": session_id, "enabled": resource_blocker.enabled, **resource_blocker.stats(session_id)}
+
+@app.get("/resource_governor_stats", tags=["Utilities"])
+async def resource_governor_stats():
+    return resource_governor.stats()
+
+@app.get("/browser_pool_stats", tags=["Utilities"])
+async def browser_pool_stats():
+    return browser_pool.stats()
+
+@app.get("/ready", tags=["Utilities"])
+async def readiness():
+    # Sessions go back to restorable_sessions later (browser crash, eviction), readiness only waits for the startup pass
+    pending = len(restorable_sessions)
+    ready = restore_progress["indexed"] and (SESSION_RESTORE_MODE != "eager" or restore_progress["eager_done"])
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "pending": pending, **restore_progress}
+    )
+
+@app.get("/metrics", tags=["Utilities"])
+async def get_metrics():
+    return {
+        "warm_pool": warm_pool.stats(),
+        "session_registry": session_registry.stats(),
+        "metrics": metrics.snapshot()
+    }
+
 @app.get("/", tags=["Root"])
 async def read_root():
     return {"message": "Welcome to Beds24 API"}
@@ -545,4 +545,20 @@ class ReservationsContact(BaseModel):
 class Policies(BaseModel):
     policies: list[str]
 
-    
\ No newline at end of file
+    
+class AirbnbListingImport(BaseModel):
+    airbnbUserId: str
+    airbnbListingId: str
+    # Imported into this existing Beds24 property when set, as a new property otherwise
+    propertyId: Optional[str] = None
+
+class AirbnbBulkImportRequest(BaseModel):
+    listings: list[AirbnbListingImport]
+    chunk_size: int = 20
+    concurrency: int = 4
+    max_attempts: int = 3
+
+class BulkReadRequest(BaseModel):
+    room_ids: list[str]
+    # Pages read in parallel, capped by BULK_READ_MAX_CONCURRENCY
+    concurrency: int = 4
@@ -0,0 +1,289 @@
+import asyncio
+import base64
+import datetime
+import email
+import os
+import quopri
+import re
+import threading
+import time
+import traceback
+from datetime import timezone
+from email.utils import parseaddr, parsedate_to_datetime
+import imapclient
+from pymongo.errors import DuplicateKeyError
+import metrics
+
+OTP_IMAP_HOST = os.environ.get("OTP_IMAP_HOST", "imap.gmail.com")
+# How long a login waits for its code, and how old a message may be to count
+OTP_TIMEOUT = float(os.environ.get("OTP_TIMEOUT", "180"))
+OTP_MAX_AGE = float(os.environ.get("OTP_MAX_AGE", "300"))
+# Servers without IDLE are searched this often while a login is waiting
+OTP_POLL_INTERVAL = float(os.environ.get("OTP_POLL_INTERVAL", "2"))
+# Gmail drops IDLE after ~29 minutes, it is restarted well before that
+OTP_IDLE_RENEW = float(os.environ.get("OTP_IDLE_RENEW", "540"))
+
+OTP_SENDERS = ("support@beds24.com", "ticket@beds24.com")
+
+
+def extract_code(sender: str, body: str):
+    if sender == "support@beds24.com":
+        match = re.search(r'Your login code for account \S+ is (\d+)', body)
+        return match.group(1) if match else None
+    if sender == "ticket@beds24.com":
+        match = re.search(r'https://beds24\.com/control2\.php\?logincode=\w+', body)
+        return match.group(0) if match else None
+    return None
+
+
+def _text_parts(structure, path=()):
+    # (part number, subtype, charset, transfer encoding) of every text/plain or text/html part
+    if structure.is_multipart:
+        for index, part in enumerate(structure[0], 1):
+            yield from _text_parts(part, path + (index,))
+        return
+    maintype, subtype = structure[0].lower(), structure[1].lower()
+    if maintype == b"text" and subtype in (b"plain", b"html"):
+        params = structure[2] or ()
+        pairs = {key.lower(): value for key, value in zip(params[::2], params[1::2])}
+        charset = (pairs.get(b"charset") or b"utf-8").decode()
+        yield ".".join(map(str, path)) or "1", subtype, charset, (structure[5] or b"7bit").lower()
+
+
+def _decode(payload: bytes, charset: str, encoding: bytes) -> str:
+    if encoding == b"base64":
+        payload = base64.b64decode(payload)
+    elif encoding == b"quoted-printable":
+        payload = quopri.decodestring(payload)
+    try:
+        return payload.decode(charset, errors="replace")
+    except LookupError:
+        return payload.decode("utf-8", errors="replace")
+
+
+class OtpFetcher:
+    """
+    Login codes from the OTP inbox, over one persistent IMAP connection
+    owned by a dedicated thread so imapclient never blocks the event loop.
+
+    The thread sits in IDLE and searches (FROM the Beds24 senders, SINCE
+    today) whenever the mailbox changes while a login waits; only headers
+    and the text part of new matches are fetched. Each message is handed
+    to at most one waiting login, oldest waiter first, and claimed in
+    MongoDB so logins on other workers never get the same code.
+    """
+
+    def __init__(self, username: str, password: str, host: str = OTP_IMAP_HOST):
+        self.username = username
+        self.password = password
+        self.host = host
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._waiters = []
+        self._messages = {}
+        self._delivered = set()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped.clear()
+                self._thread = threading.Thread(target=self._run, name="otp-imap", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    async def wait_for_code(self, timeout: float = OTP_TIMEOUT, max_age: float = OTP_MAX_AGE) -> dict:
+        loop = asyncio.get_running_loop()
+        since = datetime.datetime.now(timezone.utc) - datetime.timedelta(seconds=max_age)
+        start = time.perf_counter()
+        deadline = time.monotonic() + timeout
+        while True:
+            future = loop.create_future()
+            waiter = (since, loop, future)
+            with self._lock:
+                self._waiters.append(waiter)
+            self._start()
+            self._wake.set()
+            try:
+                result = await asyncio.wait_for(future, max(0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                metrics.counter("otp_timeouts").inc()
+                return {"status": "error", "message": "No login code received in time"}
+            finally:
+                with self._lock:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+            if await _claim(self.username, result["code"]):
+                metrics.histogram("otp_wait_ms").observe((time.perf_counter() - start) * 1000)
+                return result
+            # A login on another worker took this code, wait for the next one
+            metrics.counter("otp_claim_conflicts").inc()
+
+    def _run(self):
+        server = None
+        failures = 0
+        while not self._stopped.is_set():
+            try:
+                if server is None:
+                    server = self._connect()
+                    failures = 0
+                # Cleared before looking, a waiter arriving after this wakes the next IDLE
+                self._wake.clear()
+                with self._lock:
+                    waiting = bool(self._waiters)
+                if waiting:
+                    self._scan(server)
+                if b"IDLE" in server.capabilities():
+                    self._idle(server)
+                else:
+                    self._wake.wait(OTP_POLL_INTERVAL if waiting else OTP_IDLE_RENEW)
+                    server.noop()
+            except Exception as e:
+                traceback.print_exc()
+                print(f"OTP inbox connection failed: {e}")
+                metrics.counter("otp_imap_errors").inc()
+                self._close(server)
+                server = None
+                failures += 1
+                self._stopped.wait(min(30, 2 ** failures))
+        self._close(server)
+
+    def _connect(self):
+        server = imapclient.IMAPClient(self.host, ssl=True, timeout=30)
+        server.login(self.username, self.password)
+        server.select_folder("INBOX", readonly=True)
+        metrics.counter("otp_imap_connects").inc()
+        return server
+
+    def _close(self, server):
+        if server is None:
+            return
+        try:
+            server.logout()
+        except Exception:
+            pass
+
+    def _idle(self, server):
+        server.idle()
+        renew_at = time.monotonic() + OTP_IDLE_RENEW
+        try:
+            # Short checks so a new waiter or stop() is noticed within a second
+            while not self._stopped.is_set() and not self._wake.is_set() and time.monotonic() < renew_at:
+                if any(response[1] == b"EXISTS" for response in server.idle_check(timeout=1) if len(response) > 1):
+                    break
+        finally:
+            server.idle_done()
+
+    def _scan(self, server):
+        # SINCE only compares dates in the server's timezone, the exact age is checked on delivery
+        since = datetime.datetime.now(timezone.utc).date() - datetime.timedelta(days=1)
+        uids = server.search(["OR", "FROM", OTP_SENDERS[0], "FROM", OTP_SENDERS[1], "SINCE", since])
+        current = set(uids)
+        with self._lock:
+            self._messages = {uid: message for uid, message in self._messages.items() if uid in current}
+            self._delivered &= current
+        new = [uid for uid in uids if uid not in self._messages]
+        if new:
+            self._fetch(server, new)
+        self._deliver()
+
+    def _fetch(self, server, uids: list):
+        header_key = b"BODY[HEADER.FIELDS (FROM DATE)]"
+        headers = server.fetch(uids, ["BODYSTRUCTURE", "BODY.PEEK[HEADER.FIELDS (FROM DATE)]"])
+        wanted = {}
+        for uid, data in headers.items():
+            message = email.message_from_bytes(data.get(header_key, b""))
+            sender = parseaddr(message.get("From", ""))[1].lower()
+            try:
+                date = parsedate_to_datetime(message.get("Date")).astimezone(timezone.utc)
+            except (TypeError, ValueError):
+                date = None
+            parts = sorted(_text_parts(data[b"BODYSTRUCTURE"]), key=lambda part: part[1] != b"plain")
+            self._messages[uid] = None
+            if sender in OTP_SENDERS and date and parts:
+                wanted[uid] = (sender, date, parts[0])
+        for uid, (sender, date, (number, _, charset, encoding)) in wanted.items():
+            body_key = f"BODY[{number}]".encode()
+            data = server.fetch([uid], [f"BODY.PEEK[{number}]"]).get(uid, {})
+            body = _decode(data.get(body_key, b""), charset, encoding)
+            code = extract_code(sender, body)
+            if code:
+                self._messages[uid] = {"code": code, "sender": sender, "date": date}
+        metrics.counter("otp_messages_fetched").inc(len(wanted))
+
+    def _deliver(self):
+        with self._lock:
+            candidates = sorted(
+                (
+                    (uid, message) for uid, message in self._messages.items()
+                    if message and uid not in self._delivered
+                ),
+                key=lambda item: item[1]["date"],
+                reverse=True
+            )
+            for waiter in list(self._waiters):
+                since, loop, future = waiter
+                match = next((item for item in candidates if item[1]["date"] >= since), None)
+                if match is None:
+                    continue
+                uid, message = match
+                candidates.remove(match)
+                self._delivered.add(uid)
+                self._waiters.remove(waiter)
+                result = {"status": "success", "code": message["code"], "sender": message["sender"]}
+                loop.call_soon_threadsafe(_resolve, future, result)
+
+
+def _resolve(future: asyncio.Future, result: dict):
+    if not future.done():
+        future.set_result(result)
+
+
+_fetchers = {}
+_claims = None
+
+
+async def start(collection):
+    """Codes are claimed in `collection` so each goes to one login across all workers."""
+    global _claims
+    _claims = collection
+    try:
+        await collection.create_index("expires_at", expireAfterSeconds=0)
+    except Exception as e:
+        print(f"Error creating OTP claims index: {e}")
+
+
+async def _claim(username: str, code: str) -> bool:
+    if _claims is None:
+        return True
+    try:
+        await _claims.insert_one({
+            "_id": f"{username}|{code}",
+            "expires_at": datetime.datetime.now(timezone.utc) + datetime.timedelta(seconds=2 * OTP_MAX_AGE)
+        })
+        return True
+    except DuplicateKeyError:
+        return False
+    except Exception as e:
+        # Without MongoDB each worker still hands a code to one login only
+        print(f"Error claiming login code: {e}")
+        return True
+
+
+def get_fetcher(username: str, password: str) -> OtpFetcher:
+    # One connection per inbox for the whole process
+    fetcher = _fetchers.get(username)
+    if fetcher is None or fetcher.password != password:
+        if fetcher is not None:
+            fetcher.stop()
+        fetcher = _fetchers[username] = OtpFetcher(username, password)
+    return fetcher
+
+
+def stop_all():
+    for fetcher in _fetchers.values():
+        fetcher.stop()
@@ -0,0 +1,242 @@
+import datetime
+from enum import Enum
+from typing import NamedTuple, Optional
+
+
+class FormField(NamedTuple):
+    # key: name in the endpoint response
+    # kind: "value" (input/textarea value), "option_text" (text of the selected
+    #       option), "checked" (checkbox state) or "checked_labels" (label text
+    #       of every checked checkbox matching the selector)
+    # attr: attribute of the request model written to this field, defaults to key
+    key: str
+    selector: str
+    kind: str = "value"
+    attr: Optional[str] = None
+
+
+# A form spec maps a response section either to a list of fields (rendered as
+# a dict) or to a single field (rendered as a scalar).
+AIRBNB_ROOM_FORM = {
+    "listing_details": [
+        FormField("publish", "#publish", "option_text"),
+        FormField("propertytypegroup", "#proptypegroup", "option_text"),
+        FormField("listingtype", "#listingtype", "option_text"),
+        FormField("updateaddress", "#hideaddress", "option_text"),
+        FormField("picsource", "#picsource", "option_text"),
+        FormField("bathroomshared", "#bathroomshared", "option_text"),
+        FormField("commonshared", "#commonshared", "option_text"),
+        FormField("checkincategory", "#checkincategory", "option_text"),
+        FormField("checkindesc", "#checkindesc"),
+        FormField("housemanual", "#housemanual"),
+    ],
+    "checkout_instructions": [
+        FormField("checkoutrk", "#checkoutrk"),
+        FormField("checkouttto", "#checkouttto"),
+        FormField("checkoutt", "#checkoutt"),
+        FormField("checkoutlu", "#checkoutlu"),
+        FormField("checkoutgt", "#checkoutgt"),
+        FormField("checkoutar", "#checkoutar"),
+    ],
+    "descriptions": [
+        FormField("multilang", "#multilang", "option_text"),
+        FormField("propnameEN", "#propnameEN"),
+        FormField("summaryEN", "#summaryEN"),
+        FormField("spaceEN", "#spaceEN"),
+        FormField("accessEN", "#accessEN"),
+        FormField("interactionEN", "#interactionEN"),
+        FormField("neighborhoodEN", "#neighborhoodEN"),
+        FormField("transitEN", "#transitEN"),
+        FormField("notesEN", "#notesEN"),
+    ],
+    "booking_rules": [
+        FormField("prebookmsg", "#prebookmsg"),
+        FormField("instantbookallow", "#instantbookallow", "option_text"),
+        FormField("cancelpolicy", "#cancelpolicy", "option_text"),
+        FormField("nonrefundfactor", "#nonrefundfactor", "option_text"),
+    ],
+    "pricing_settings": [
+        FormField("extraPersonPrice", "#extraperson"),
+        FormField("pricingstrategy", "#losprices", "option_text"),
+        FormField("guestsincluded", "#guestinc", "option_text"),
+        FormField("dateswithnoprice", "#datenoprice", "option_text"),
+        FormField("twodaydiscounts", "#day2disc", "option_text"),
+        FormField("threedaydiscounts", "#day3disc", "option_text"),
+        FormField("fourdaydiscounts", "#day4disc", "option_text"),
+        FormField("fivedaydiscounts", "#day5disc", "option_text"),
+        FormField("sixdaydiscounts", "#day6disc", "option_text"),
+        FormField("sevendaydiscounts", "#day7disc", "option_text"),
+        FormField("fourteendaydiscounts", "#day14disc", "option_text"),
+        FormField("twentyonedaydiscounts", "#day21disc", "option_text"),
+        FormField("twentyeightdaydiscounts", "#day28disc", "option_text"),
+        FormField("maxdaysinadvance", "#maxnotice", "option_text"),
+        FormField("advancenotice", "#leadtime", "option_text"),
+        FormField("advancenoticerequest", "#leadrequest", "option_text"),
+        FormField("earlybirddaystocheckin", "#bookbeyondd", "option_text"),
+        FormField("earlybirddiscountpercent", "#bookbeyondp", "option_text"),
+        FormField("lastminutedaystocheckin", "#bookwithind", "option_text"),
+        FormField("lastminutediscountpercent", "#bookwithinp", "option_text"),
+    ],
+    "custom": FormField("custom", "#custom"),
+}
+
+BOOKINGCOM_PROPERTY_FORM = {
+    "custom": [
+        FormField("custom", "#custom"),
+    ],
+    "property_details": [
+        FormField("number_of_floors", "#qtyfloor", "option_text", "numberoffloors"),
+        FormField("max_lenght_stay", "#maxlos", "option_text", "maxstay"),
+    ],
+    "property_profile": [
+        FormField("host_name", "#hostname", attr="hostname"),
+        FormField("host_location", "#hostloc", "option_text", "hostlocation"),
+        FormField("company", "#hosttype", "option_text"),
+        FormField("built", "#hostbuild"),
+        FormField("last_renovation", "#hostreno", attr="lastrenovated"),
+        FormField("rented_since", "#hostrent", attr="rentedSince"),
+        FormField("host_pic", "#hostpic", attr="host_pic_url"),
+        FormField("welcome_msg", "#welcomemsgEN"),
+        FormField("owner_listing_story", "#liststoryEN"),
+        FormField("neighborhood_overview", "#neighborhoodEN"),
+        FormField("local_tips", "#localtipsEN"),
+    ],
+    "invoices_contact": [
+        FormField("first_name", 'input[name="coninvfn"]', attr="firstname"),
+        FormField("last_name", 'input[name="coninvln"]', attr="lastname"),
+        FormField("email", 'input[name="coninvem"]'),
+        FormField("phone", 'input[name="coninvph"]'),
+        FormField("address", 'input[name="coninvad"]'),
+        FormField("city", 'input[name="coninvac"]'),
+        FormField("postcode", 'input[name="coninvap"]'),
+    ],
+    "reservations_contact": [
+        FormField("first_name", 'input[name="conresfn"]', attr="firstname"),
+        FormField("last_name", 'input[name="conresln"]', attr="lastname"),
+        FormField("email", 'input[name="conresem"]'),
+        FormField("phone", 'input[name="conresph"]'),
+    ],
+    "policies": FormField("policies", '.settingrow3 input[type="checkbox"]', "checked_labels"),
+}
+
+# Reads every field of a spec inside the page, one CDP round-trip in total
+EXTRACT_FIELDS_JS = """
+(spec) => {
+    const read = (field) => {
+        if (field.kind === "checked_labels") {
+            return Array.from(document.querySelectorAll(field.selector))
+                .filter(el => el.checked)
+                .map(el => el.closest("label"))
+                .filter(label => label)
+                .map(label => label.innerText.trim());
+        }
+        const el = document.querySelector(field.selector);
+        if (!el) return null;
+        if (field.kind === "option_text") {
+            const option = el.selectedOptions ? el.selectedOptions[0] : null;
+            return option ? option.innerText : null;
+        }
+        if (field.kind === "checked") return el.checked;
+        return el.value;
+    };
+    const result = {};
+    for (const [section, fields] of Object.entries(spec)) {
+        if (Array.isArray(fields)) {
+            result[section] = {};
+            for (const field of fields) result[section][field.key] = read(field);
+        } else {
+            result[section] = read(fields);
+        }
+    }
+    return result;
+}
+"""
+
+
+def _serialize(form: dict) -> dict:
+    return {
+        section: [field._asdict() for field in fields] if isinstance(fields, list) else fields._asdict()
+        for section, fields in form.items()
+    }
+
+
+async def extract_fields(page, form: dict) -> dict:
+    return await page.evaluate(EXTRACT_FIELDS_JS, _serialize(form))
+
+# Applies all writes in one in-page script: select options are matched by
+# value or label like page.select_option, input/change events are dispatched
+# for every write (or only for fields that differ with onlyChanged), then each
+# field is read back to verify it stuck. Line endings are compared normalised,
+# a textarea's value always reads back with \n.
+FILL_FIELDS_JS = """
+({writes, onlyChanged}) => {
+    const result = {changed: [], missing: [], mismatched: []};
+    const findOption = (el, value) => Array.from(el.options).find(o => o.value === value)
+        || Array.from(el.options).find(o => o.label.trim() === value.trim() || o.innerText.trim() === value.trim());
+    const sameValue = (a, b) => typeof a === "string" && typeof b === "string"
+        ? a.replace(/\\r\\n?/g, "\\n") === b.replace(/\\r\\n?/g, "\\n")
+        : a === b;
+    const applied = [];
+    for (const write of writes) {
+        const el = document.querySelector(write.selector);
+        if (!el) { result.missing.push(write.key); continue; }
+        let target = write.value;
+        if (write.kind === "option_text") {
+            const option = findOption(el, write.value);
+            if (!option) { result.missing.push(write.key); continue; }
+            target = option.value;
+        }
+        const differs = write.kind === "checked" ? el.checked !== write.value : !sameValue(el.value, target);
+        if (differs) result.changed.push(write.key);
+        else if (onlyChanged) continue;
+        if (write.kind === "checked") el.checked = write.value;
+        else el.value = target;
+        el.dispatchEvent(new Event("input", {bubbles: true}));
+        el.dispatchEvent(new Event("change", {bubbles: true}));
+        applied.push([write, el, target]);
+    }
+    for (const [write, el, target] of applied) {
+        const current = write.kind === "checked" ? el.checked : el.value;
+        if (!sameValue(current, target)) result.mismatched.push(write.key);
+    }
+    return result;
+}
+"""
+
+
+def _form_value(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime.date):
+        # Format the date pickers on the Booking.com property page expect
+        return value.strftime("%A, %d %B, %Y")
+    if isinstance(value, bool):
+        return value
+    return str(value)
+
+
+def form_writes(form: dict, values: dict) -> list:
+    # values maps a section to its request model (or plain value for scalar
+    # sections); None values and sections that are absent are left untouched.
+    writes = []
+    for section, fields in form.items():
+        source = values.get(section)
+        if source is None:
+            continue
+        for field in fields if isinstance(fields, list) else [fields]:
+            if field.kind == "checked_labels":
+                continue
+            value = getattr(source, field.attr or field.key, None) if isinstance(fields, list) else source
+            if value is None:
+                continue
+            writes.append({
+                "key": f"{section}.{field.key}",
+                "selector": field.selector,
+                "kind": field.kind,
+                "value": _form_value(value)
+            })
+    return writes
+
+
+async def fill_fields(page, form: dict, values: dict, only_changed: bool = False) -> dict:
+    return await page.evaluate(FILL_FIELDS_JS, {"writes": form_writes(form, values), "onlyChanged": only_changed})
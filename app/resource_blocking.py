@@ -0,0 +1,102 @@
+import os
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+import metrics
+
+RESOURCE_BLOCKING = os.environ.get("RESOURCE_BLOCKING", "true").lower() in ("1", "true", "yes")
+# Resource types aborted on every page, and additionally while only reading content
+RESOURCE_BLOCK_TYPES = set(os.environ.get("RESOURCE_BLOCK_TYPES", "image,media,font").split(","))
+RESOURCE_BLOCK_READ_TYPES = set(os.environ.get("RESOURCE_BLOCK_READ_TYPES", "stylesheet").split(","))
+# Flows that need the page as a user sees it (captcha, modals), only trackers are blocked there
+RESOURCE_ALLOW_FLOWS = set(os.environ.get("RESOURCE_ALLOW_FLOWS", "login,channel_push").split(","))
+TRACKER_DOMAINS = {
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "googleadservices.com",
+    "googlesyndication.com",
+    "facebook.net",
+    "facebook.com",
+    "hotjar.com",
+    "clarity.ms",
+    "bat.bing.com",
+    "licdn.com",
+} | {domain for domain in os.environ.get("RESOURCE_BLOCK_DOMAINS", "").split(",") if domain}
+
+# Rough transfer size of what a blocked request would have fetched, for the savings estimate
+ESTIMATED_BYTES = {
+    "image": 40_000,
+    "media": 250_000,
+    "font": 35_000,
+    "stylesheet": 30_000,
+    "script": 40_000,
+}
+ESTIMATED_BYTES_DEFAULT = 5_000
+
+
+def is_tracker(url: str) -> bool:
+    host = urlsplit(url).hostname or ""
+    return any(host == domain or host.endswith("." + domain) for domain in TRACKER_DOMAINS)
+
+
+class ResourceBlocker:
+    """
+    Aborts requests our extraction never needs, through one context.route
+    handler per session context. What gets blocked depends on the flow the
+    session is in: "read" also drops stylesheets, allowlisted flows only
+    drop trackers, any other flow drops images, media, fonts and trackers.
+    """
+
+    def __init__(self, enabled: bool = RESOURCE_BLOCKING):
+        self.enabled = enabled
+        self._flows = {}
+        self._stats = {}
+
+    def _blocked_types(self, flow: str) -> set:
+        if flow in RESOURCE_ALLOW_FLOWS:
+            return set()
+        if flow == "read":
+            return RESOURCE_BLOCK_TYPES | RESOURCE_BLOCK_READ_TYPES
+        return RESOURCE_BLOCK_TYPES
+
+    async def install(self, context, session_id: str):
+        if not self.enabled:
+            return
+        stats = self._stats.setdefault(session_id, {"allowed": 0, "blocked": 0, "blocked_by_type": {}, "bytes_saved": 0})
+
+        async def handle(route, request):
+            flow = self._flows.get(session_id, "default")
+            resource_type = request.resource_type
+            reason = "tracker" if is_tracker(request.url) else resource_type
+            if reason == "tracker" or resource_type in self._blocked_types(flow):
+                stats["blocked"] += 1
+                stats["blocked_by_type"][reason] = stats["blocked_by_type"].get(reason, 0) + 1
+                saved = ESTIMATED_BYTES.get(resource_type, ESTIMATED_BYTES_DEFAULT)
+                stats["bytes_saved"] += saved
+                metrics.counter(f"blocked_requests.{reason}").inc()
+                metrics.counter("blocked_bytes_estimate").inc(saved)
+                await route.abort("blockedbyclient")
+            else:
+                stats["allowed"] += 1
+                await route.continue_()
+
+        await context.route("**/*", handle)
+
+    @contextmanager
+    def flow(self, session_id: str, name: str):
+        previous = self._flows.get(session_id)
+        self._flows[session_id] = name
+        try:
+            yield
+        finally:
+            if previous is None:
+                self._flows.pop(session_id, None)
+            else:
+                self._flows[session_id] = previous
+
+    def forget(self, session_id: str):
+        self._flows.pop(session_id, None)
+        self._stats.pop(session_id, None)
+
+    def stats(self, session_id: str) -> dict:
+        return self._stats.get(session_id, {"allowed": 0, "blocked": 0, "blocked_by_type": {}, "bytes_saved": 0})
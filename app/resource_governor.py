@@ -0,0 +1,289 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Iterable
+from playwright.async_api import Browser, Page
+import metrics
+
+GOVERNOR_SAMPLE_INTERVAL = float(os.environ.get("GOVERNOR_SAMPLE_INTERVAL", "10"))
+# New sessions queue while memory use is above this share of the container limit,
+# and are refused with a 503 after waiting GOVERNOR_ADMIT_WAIT seconds
+GOVERNOR_ADMIT_RATIO = float(os.environ.get("GOVERNOR_ADMIT_RATIO", "0.85"))
+GOVERNOR_ADMIT_WAIT = float(os.environ.get("GOVERNOR_ADMIT_WAIT", "20"))
+GOVERNOR_RETRY_AFTER = int(os.environ.get("GOVERNOR_RETRY_AFTER", "30"))
+# Memory a session grows into shortly after opening, reserved while it is admitted
+GOVERNOR_SESSION_ESTIMATE_MB = float(os.environ.get("GOVERNOR_SESSION_ESTIMATE_MB", "150"))
+# A session whose page JS heap passes this is recycled; 0 disables
+GOVERNOR_CONTEXT_LIMIT_MB = float(os.environ.get("GOVERNOR_CONTEXT_LIMIT_MB", "512"))
+# A browser whose processes together pass this has its heaviest session recycled; 0 disables
+GOVERNOR_BROWSER_LIMIT_MB = float(os.environ.get("GOVERNOR_BROWSER_LIMIT_MB", "0"))
+
+MB = 1024 * 1024
+
+
+class HostAtCapacity(Exception):
+    pass
+
+
+def _read(path: str):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _stat_value(text: str, key: str) -> int:
+    for line in (text or "").splitlines():
+        name, _, value = line.partition(" ")
+        if name == key:
+            return int(value)
+    return 0
+
+
+def process_rss(pid: int) -> int:
+    statm = _read(f"/proc/{pid}/statm")
+    return int(statm.split()[1]) * os.sysconf("SC_PAGE_SIZE") if statm else 0
+
+
+def host_memory() -> tuple[int, int]:
+    """(used, limit) in bytes: the container's cgroup (v2, then v1) when it is limited, else the host."""
+    meminfo = {}
+    for line in (_read("/proc/meminfo") or "").splitlines():
+        key, _, value = line.partition(":")
+        meminfo[key] = int(value.split()[0]) * 1024
+    total = meminfo.get("MemTotal", 0)
+    for current_path, limit_path, stat_path, inactive_key in (
+        ("/sys/fs/cgroup/memory.current", "/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory.stat", "inactive_file"),
+        (
+            "/sys/fs/cgroup/memory/memory.usage_in_bytes",
+            "/sys/fs/cgroup/memory/memory.limit_in_bytes",
+            "/sys/fs/cgroup/memory/memory.stat",
+            "total_inactive_file"
+        ),
+    ):
+        current, limit = _read(current_path), _read(limit_path)
+        if current is None or not limit or limit == "max" or int(limit) >= total:
+            continue
+        # Working set as the OOM killer sees it, inactive page cache is reclaimable
+        inactive = _stat_value(_read(stat_path), inactive_key)
+        return max(0, int(current) - inactive), int(limit)
+    return total - meminfo.get("MemAvailable", 0), total
+
+
+class ResourceGovernor:
+    """
+    Tracks memory and CPU of the container, of this worker and of every
+    pooled browser (its processes come from CDP SystemInfo.getProcessInfo,
+    their RSS from /proc), plus the JS heap of every session page.
+
+    Opening a session goes through `admit`, which queues new sessions in
+    arrival order while memory is near the limit and raises HostAtCapacity
+    once they have waited too long. Sessions whose page outgrows its limit,
+    or the heaviest one of a browser that outgrows its own, are handed to
+    `recycle` so a single bad session cannot take the worker down.
+    """
+
+    def __init__(
+        self,
+        browsers: Callable[[], list[Browser]],
+        sessions: Callable[[], Iterable[tuple[str, Browser, Page]]],
+        recycle: Callable[[str], Awaitable[None]],
+        is_busy: Callable[[str], bool],
+        interval: float = GOVERNOR_SAMPLE_INTERVAL
+    ):
+        self.browsers = browsers
+        self.sessions = sessions
+        self.recycle = recycle
+        self.is_busy = is_busy
+        self.interval = interval
+        self._queue = asyncio.Lock()
+        self._admitting = 0
+        self._waiting = 0
+        self._task = None
+        self._browser_cdp = {}
+        self._page_cdp = {}
+        self._cpu = {}
+        self._recycling = set()
+        self._host = (0, 0)
+        self._worker = {}
+        self._browser_stats = []
+        self._heaps = {}
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def forget(self, session_id: str):
+        self._drop_page_cdp(session_id)
+        self._heaps.pop(session_id, None)
+
+    def _drop_page_cdp(self, session_id: str):
+        cached = self._page_cdp.pop(session_id, None)
+        if cached is not None:
+            task = asyncio.create_task(self._detach(cached[1]))
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+
+    @staticmethod
+    async def _detach(cdp):
+        try:
+            await cdp.detach()
+        except Exception:
+            # Already gone with its page or browser
+            pass
+
+    def _fits(self) -> bool:
+        used, limit = host_memory()
+        self._host = (used, limit)
+        return used + self._admitting * GOVERNOR_SESSION_ESTIMATE_MB * MB < limit * GOVERNOR_ADMIT_RATIO
+
+    @asynccontextmanager
+    async def admit(self):
+        # Held while the context opens, so concurrent admissions count each other's reservation
+        start = time.perf_counter()
+        self._waiting += 1
+        try:
+            async with asyncio.timeout(GOVERNOR_ADMIT_WAIT):
+                async with self._queue:
+                    while not self._fits():
+                        await asyncio.sleep(1)
+                    self._admitting += 1
+        except TimeoutError:
+            metrics.counter("governor_rejected").inc()
+            used, limit = self._host
+            raise HostAtCapacity(f"Memory at {used // MB} of {limit // MB} MB, no room for another session")
+        finally:
+            self._waiting -= 1
+        metrics.histogram("governor_admit_wait_ms").observe((time.perf_counter() - start) * 1000)
+        try:
+            yield
+        finally:
+            self._admitting -= 1
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sample()
+            except Exception as e:
+                print(f"Error sampling resource usage: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def _browser_usage(self, browser: Browser, now: float) -> dict:
+        cdp = self._browser_cdp.get(browser)
+        if cdp is None:
+            cdp = self._browser_cdp[browser] = await browser.new_browser_cdp_session()
+        info = await asyncio.wait_for(cdp.send("SystemInfo.getProcessInfo"), 5)
+        processes = info["processInfo"]
+        cpu_time = sum(process["cpuTime"] for process in processes)
+        previous = self._cpu.get(browser)
+        self._cpu[browser] = (cpu_time, now)
+        return {
+            "processes": len(processes),
+            "rss_mb": round(sum(process_rss(process["id"]) for process in processes) / MB),
+            "cpu_percent": round(100 * (cpu_time - previous[0]) / (now - previous[1]), 1) if previous else None
+        }
+
+    async def _page_heap(self, session_id: str, page: Page) -> int:
+        cached = self._page_cdp.get(session_id)
+        if cached is None or cached[0] is not page:
+            # The session moved to a new page, the old page's CDP session would stay attached
+            self._drop_page_cdp(session_id)
+            cached = self._page_cdp[session_id] = (page, await page.context.new_cdp_session(page))
+        usage = await asyncio.wait_for(cached[1].send("Runtime.getHeapUsage"), 5)
+        return int(usage["totalSize"])
+
+    async def sample(self):
+        now = time.monotonic()
+        used, limit = self._host = host_memory()
+        metrics.gauge("host_memory_used_mb").set(used // MB)
+        self._worker = {
+            "rss_mb": round(process_rss(os.getpid()) / MB),
+            "cpu_seconds": round(time.process_time(), 1)
+        }
+
+        browsers = self.browsers()
+        for browser in set(self._browser_cdp) - set(browsers):
+            await self._detach(self._browser_cdp.pop(browser))
+            self._cpu.pop(browser, None)
+        browser_stats = {}
+        for browser in browsers:
+            try:
+                browser_stats[browser] = await self._browser_usage(browser, now)
+            except Exception as e:
+                cdp = self._browser_cdp.pop(browser, None)
+                if cdp is not None:
+                    await self._detach(cdp)
+                print(f"Error reading browser process info: {e}")
+
+        heaps = {}
+        placement = {}
+        for session_id, browser, page in list(self.sessions()):
+            placement[session_id] = browser
+            try:
+                heaps[session_id] = await self._page_heap(session_id, page)
+            except Exception:
+                # Page closed or navigating, measured again next round
+                self._drop_page_cdp(session_id)
+        for session_id in set(self._page_cdp) - set(placement):
+            self._drop_page_cdp(session_id)
+        self._heaps = heaps
+        self._browser_stats = [
+            {**stats, "sessions": sum(1 for session_browser in placement.values() if session_browser is browser)}
+            for browser, stats in browser_stats.items()
+        ]
+
+        oversized = set()
+        if GOVERNOR_CONTEXT_LIMIT_MB:
+            oversized.update(session_id for session_id, heap in heaps.items() if heap > GOVERNOR_CONTEXT_LIMIT_MB * MB)
+        if GOVERNOR_BROWSER_LIMIT_MB:
+            for browser, stats in browser_stats.items():
+                if stats["rss_mb"] <= GOVERNOR_BROWSER_LIMIT_MB:
+                    continue
+                hosted = [session_id for session_id, session_browser in placement.items() if session_browser is browser]
+                heaviest = max(hosted, key=lambda session_id: heaps.get(session_id, 0), default=None)
+                if heaviest:
+                    oversized.add(heaviest)
+        for session_id in oversized - self._recycling:
+            # Busy ones are picked up again by the next sample
+            if not self.is_busy(session_id):
+                self._recycling.add(session_id)
+                asyncio.create_task(self._recycle(session_id))
+
+    async def _recycle(self, session_id: str):
+        start = time.perf_counter()
+        try:
+            heap = self._heaps.get(session_id, 0)
+            print(f"Recycling session {session_id}, page heap at {heap // MB} MB")
+            await self.recycle(session_id)
+            metrics.counter("governor_recycled").inc()
+            metrics.histogram("governor_recycle_ms").observe((time.perf_counter() - start) * 1000)
+        except Exception as e:
+            print(f"Error recycling session {session_id}: {e}")
+        finally:
+            self.forget(session_id)
+            self._recycling.discard(session_id)
+
+    def stats(self) -> dict:
+        used, limit = self._host
+        heaviest = sorted(self._heaps.items(), key=lambda item: item[1], reverse=True)[:10]
+        return {
+            "host": {"used_mb": used // MB, "limit_mb": limit // MB, "admit_below_mb": round(limit * GOVERNOR_ADMIT_RATIO / MB)},
+            "worker": self._worker,
+            "browsers": self._browser_stats,
+            "heaviest_sessions": [{"session_id": session_id, "heap_mb": heap // MB} for session_id, heap in heaviest],
+            "admitting": self._admitting,
+            "waiting": self._waiting,
+            "rejected": metrics.counter("governor_rejected").value,
+            "recycled": metrics.counter("governor_recycled").value,
+            "recycling": sorted(self._recycling)
+        }
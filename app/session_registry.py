@@ -0,0 +1,305 @@
+import asyncio
+import contextlib
+import datetime
+import hmac
+import os
+import secrets
+import socket
+import uuid
+from datetime import timezone
+from typing import Awaitable, Callable, Optional
+import httpx
+import uvicorn
+from fastapi import Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pymongo import ReturnDocument
+from starlette.background import BackgroundTask
+import metrics
+
+# How long a worker owns its sessions without renewing, and how often it renews
+SESSION_LEASE_TTL = float(os.environ.get("SESSION_LEASE_TTL", "30"))
+SESSION_LEASE_HEARTBEAT = float(os.environ.get("SESSION_LEASE_HEARTBEAT", "10"))
+# Orphaned sessions (owner gone) taken over per heartbeat
+SESSION_ADOPT_BATCH = int(os.environ.get("SESSION_ADOPT_BATCH", "100"))
+# Internal listener other workers forward session requests to; port 0 picks a free one.
+# It listens on the advertised address (the pod IP by default) unless a bind address is given.
+SESSION_REGISTRY_BIND = os.environ.get("SESSION_REGISTRY_BIND")
+SESSION_REGISTRY_PORT = int(os.environ.get("SESSION_REGISTRY_PORT", "0"))
+SESSION_REGISTRY_HOST = os.environ.get("SESSION_REGISTRY_HOST")
+# Shared by all workers to authenticate forwarded requests; generated once and kept in MongoDB when unset
+SESSION_REGISTRY_SECRET = os.environ.get("SESSION_REGISTRY_SECRET")
+
+# Marks a forwarded request, the receiving worker never forwards it again
+FORWARDED_HEADER = "x-session-forwarded-by"
+SECRET_HEADER = "x-session-registry-secret"
+HOP_BY_HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "upgrade", "host", "content-length"}
+
+
+class _InternalServer(uvicorn.Server):
+    # Signals belong to the public server, this one is stopped by the registry
+    @contextlib.contextmanager
+    def capture_signals(self):
+        yield
+
+
+def advertised_host() -> str:
+    if SESSION_REGISTRY_HOST:
+        return SESSION_REGISTRY_HOST
+    try:
+        return socket.gethostbyname(socket.gethostname())
+    except OSError as e:
+        # Only workers of this host can reach us then
+        print(f"Error resolving this host's address, advertising loopback: {e}")
+        return "127.0.0.1"
+
+
+def require_secret(app, secret: str):
+    """ASGI wrapper refusing requests that don't carry the registry secret."""
+    expected = secret.encode()
+
+    async def guarded(scope, receive, send):
+        if scope["type"] == "http":
+            provided = dict(scope["headers"]).get(SECRET_HEADER.encode(), b"")
+            if not hmac.compare_digest(provided, expected):
+                await JSONResponse(status_code=403, content={"detail": "Forbidden"})(scope, receive, send)
+                return
+        await app(scope, receive, send)
+    return guarded
+
+
+class SessionRegistry:
+    """
+    Lets several uvicorn workers and pods share sessions. Each session
+    document carries the id of the worker holding its browser context, and
+    each worker keeps a lease in `workers_collection` renewed by a heartbeat.
+
+    Requests for a session owned by another live worker are forwarded to
+    that worker's internal listener. Sessions whose owner's lease lapsed are
+    taken over with a compare-and-set on the owner field and handed to
+    `on_adopt`, which makes them lazily restorable here; `on_lost` is called
+    for sessions another worker took from this one.
+    """
+
+    def __init__(
+        self,
+        sessions_collection,
+        workers_collection,
+        app,
+        on_adopt: Callable[[dict], None],
+        on_lost: Callable[[str], Awaitable[None]]
+    ):
+        self.sessions = sessions_collection
+        self.workers = workers_collection
+        self.app = app
+        self.on_adopt = on_adopt
+        self.on_lost = on_lost
+        self.worker_id = uuid.uuid4().hex
+        self.address = None
+        self._secret = None
+        self._owned = set()
+        self._live = {}
+        self._server = None
+        self._server_task = None
+        self._heartbeat_task = None
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        await self.workers.create_index("expires_at", expireAfterSeconds=0)
+        await self.sessions.create_index("owner")
+        self._secret = await self._shared_secret()
+        host = advertised_host()
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((SESSION_REGISTRY_BIND or host, SESSION_REGISTRY_PORT))
+            self.address = f"http://{host}:{sock.getsockname()[1]}"
+            config = uvicorn.Config(
+                require_secret(self.app, self._secret), lifespan="off", log_level="warning", timeout_keep_alive=30
+            )
+            self._server = _InternalServer(config)
+            self._server_task = asyncio.create_task(self._server.serve(sockets=[sock]))
+        except OSError as e:
+            # Still serves its own sessions, other workers just can't forward here
+            print(f"Error starting internal session listener: {e}")
+        self._client = httpx.AsyncClient(timeout=httpx.Timeout(None, connect=5))
+        await self._renew()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+
+    async def stop(self):
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+        # Dropping the lease lets other workers adopt our sessions right away
+        try:
+            await self.workers.delete_one({"_id": self.worker_id})
+        except Exception as e:
+            print(f"Error releasing worker lease: {e}")
+        if self._server is not None:
+            self._server.should_exit = True
+            await self._server_task
+            self._server = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _shared_secret(self) -> str:
+        if SESSION_REGISTRY_SECRET:
+            return SESSION_REGISTRY_SECRET
+        # The first worker's secret wins, the others read it back
+        await self.workers.update_one(
+            {"_id": "forwarding_secret"},
+            {"$setOnInsert": {"secret": secrets.token_urlsafe(32)}},
+            upsert=True
+        )
+        return (await self.workers.find_one({"_id": "forwarding_secret"}))["secret"]
+
+    def live_workers(self) -> set:
+        return set(self._live)
+
+    def owns(self, session_id: str) -> bool:
+        return session_id in self._owned
+
+    async def claim(self, session_id: str):
+        # A session created on this worker
+        await self.sessions.update_one({"_id": session_id}, {"$set": {"owner": self.worker_id}}, upsert=True)
+        self._owned.add(session_id)
+
+    async def release(self, session_id: str):
+        if session_id not in self._owned:
+            return
+        self._owned.discard(session_id)
+        await self.sessions.update_one({"_id": session_id, "owner": self.worker_id}, {"$unset": {"owner": ""}})
+
+    async def _renew(self):
+        expires_at = datetime.datetime.now(timezone.utc) + datetime.timedelta(seconds=SESSION_LEASE_TTL)
+        await self.workers.update_one(
+            {"_id": self.worker_id},
+            {"$set": {"address": self.address, "expires_at": expires_at}},
+            upsert=True
+        )
+        self._live = {
+            worker["_id"]: worker.get("address")
+            async for worker in self.workers.find({"expires_at": {"$gt": datetime.datetime.now(timezone.utc)}})
+        }
+        metrics.gauge("session_registry_workers").set(len(self._live))
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(SESSION_LEASE_HEARTBEAT)
+            try:
+                await self._renew()
+                # Only sessions owned before the query, a claim racing it is not a loss
+                before = set(self._owned)
+                owned = {doc["_id"] async for doc in self.sessions.find({"owner": self.worker_id}, {"_id": 1})}
+                for session_id in (before & self._owned) - owned:
+                    print(f"Session {session_id} was taken over by another worker")
+                    self._owned.discard(session_id)
+                    metrics.counter("session_registry_lost").inc()
+                    await self.on_lost(session_id)
+                async for session_data in self.adopt_orphans({"url": 1, "last_access": 1, "username": 1}, SESSION_ADOPT_BATCH):
+                    self.on_adopt(session_data)
+            except Exception as e:
+                print(f"Error renewing session lease: {e}")
+
+    async def _take_over(self, session_id: str, previous_owner: Optional[str], projection: dict) -> Optional[dict]:
+        # Compare-and-set, only one worker wins an orphan
+        session_data = await self.sessions.find_one_and_update(
+            {"_id": session_id, "owner": previous_owner, "in_use": True, "storage_state": {"$exists": True}},
+            {"$set": {"owner": self.worker_id}},
+            projection=projection,
+            return_document=ReturnDocument.AFTER
+        )
+        if session_data is None:
+            return None
+        self._owned.add(session_id)
+        metrics.counter("session_registry_adopted").inc()
+        return session_data
+
+    async def adopt_orphans(self, projection: dict, limit: int = 0):
+        """Takes over saved sessions without a live owner, yielding the ones this worker won."""
+        query = {"in_use": True, "storage_state": {"$exists": True}, "owner": {"$nin": list(self._live)}}
+        async for session_data in self.sessions.find(query, {"owner": 1}).limit(limit):
+            adopted = await self._take_over(session_data["_id"], session_data.get("owner"), projection)
+            if adopted is not None:
+                yield adopted
+
+    async def _is_live(self, worker_id: str) -> bool:
+        if worker_id in self._live:
+            return True
+        # Started since our last heartbeat
+        worker = await self.workers.find_one({"_id": worker_id, "expires_at": {"$gt": datetime.datetime.now(timezone.utc)}})
+        if worker is None:
+            return False
+        self._live[worker_id] = worker.get("address")
+        return True
+
+    async def route(self, session_id: str) -> Optional[str]:
+        """
+        Address of the other live worker owning the session, or None when it
+        is handled here: owned by this worker, unknown, or just taken over.
+        """
+        if session_id in self._owned:
+            return None
+        for _ in range(2):
+            session_data = await self.sessions.find_one({"_id": session_id}, {"owner": 1})
+            if session_data is None:
+                return None
+            owner = session_data.get("owner")
+            if owner == self.worker_id:
+                self._owned.add(session_id)
+                return None
+            if owner is not None and await self._is_live(owner):
+                # None when that worker has no listener, its sessions can't be reached from here
+                return self._live[owner]
+            adopted = await self._take_over(session_id, owner, {"url": 1, "last_access": 1, "username": 1})
+            if adopted is not None:
+                self.on_adopt(adopted)
+                return None
+            # Lost the race to another worker or the session ended, look again
+        return None
+
+    async def forward(self, request: Request, address: str):
+        headers = {key: value for key, value in request.headers.items() if key.lower() not in HOP_BY_HOP_HEADERS}
+        headers[FORWARDED_HEADER] = self.worker_id
+        headers[SECRET_HEADER] = self._secret
+        upstream = self._client.build_request(
+            request.method,
+            f"{address}{request.url.path}",
+            params=request.url.query,
+            headers=headers,
+            content=request.stream()
+        )
+        try:
+            response = await self._client.send(upstream, stream=True)
+        except httpx.TransportError as e:
+            # The owner died since its last heartbeat, the session is adoptable once its lease runs out
+            print(f"Error forwarding to session owner {address}: {e}")
+            metrics.counter("session_registry_forward_errors").inc()
+            return JSONResponse(
+                status_code=503,
+                content={"detail": "Session owner unreachable"},
+                headers={"Retry-After": str(int(SESSION_LEASE_TTL))}
+            )
+        metrics.counter("session_registry_forwarded").inc()
+        return StreamingResponse(
+            response.aiter_raw(),
+            status_code=response.status_code,
+            headers={key: value for key, value in response.headers.items() if key.lower() not in HOP_BY_HOP_HEADERS - {"content-length"}},
+            background=BackgroundTask(response.aclose)
+        )
+
+    def stats(self) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "address": self.address,
+            "owned_sessions": len(self._owned),
+            "live_workers": len(self._live),
+            "adopted": metrics.counter("session_registry_adopted").value,
+            "lost": metrics.counter("session_registry_lost").value,
+            "forwarded": metrics.counter("session_registry_forwarded").value,
+            "forward_errors": metrics.counter("session_registry_forward_errors").value
+        }
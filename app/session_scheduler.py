@@ -0,0 +1,92 @@
+import asyncio
+import functools
+import os
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional
+from fastapi import HTTPException
+import metrics
+
+# Requests allowed to wait behind the one currently driving a session's page,
+# and how long one of them may wait before giving up.
+SESSION_QUEUE_LIMIT = int(os.environ.get("SESSION_QUEUE_LIMIT", "8"))
+SESSION_QUEUE_TIMEOUT = float(os.environ.get("SESSION_QUEUE_TIMEOUT", "120"))
+
+# Sessions held by the current task, so nested endpoint calls don't deadlock
+_held_sessions = ContextVar("held_sessions", default=frozenset())
+
+
+class SessionScheduler:
+    """
+    Serialises use of a session's page: one request at a time per session,
+    in FIFO order (asyncio.Lock wakes waiters in arrival order).
+    """
+
+    def __init__(self, queue_limit: int = SESSION_QUEUE_LIMIT, queue_timeout: float = SESSION_QUEUE_TIMEOUT):
+        self.queue_limit = queue_limit
+        self.queue_timeout = queue_timeout
+        self._locks = {}
+        self._waiting = {}
+
+    def _update_gauge(self):
+        metrics.gauge("session_queue_waiting").set(sum(self._waiting.values()))
+
+    def depth(self, session_id: str) -> int:
+        return self._waiting.get(session_id, 0)
+
+    def busy(self, session_id: str) -> bool:
+        lock = self._locks.get(session_id)
+        return bool(lock and lock.locked())
+
+    @asynccontextmanager
+    async def slot(self, session_id: str, timeout: Optional[float] = None):
+        # timeout overrides queue_timeout, for background callers that can wait longer
+        held = _held_sessions.get()
+        if session_id in held:
+            yield
+            return
+        lock = self._locks.setdefault(session_id, asyncio.Lock())
+        if lock.locked() and self._waiting.get(session_id, 0) >= self.queue_limit:
+            metrics.counter("session_queue_rejected").inc()
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests queued for this session",
+                headers={"Retry-After": "5"}
+            )
+        self._waiting[session_id] = self._waiting.get(session_id, 0) + 1
+        self._update_gauge()
+        start = time.perf_counter()
+        try:
+            async with asyncio.timeout(timeout if timeout is not None else self.queue_timeout):
+                await lock.acquire()
+        except TimeoutError:
+            metrics.counter("session_queue_timeouts").inc()
+            raise HTTPException(
+                status_code=503,
+                detail="Timed out waiting for the session to become available",
+                headers={"Retry-After": "10"}
+            )
+        finally:
+            self._waiting[session_id] -= 1
+            if not self._waiting[session_id]:
+                self._waiting.pop(session_id)
+            self._update_gauge()
+        metrics.histogram("session_queue_wait_ms").observe((time.perf_counter() - start) * 1000)
+        token = _held_sessions.set(held | {session_id})
+        try:
+            yield
+        finally:
+            _held_sessions.reset(token)
+            lock.release()
+            if not lock.locked() and session_id not in self._waiting:
+                self._locks.pop(session_id, None)
+
+    def exclusive(self, endpoint):
+        # Decorator for endpoints taking session_id as first/keyword argument
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            session_id = kwargs["session_id"] if "session_id" in kwargs else args[0]
+            async with self.slot(session_id):
+                return await endpoint(*args, **kwargs)
+        return wrapper
@@ -0,0 +1,144 @@
+import asyncio
+import os
+import time
+from pymongo import DeleteOne, ReplaceOne, UpdateOne
+import metrics
+
+# Writes issued within this window are coalesced into a single bulk_write
+SESSION_STATE_FLUSH_INTERVAL = float(os.environ.get("SESSION_STATE_FLUSH_INTERVAL", "0.5"))
+
+
+class SessionStateStore:
+    """
+    One document per session, updated with targeted $set/$unset operations.
+
+    Updates are buffered per session and flushed together after a short
+    debounce; fields whose value did not change since the last write are
+    dropped so unchanged storage state is never rewritten. A batch that
+    fails to write is queued again under any newer changes.
+    """
+
+    def __init__(self, collection, flush_interval: float = SESSION_STATE_FLUSH_INTERVAL):
+        self.collection = collection
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._written = {}
+        self._flush_task = None
+        # One flush at a time, so a failed batch is never requeued over a newer one already written
+        self._flush_lock = asyncio.Lock()
+
+    def update(self, session_id: str, unset: tuple = (), **fields):
+        written = self._written.get(session_id, {})
+        changes = self._pending.get(session_id)
+        if changes is None:
+            # After a pending delete the document is rewritten from scratch
+            replace = session_id in self._pending
+            changes = self._pending[session_id] = {"$set": {}, "$unset": {}, "replace": replace}
+        for key, value in fields.items():
+            if key in written and written[key] == value and key not in changes["$unset"] and not changes["replace"]:
+                changes["$set"].pop(key, None)
+                continue
+            changes["$set"][key] = value
+            changes["$unset"].pop(key, None)
+        for key in unset:
+            changes["$set"].pop(key, None)
+            if not changes["replace"]:
+                changes["$unset"][key] = ""
+        self._schedule()
+
+    def delete(self, session_id: str):
+        # None marks a pending delete, it supersedes any buffered update
+        self._pending[session_id] = None
+        self._written.pop(session_id, None)
+        self._schedule()
+
+    def _requeue(self, pending: dict):
+        # Put a failed batch back under anything queued since, newer changes win
+        for session_id, changes in pending.items():
+            if session_id not in self._pending:
+                self._pending[session_id] = changes
+                continue
+            newer = self._pending[session_id]
+            if newer is None or newer["replace"]:
+                continue
+            if changes is None:
+                newer["replace"] = True
+                newer["$unset"] = {}
+                continue
+            merged = {"$set": dict(changes["$set"]), "$unset": dict(changes["$unset"]), "replace": changes["replace"]}
+            for key, value in newer["$set"].items():
+                merged["$set"][key] = value
+                merged["$unset"].pop(key, None)
+            for key in newer["$unset"]:
+                merged["$set"].pop(key, None)
+                if not merged["replace"]:
+                    merged["$unset"][key] = ""
+            self._pending[session_id] = merged
+
+    def _schedule(self):
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        # Stays the scheduled task until its write finishes, updates meanwhile get the next one
+        try:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+        finally:
+            if self._flush_task is asyncio.current_task():
+                self._flush_task = None
+        if self._pending:
+            self._schedule()
+
+    async def flush(self):
+        async with self._flush_lock:
+            await self._flush()
+
+    async def _flush(self):
+        pending, self._pending = self._pending, {}
+        operations = []
+        for session_id, changes in pending.items():
+            if changes is None:
+                operations.append(DeleteOne({"_id": session_id}))
+            elif changes["replace"]:
+                operations.append(ReplaceOne({"_id": session_id}, changes["$set"], upsert=True))
+            elif changes["$set"] or changes["$unset"]:
+                update = {op: changes[op] for op in ("$set", "$unset") if changes[op]}
+                operations.append(UpdateOne({"_id": session_id}, update, upsert=True))
+        if not operations:
+            return
+        start = time.perf_counter()
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except asyncio.CancelledError:
+            self._requeue(pending)
+            raise
+        except Exception as e:
+            print(f"Error saving session state to MongoDB: {e}")
+            metrics.counter("session_state_flush_errors").inc()
+            self._requeue(pending)
+            self._schedule()
+            return
+        metrics.histogram("session_state_flush_ms").observe((time.perf_counter() - start) * 1000)
+        metrics.counter("session_state_flush_operations").inc(len(operations))
+        for session_id, changes in pending.items():
+            if changes is None:
+                continue
+            if changes["$unset"]:
+                # The session ended, nothing left worth comparing against
+                self._written.pop(session_id, None)
+                continue
+            if changes["replace"]:
+                self._written[session_id] = dict(changes["$set"])
+            else:
+                self._written.setdefault(session_id, {}).update(changes["$set"])
+
+    async def close(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        if self._flush_task:
+            # Shutting down, a failed flush has nowhere left to retry
+            self._flush_task.cancel()
+            self._flush_task = None
@@ -0,0 +1,24 @@
+import asyncio
+import inspect
+import os
+import sys
+import pytest
+
+# The app modules import each other by their flat names
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fakes import FakeCollection  # noqa: E402
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem):
+    # async tests run on a fresh event loop each, no plugin needed
+    if inspect.iscoroutinefunction(pyfuncitem.obj):
+        arguments = {name: pyfuncitem.funcargs[name] for name in pyfuncitem._fixtureinfo.argnames}
+        asyncio.run(asyncio.wait_for(pyfuncitem.obj(**arguments), 10))
+        return True
+
+
+@pytest.fixture
+def collection():
+    return FakeCollection()
@@ -0,0 +1,122 @@
+import copy
+from types import SimpleNamespace
+from pymongo.errors import DuplicateKeyError
+
+
+def _matches(doc: dict, query: dict) -> bool:
+    for key, condition in query.items():
+        value = doc.get(key)
+        if isinstance(condition, dict) and any(op.startswith("$") for op in condition):
+            for op, operand in condition.items():
+                if op == "$exists" and (key in doc) != operand:
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$nin" and value in operand:
+                    return False
+                if op == "$gt" and not (value is not None and value > operand):
+                    return False
+                if op == "$lt" and not (value is not None and value < operand):
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _parent(doc: dict, path: str):
+    *parents, leaf = path.split(".")
+    for key in parents:
+        doc = doc.setdefault(key, {})
+    return doc, leaf
+
+
+def _apply(doc: dict, update: dict):
+    for path, value in update.get("$set", {}).items():
+        parent, leaf = _parent(doc, path)
+        parent[leaf] = copy.deepcopy(value)
+    for path, value in update.get("$inc", {}).items():
+        parent, leaf = _parent(doc, path)
+        parent[leaf] = parent.get(leaf, 0) + value
+    for path, value in update.get("$max", {}).items():
+        parent, leaf = _parent(doc, path)
+        if leaf not in parent or parent[leaf] < value:
+            parent[leaf] = value
+    for path in update.get("$unset", {}):
+        parent, leaf = _parent(doc, path)
+        parent.pop(leaf, None)
+
+
+class FakeCollection:
+    """
+    The slice of a Motor collection the app modules use, in memory. Every
+    write is recorded in `writes` as (operation, filter, document).
+    """
+
+    def __init__(self):
+        self.docs = {}
+        self.writes = []
+        self.fail_writes = 0
+
+    def written(self, operation: str) -> list:
+        return [write for write in self.writes if write[0] == operation]
+
+    async def create_index(self, keys, **kwargs):
+        pass
+
+    async def find_one(self, query: dict, projection: dict = None):
+        for doc in self.docs.values():
+            if _matches(doc, query):
+                return copy.deepcopy(doc)
+        return None
+
+    async def find(self, query: dict, projection: dict = None):
+        for doc in list(self.docs.values()):
+            if _matches(doc, query):
+                yield copy.deepcopy(doc)
+
+    async def insert_one(self, doc: dict):
+        self.writes.append(("insert_one", {"_id": doc["_id"]}, copy.deepcopy(doc)))
+        self.docs[doc["_id"]] = copy.deepcopy(doc)
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False):
+        self.writes.append(("update_one", copy.deepcopy(query), copy.deepcopy(update)))
+        return self._update(query, update, upsert)
+
+    def _update(self, query: dict, update: dict, upsert: bool):
+        for doc in self.docs.values():
+            if _matches(doc, query):
+                _apply(doc, update)
+                return SimpleNamespace(matched_count=1, modified_count=1)
+        if upsert:
+            if query.get("_id") in self.docs:
+                raise DuplicateKeyError("E11000 duplicate key error")
+            doc = {key: value for key, value in query.items() if not isinstance(value, dict)}
+            _apply(doc, update)
+            self.docs[doc["_id"]] = doc
+        return SimpleNamespace(matched_count=0, modified_count=0)
+
+    async def delete_one(self, query: dict):
+        self.writes.append(("delete_one", copy.deepcopy(query), None))
+        self._delete(query)
+
+    def _delete(self, query: dict):
+        for key, doc in list(self.docs.items()):
+            if _matches(doc, query):
+                del self.docs[key]
+                return
+
+    async def bulk_write(self, operations, ordered: bool = True):
+        if self.fail_writes:
+            self.fail_writes -= 1
+            raise RuntimeError("write failed")
+        for operation in operations:
+            kind = operation.__class__.__name__
+            document = getattr(operation, "_doc", None)
+            self.writes.append((kind, copy.deepcopy(operation._filter), copy.deepcopy(document)))
+            if kind == "DeleteOne":
+                self._delete(operation._filter)
+            elif kind == "ReplaceOne":
+                self._delete(operation._filter)
+                self.docs[operation._filter["_id"]] = {"_id": operation._filter["_id"], **copy.deepcopy(document)}
+            else:
+                self._update(operation._filter, document, operation._upsert)
@@ -0,0 +1,116 @@
+import httpx
+import pytest
+import airbnb_bulk
+from airbnb_bulk import import_listings
+from models import AirbnbListingImport
+
+
+class FakeApi:
+    """Answers each POST with the next scripted response (status, body) or exception."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.sent = []
+        self.tokens = []
+        self.retries = []
+
+    async def post(self, path, name, headers=None, json=None, retries=None):
+        self.sent.append([action["airbnbListingId"] for action in json])
+        self.tokens.append(headers["token"])
+        self.retries.append(retries)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        status, body = response
+        return httpx.Response(status, json=body)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(airbnb_bulk, "AIRBNB_BULK_RETRY_BACKOFF", 0)
+
+
+def listings(count: int) -> list:
+    return [AirbnbListingImport(airbnbUserId="u", airbnbListingId=str(i)) for i in range(count)]
+
+
+async def run_import(api, count: int, chunk_size: int = 10, max_attempts: int = 3, refresh=None) -> list:
+    return [item async for item in import_listings(api, "token", listings(count), chunk_size, 1, max_attempts, refresh)]
+
+
+def statuses(results: list) -> dict:
+    return {item["airbnbListingId"]: item["status"] for item in results if "index" in item}
+
+
+async def test_only_failed_items_are_resent():
+    api = FakeApi(
+        (200, [{"success": True}, {"success": False}, {"success": True}]),
+        (200, [{"success": True}])
+    )
+    results = await run_import(api, 3)
+    assert api.sent == [["0", "1", "2"], ["1"]]
+    assert statuses(results) == {"0": "success", "1": "success", "2": "success"}
+    assert results[-1]["summary"] == {"total": 3, "success": 3, "error": 0, "unknown": 0}
+
+
+async def test_missing_items_are_reported_as_errors():
+    api = FakeApi((200, [{"success": True}]))
+    results = await run_import(api, 3)
+    assert statuses(results) == {"0": "success", "1": "error", "2": "error"}
+
+
+async def test_server_errors_are_not_retried():
+    api = FakeApi((502, {"error": "bad gateway"}))
+    results = await run_import(api, 2)
+    assert len(api.sent) == 1
+    assert statuses(results) == {"0": "unknown", "1": "unknown"}
+
+
+async def test_rate_limited_chunks_are_retried():
+    api = FakeApi((429, {}), (200, [{"success": True}, {"success": True}]))
+    results = await run_import(api, 2)
+    assert api.sent == [["0", "1"], ["0", "1"]]
+    # Retried here only, not again inside the API client
+    assert api.retries == [0, 0]
+    assert statuses(results) == {"0": "success", "1": "success"}
+
+
+async def test_unopened_connections_are_retried():
+    api = FakeApi(httpx.ConnectError("refused"), (200, [{"success": True}]))
+    assert statuses(await run_import(api, 1)) == {"0": "success"}
+
+
+async def test_transport_errors_are_unknown():
+    api = FakeApi(httpx.ReadError("reset"))
+    assert statuses(await run_import(api, 2)) == {"0": "unknown", "1": "unknown"}
+
+
+async def test_every_listing_reported_once_across_chunks():
+    api = FakeApi(*[(200, [{"success": True}] * 2)] * 3)
+    results = await run_import(api, 5, chunk_size=2)
+    assert sorted(item["index"] for item in results if "index" in item) == [0, 1, 2, 3, 4]
+    assert results[-1]["summary"]["success"] == 5
+
+
+async def test_rejected_token_is_renewed_once_for_the_whole_import():
+    renewals = []
+
+    async def refresh():
+        renewals.append(1)
+        return "renewed"
+
+    api = FakeApi((401, {}), (200, [{"success": True}] * 2), (200, [{"success": True}] * 2))
+    results = await run_import(api, 4, chunk_size=2, refresh=refresh)
+    assert renewals == [1]
+    assert api.tokens == ["token", "renewed", "renewed"]
+    assert results[-1]["summary"]["success"] == 4
+
+
+async def test_a_renewed_token_rejected_again_fails_the_chunk():
+    async def refresh():
+        return "renewed"
+
+    api = FakeApi((401, {}), (401, {}), (401, {}))
+    results = await run_import(api, 4, chunk_size=2, refresh=refresh)
+    assert api.tokens == ["token", "renewed", "renewed"]
+    assert results[-1]["summary"]["error"] == 4
@@ -0,0 +1,73 @@
+import datetime
+import uuid
+from datetime import timezone
+from auth_state_cache import AuthStateCache
+from fakes import FakeCollection
+
+MASTER = "channel.manager"
+
+
+class FakeBeds24:
+    """Server-side sessions keyed by PHPSESSID, each with its active account."""
+
+    def __init__(self):
+        self.sessions = {}
+
+    def visit(self, cookies: dict):
+        # A persistent login cookie without a server session starts a fresh one
+        if cookies.get("PHPSESSID") not in self.sessions and cookies.get("b24login") == "valid":
+            cookies["PHPSESSID"] = uuid.uuid4().hex
+            self.sessions[cookies["PHPSESSID"]] = MASTER
+        return self.sessions.get(cookies.get("PHPSESSID"))
+
+    def switch_user(self, cookies: dict, account: str):
+        self.sessions[cookies["PHPSESSID"]] = account
+
+
+def captured_login(phpsessid: str) -> dict:
+    return {
+        "cookies": [
+            {"name": "PHPSESSID", "value": phpsessid, "domain": "beds24.com", "expires": -1},
+            {"name": "b24login", "value": "valid", "domain": "beds24.com", "expires": 4102444800},
+        ],
+        "origins": []
+    }
+
+
+def jar(storage_state: dict) -> dict:
+    return {cookie["name"]: cookie["value"] for cookie in storage_state["cookies"]}
+
+
+async def test_replayed_sessions_stay_isolated_after_switch(collection):
+    server = FakeBeds24()
+    login = {"b24login": "valid"}
+    server.visit(login)
+    cache = AuthStateCache(collection)
+    await cache.put(MASTER, captured_login(login["PHPSESSID"]))
+
+    first = jar(await cache.get(MASTER))
+    second = jar(await cache.get(MASTER))
+    assert server.visit(first) == MASTER
+    assert server.visit(second) == MASTER
+    assert first["PHPSESSID"] != second["PHPSESSID"]
+
+    server.switch_user(first, "client-account")
+    assert server.visit(first) == "client-account"
+    assert server.visit(second) == MASTER
+
+
+async def test_stored_state_has_no_server_session_cookie(collection):
+    await AuthStateCache(collection).put(MASTER, captured_login("abc"))
+    (_, _, update), = collection.written("update_one")
+    assert [cookie["name"] for cookie in update["$set"]["storage_state"]["cookies"]] == ["b24login"]
+
+
+async def test_states_saved_with_a_server_session_cookie_are_cleaned_when_read(collection):
+    # Written before the cookie was stripped
+    collection.docs[MASTER] = {
+        "_id": MASTER,
+        "storage_state": captured_login("abc"),
+        "expires_at": datetime.datetime.now(timezone.utc) + datetime.timedelta(hours=1)
+    }
+    state = await AuthStateCache(collection).get(MASTER)
+    assert [cookie["name"] for cookie in state["cookies"]] == ["b24login"]
@@ -0,0 +1,78 @@
+import asyncio
+from browser_pool import BrowserPool
+
+
+class FakeBrowser:
+    def on(self, event, handler):
+        pass
+
+    def is_connected(self):
+        return True
+
+    async def new_context(self, **kwargs):
+        return FakeContext()
+
+    async def close(self):
+        pass
+
+
+class FakeContext:
+    def on(self, event, handler):
+        pass
+
+    async def close(self):
+        pass
+
+
+class FakeChromium:
+    """Launches complete immediately until `hold` is cleared."""
+
+    def __init__(self):
+        self.hold = asyncio.Event()
+        self.hold.set()
+        self.launches = 0
+
+    async def launch(self, **kwargs):
+        self.launches += 1
+        await self.hold.wait()
+        return FakeBrowser()
+
+
+def pool_with(chromium: FakeChromium, **kwargs) -> BrowserPool:
+    pool = BrowserPool(**kwargs)
+    pool.playwright = type("FakePlaywright", (), {"chromium": chromium})()
+    return pool
+
+
+async def test_launch_does_not_block_placement_on_running_browsers():
+    chromium = FakeChromium()
+    pool = pool_with(chromium, size=2, max_contexts=1)
+    running, context = await pool.new_context()
+
+    # The running browser is full, the next placement launches a second one
+    chromium.hold.clear()
+    launching = asyncio.create_task(pool.new_context())
+    await asyncio.sleep(0)
+    assert chromium.launches == 2
+
+    # A slot frees up on the running browser while Chromium is still starting
+    await pool.release(context)
+    browser, _ = await asyncio.wait_for(pool.new_context(), 1)
+    assert browser is running and not launching.done()
+
+    chromium.hold.set()
+    browser, _ = await launching
+    assert browser is not running and chromium.launches == 2
+    assert [entry["contexts"] for entry in pool.stats()["browsers"]] == [1, 1]
+
+
+async def test_placement_waits_for_a_launch_in_progress():
+    chromium = FakeChromium()
+    chromium.hold.clear()
+    pool = pool_with(chromium, size=1, max_contexts=2)
+    first = asyncio.create_task(pool.new_context())
+    second = asyncio.create_task(pool.new_context())
+    await asyncio.sleep(0)
+    chromium.hold.set()
+    (browser, _), (other, _) = await asyncio.gather(first, second)
+    assert browser is other and chromium.launches == 1
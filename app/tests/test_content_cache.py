@@ -0,0 +1,69 @@
+from content_cache import ContentCache, no_cache
+
+
+async def test_local_cache_hits_until_invalidated():
+    cache = ContentCache()
+    assert await cache.get("acc", "airbnb", "1", "room") is None
+    await cache.put("acc", "airbnb", "1", "room", {"name": "A"})
+    await cache.put("acc", "airbnb", "1", "view", {"tables": {}})
+    assert await cache.get("acc", "airbnb", "1", "room") == {"name": "A"}
+    # Another account never sees it
+    assert await cache.get("other", "airbnb", "1", "room") is None
+    await cache.invalidate("acc", "airbnb", "1")
+    assert await cache.get("acc", "airbnb", "1", "room") is None
+    assert await cache.get("acc", "airbnb", "1", "view") is None
+
+
+async def test_local_cache_expires():
+    cache = ContentCache(ttl=0)
+    await cache.put("acc", "airbnb", "1", "room", {})
+    assert await cache.get("acc", "airbnb", "1", "room") is None
+
+
+async def test_local_cache_evicts_least_recently_used():
+    cache = ContentCache(size=2)
+    for room in ("1", "2"):
+        await cache.put("acc", "airbnb", room, "room", room)
+    await cache.get("acc", "airbnb", "1", "room")
+    await cache.put("acc", "airbnb", "3", "room", "3")
+    assert await cache.get("acc", "airbnb", "2", "room") is None
+    assert await cache.get("acc", "airbnb", "1", "room") == "1"
+
+
+async def test_shared_cache_invalidation_reaches_every_worker(collection):
+    first, second = ContentCache(collection), ContentCache(collection)
+    await first.put("acc", "bookingcom", "7", "room", {"name": "old"})
+    assert await second.get("acc", "bookingcom", "7", "room") == {"name": "old"}
+    await first.invalidate("acc", "bookingcom", "7")
+    assert await second.get("acc", "bookingcom", "7", "room") is None
+
+
+def test_no_cache_directives():
+    assert no_cache("no-cache")
+    assert no_cache("max-age=0, private")
+    assert not no_cache("max-age=60")
+    assert not no_cache(None)
+
+
+async def test_a_read_started_before_an_invalidation_is_not_cached():
+    cache = ContentCache()
+    generation = await cache.generation("acc", "airbnb", "1")
+    await cache.invalidate("acc", "airbnb", "1")
+    await cache.put("acc", "airbnb", "1", "room", {"name": "old"}, generation)
+    assert await cache.get("acc", "airbnb", "1", "room") is None
+    # A read started after it is
+    generation = await cache.generation("acc", "airbnb", "1")
+    await cache.put("acc", "airbnb", "1", "room", {"name": "new"}, generation)
+    assert await cache.get("acc", "airbnb", "1", "room") == {"name": "new"}
+
+
+async def test_shared_cache_drops_puts_from_before_another_workers_invalidation(collection):
+    first, second = ContentCache(collection), ContentCache(collection)
+    for invalidations in range(2):
+        generation = await first.generation("acc", "airbnb", "1")
+        await second.invalidate("acc", "airbnb", "1")
+        await first.put("acc", "airbnb", "1", "room", {"name": "old"}, generation)
+        assert await second.get("acc", "airbnb", "1", "room") is None
+    generation = await first.generation("acc", "airbnb", "1")
+    await first.put("acc", "airbnb", "1", "room", {"name": "new"}, generation)
+    assert await second.get("acc", "airbnb", "1", "room") == {"name": "new"}
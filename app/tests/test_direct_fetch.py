@@ -0,0 +1,72 @@
+import httpx
+from direct_fetch import DirectFetcher, logged_out
+
+VIEW_URL = "https://beds24.com/control3.php?pagetype=syncroniserairbnbview"
+
+
+def response(url: str, text: str) -> httpx.Response:
+    return httpx.Response(200, text=text, request=httpx.Request("GET", url))
+
+
+def test_login_page_counts_as_logged_out():
+    assert logged_out(response("https://beds24.com/control2.php", "<html></html>"))
+    assert logged_out(response(VIEW_URL, '<form><input name="username"><input type="password" name="loginpass"></form>'))
+    assert not logged_out(response(VIEW_URL, "<table></table>"))
+
+
+class FakeContext:
+    pages = []
+
+    def __init__(self, phpsessid: str, on_read=None):
+        self.phpsessid = phpsessid
+        self.on_read = on_read
+        self.reads = 0
+
+    async def cookies(self, url: str):
+        self.reads += 1
+        if self.on_read:
+            self.on_read()
+        return [{"name": "PHPSESSID", "value": self.phpsessid}]
+
+
+class FakeBeds24:
+    """Redirects the view once, rotating the session cookie, and records the cookies each page got."""
+
+    def __init__(self):
+        self.seen = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        cookie = request.headers.get("cookie", "")
+        if request.url.params.get("step") != "2":
+            return httpx.Response(
+                302,
+                headers={"Location": f"{VIEW_URL}&step=2", "Set-Cookie": f"{cookie.replace('PHPSESSID=', 'PHPSESSID=rotated-')}; Path=/"}
+            )
+        self.seen.append(cookie)
+        return httpx.Response(200, text="<table></table>")
+
+
+async def extract(html: str):
+    return {"html": html}
+
+
+async def test_redirects_never_carry_another_sessions_cookies():
+    server = FakeBeds24()
+    fetcher = DirectFetcher(transport=httpx.MockTransport(server.handle))
+    for session_id in ("b", "a", "b"):
+        assert await fetcher.get(session_id, FakeContext(f"sess-{session_id}"), VIEW_URL, "view", extract)
+    await fetcher.close()
+    assert server.seen == ["PHPSESSID=sess-b", "PHPSESSID=sess-a", "PHPSESSID=sess-b"]
+
+
+async def test_cookies_read_across_a_forget_are_read_again():
+    server = FakeBeds24()
+    fetcher = DirectFetcher(transport=httpx.MockTransport(server.handle))
+    # The session switches accounts while its cookies are read
+    context = FakeContext("sess", on_read=lambda: fetcher.forget("s1"))
+    await fetcher.get("s1", context, VIEW_URL, "view", extract)
+    context.on_read = None
+    await fetcher.get("s1", context, VIEW_URL, "view", extract)
+    await fetcher.get("s1", context, VIEW_URL, "view", extract)
+    await fetcher.close()
+    assert context.reads == 2
@@ -0,0 +1,82 @@
+import asyncio
+import datetime
+from datetime import timezone
+import expiry_scheduler
+from expiry_scheduler import ExpiryScheduler
+
+TTL = datetime.timedelta(seconds=60)
+
+
+def ago(seconds: float) -> datetime.datetime:
+    return datetime.datetime.now(timezone.utc) - TTL - datetime.timedelta(seconds=seconds)
+
+
+class Sessions:
+    def __init__(self, busy=()):
+        self.busy = set(busy)
+        self.expired = []
+
+    async def expire(self, session_id: str):
+        self.expired.append(session_id)
+
+    def scheduler(self) -> ExpiryScheduler:
+        return ExpiryScheduler(
+            self.expire, self.expire, is_busy=lambda session_id: session_id in self.busy,
+            evictable=lambda session_id: True, ttl=TTL
+        )
+
+
+async def run_briefly(expiry: ExpiryScheduler, seconds: float = 0.05):
+    expiry.start()
+    await asyncio.sleep(seconds)
+    await expiry.stop()
+
+
+async def test_sessions_expire_once_in_deadline_order():
+    sessions = Sessions()
+    expiry = sessions.scheduler()
+    for seconds, session_id in ((30, "b"), (50, "a"), (10, "c")):
+        expiry.touch(session_id, ago(seconds))
+    expiry.touch("fresh")
+    await run_briefly(expiry)
+    assert sessions.expired == ["a", "b", "c"]
+
+
+async def test_touch_and_forget_supersede_older_deadlines():
+    sessions = Sessions()
+    expiry = sessions.scheduler()
+    expiry.touch("touched", ago(10))
+    expiry.touch("touched")
+    expiry.touch("forgotten", ago(10))
+    expiry.forget("forgotten")
+    # Mongo's naive UTC datetimes count as UTC
+    expiry.touch("naive", ago(10).replace(tzinfo=None))
+    for _ in range(500):
+        expiry.touch("often", ago(10))
+    await run_briefly(expiry)
+    assert sorted(sessions.expired) == ["naive", "often"]
+
+
+async def test_a_deadline_set_while_running_wakes_the_scheduler():
+    sessions = Sessions()
+    expiry = sessions.scheduler()
+    expiry.start()
+    await asyncio.sleep(0.01)
+    expiry.touch("late", ago(1))
+    await asyncio.sleep(0.05)
+    await expiry.stop()
+    assert sessions.expired == ["late"]
+
+
+async def test_busy_sessions_are_retried_later(monkeypatch):
+    monkeypatch.setattr(expiry_scheduler, "SESSION_EXPIRY_BUSY_RETRY", 0.05)
+    sessions = Sessions(busy={"busy"})
+    expiry = sessions.scheduler()
+    expiry.touch("busy", ago(10))
+    expiry.start()
+    await asyncio.sleep(0.02)
+    assert sessions.expired == []
+    sessions.busy.clear()
+    await asyncio.sleep(0.1)
+    await expiry.stop()
+    assert sessions.expired == ["busy"]
@@ -0,0 +1,26 @@
+import os
+import sys
+import pytest
+import html_tables
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from fixtures import AIRBNB_VIEW_TABLES, fixture_pages  # noqa: E402
+
+
+@pytest.mark.parametrize("page_name", sorted(fixture_pages()))
+def test_backends_extract_the_same_tables(page_name):
+    page = fixture_pages()[page_name]
+    results = {name: html_tables.extract_tables(page, AIRBNB_VIEW_TABLES, name) for name in html_tables.BACKENDS}
+    expected = results.pop("lxml")
+    assert set(expected) == set(AIRBNB_VIEW_TABLES)
+    assert all(result == expected for result in results.values())
+
+
+def test_header_and_short_rows_are_skipped():
+    page = (
+        "<html><body><table><tr><td>Setting</td><td>Beds24</td><td>Airbnb</td></tr>"
+        "<tr><td> Name </td><td>x</td><td> Flat </td></tr><tr><td>Only</td><td>two</td></tr></table></body></html>"
+    )
+    for name in html_tables.BACKENDS:
+        assert html_tables.extract_tables(page, {"t": "table"}, name) == {"t": {"Name": "Flat"}}
@@ -0,0 +1,74 @@
+import asyncio
+import datetime
+from contextlib import asynccontextmanager
+from datetime import timezone
+import pytest
+from fastapi import HTTPException
+import jobs
+from jobs import JobManager, webhook_allowed
+
+
+async def succeed():
+    return {"status": "success"}
+
+
+async def status(manager: JobManager, job: dict) -> str:
+    return (await manager.get(job["job_id"]))["status"]
+
+
+async def test_job_waiting_on_its_session_holds_no_pool_slot(collection):
+    manager = JobManager(collection, workers=1)
+    await manager.start("w1", lambda: ())
+    session = asyncio.Lock()
+    await session.acquire()
+
+    @asynccontextmanager
+    async def session_slot():
+        async with session:
+            yield
+
+    queued = await manager.submit("modify", "acc1", succeed, session_slot=session_slot)
+    other = await manager.submit("modify", "acc2", succeed)
+    await asyncio.sleep(0.01)
+    assert await status(manager, other) == "succeeded"
+    assert await status(manager, queued) == "queued"
+    session.release()
+    await asyncio.sleep(0.01)
+    assert await status(manager, queued) == "succeeded"
+    await manager.stop()
+
+
+async def test_jobs_of_a_stopped_worker_are_failed(collection):
+    old = datetime.datetime.now(timezone.utc) - datetime.timedelta(seconds=2 * jobs.JOB_SWEEP_INTERVAL)
+    for job_id, worker, state, created_at in (
+        ("gone", "w0", "running", old),
+        ("live", "w2", "queued", old),
+        ("new", "w0", "queued", datetime.datetime.now(timezone.utc)),
+        ("done", "w0", "succeeded", old),
+    ):
+        await collection.insert_one(
+            {"_id": job_id, "kind": "modify", "worker": worker, "status": state, "created_at": created_at}
+        )
+    manager = JobManager(collection)
+    await manager.start("w1", lambda: {"w1", "w2"})
+    await manager.fail_orphans()
+    await manager.stop()
+    states = {job_id: await status(manager, {"job_id": job_id}) for job_id in ("gone", "live", "new", "done")}
+    assert states == {"gone": "failed", "live": "queued", "new": "queued", "done": "succeeded"}
+
+
+def test_webhook_destinations_are_allowlisted(monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_WEBHOOK_HOSTS", ["hooks.example.com"])
+    assert webhook_allowed("https://hooks.example.com/done")
+    assert webhook_allowed("https://eu.hooks.example.com/done")
+    assert not webhook_allowed("http://hooks.example.com/done")
+    assert not webhook_allowed("https://hooks.example.com.evil.io/done")
+    assert not webhook_allowed("https://169.254.169.254/latest/meta-data")
+
+
+async def test_jobs_with_a_disallowed_webhook_are_refused(collection):
+    manager = JobManager(collection)
+    with pytest.raises(HTTPException) as error:
+        await manager.submit("modify", "acc", succeed, webhook_url="https://localhost/")
+    assert error.value.status_code == 400
+    assert collection.writes == []
@@ -0,0 +1,11 @@
+import loop_monitor
+from html_tables import extract_tables
+
+
+async def test_pools_work_again_after_a_shutdown():
+    for _ in range(2):
+        # One lifespan, as the app runs it on each start
+        loop_monitor.start_executors()
+        assert await loop_monitor.run_blocking(sum, [1, 2]) == 3
+        assert await loop_monitor.run_cpu(extract_tables, "<table></table>", {}) == {}
+        loop_monitor.shutdown_executors()
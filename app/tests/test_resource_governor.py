@@ -0,0 +1,56 @@
+import asyncio
+import resource_governor
+from resource_governor import ResourceGovernor
+
+
+class FakeCdp:
+    def __init__(self):
+        self.detached = False
+
+    async def send(self, method: str):
+        return {"totalSize": 1024}
+
+    async def detach(self):
+        self.detached = True
+
+
+class FakeContext:
+    def __init__(self):
+        self.sessions = []
+
+    async def new_cdp_session(self, page):
+        self.sessions.append(FakeCdp())
+        return self.sessions[-1]
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+
+
+async def test_page_cdp_sessions_are_detached_when_replaced_or_forgotten(monkeypatch):
+    monkeypatch.setattr(resource_governor, "host_memory", lambda: (0, 1))
+    context = FakeContext()
+    sessions = {"s1": FakePage(context)}
+    governor = ResourceGovernor(
+        browsers=lambda: [],
+        sessions=lambda: [(session_id, None, page) for session_id, page in sessions.items()],
+        recycle=None,
+        is_busy=lambda session_id: False
+    )
+    await governor.sample()
+    await governor.sample()
+    assert len(context.sessions) == 1
+
+    sessions["s1"] = FakePage(context)
+    await governor.sample()
+    await asyncio.sleep(0)
+    first, second = context.sessions
+    assert first.detached and not second.detached
+
+    governor.forget("s1")
+    await asyncio.sleep(0)
+    assert second.detached
+    # Measured through a new CDP session from then on
+    await governor.sample()
+    assert len(context.sessions) == 3
@@ -0,0 +1,96 @@
+import asyncio
+from session_store import SessionStateStore
+from fakes import FakeCollection
+
+
+async def test_updates_coalesce_and_unchanged_fields_are_not_rewritten(collection):
+    store = SessionStateStore(collection, flush_interval=0)
+    store.update("s1", url="a", in_use=True)
+    store.update("s1", url="b")
+    store.update("s2", url="c")
+    await store.flush()
+    assert [(kind, query) for kind, query, _ in collection.writes] == [("UpdateOne", {"_id": "s1"}), ("UpdateOne", {"_id": "s2"})]
+    assert collection.docs["s1"] == {"_id": "s1", "url": "b", "in_use": True}
+
+    store.update("s1", url="b", in_use=True)
+    await store.close()
+    assert len(collection.writes) == 2
+
+
+async def test_update_after_delete_rewrites_the_document(collection):
+    store = SessionStateStore(collection, flush_interval=0)
+    store.update("s1", url="a", storage_state={"cookies": []})
+    await store.flush()
+    store.delete("s1")
+    store.update("s1", last_access=1)
+    await store.close()
+    assert collection.docs["s1"] == {"_id": "s1", "last_access": 1}
+
+
+async def test_failed_flush_is_requeued_under_newer_changes(collection):
+    collection.fail_writes = 1
+    store = SessionStateStore(collection, flush_interval=0)
+    store.update("s1", url="a", in_use=True)
+    store.update("s2", url="x")
+    await store.flush()
+    assert collection.docs == {}
+    store.update("s1", url="b")
+    store.delete("s2")
+    await store.close()
+    assert collection.docs == {"s1": {"_id": "s1", "url": "b", "in_use": True}}
+
+
+async def test_ended_sessions_are_written_again_from_scratch(collection):
+    store = SessionStateStore(collection, flush_interval=0)
+    store.update("s1", url="a", in_use=True)
+    await store.flush()
+    store.update("s1", unset=("url",), in_use=False)
+    await store.flush()
+    # Nothing is remembered of the ended session, so the same value is written again
+    store.update("s1", in_use=False)
+    await store.close()
+    _, _, update = collection.writes[-1]
+    assert update == {"$set": {"in_use": False}}
+    assert len(collection.writes) == 3
+
+
+class SlowFailingCollection(FakeCollection):
+    """The first bulk_write hangs until released, then fails."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = asyncio.Event()
+        self.calls = 0
+
+    async def bulk_write(self, operations, ordered: bool = True):
+        self.calls += 1
+        if self.calls == 1:
+            await self.release.wait()
+            raise RuntimeError("write failed")
+        await super().bulk_write(operations, ordered)
+
+
+async def test_a_failed_flush_never_overwrites_a_newer_one():
+    collection = SlowFailingCollection()
+    store = SessionStateStore(collection, flush_interval=0)
+    store.update("s1", x=1)
+    first = asyncio.create_task(store.flush())
+    await asyncio.sleep(0)
+    store.update("s1", x=2)
+    second = asyncio.create_task(store.flush())
+    await asyncio.sleep(0)
+    collection.release.set()
+    await asyncio.gather(first, second)
+    await store.close()
+    assert collection.docs["s1"] == {"_id": "s1", "x": 2}
+
+
+async def test_updates_during_a_scheduled_write_are_flushed_after_it(collection):
+    store = SessionStateStore(collection, flush_interval=0.01)
+    store.update("s1", x=1)
+    await asyncio.sleep(0.02)
+    store.update("s1", x=2)
+    await asyncio.sleep(0.05)
+    assert collection.docs["s1"] == {"_id": "s1", "x": 2}
+    assert len(collection.written("UpdateOne")) == 2
+    await store.close()
@@ -0,0 +1,62 @@
+import asyncio
+import pytest
+from token_manager import ACCESS_TOKEN_REFRESH_MARGIN, TokenManager
+
+
+class FakeAuth:
+    """Hands out access-1, access-2, ... valid for `expires_in` seconds."""
+
+    def __init__(self, expires_in: float = 86400, fail_first: bool = False):
+        self.expires_in = expires_in
+        self.fail_first = fail_first
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def fetch_token(self, refresh_token: str) -> dict:
+        self.calls += 1
+        await self.release.wait()
+        if self.fail_first and self.calls == 1:
+            raise RuntimeError("Beds24 unavailable")
+        return {"token": f"access-{self.calls}", "expiresIn": self.expires_in}
+
+
+async def test_concurrent_misses_share_one_refresh(collection):
+    auth = FakeAuth()
+    auth.release.clear()
+    manager = TokenManager(collection, auth.fetch_token)
+    waiting = [asyncio.create_task(manager.get("refresh")) for _ in range(10)]
+    await asyncio.sleep(0)
+    auth.release.set()
+    assert await asyncio.gather(*waiting) == ["access-1"] * 10
+    assert auth.calls == 1
+    # Cached from now on, in memory and for other workers in MongoDB
+    assert await manager.get("refresh") == "access-1"
+    assert await TokenManager(collection, auth.fetch_token).get("refresh") == "access-1"
+    assert auth.calls == 1
+    (_, query, _), = collection.written("update_one")
+    assert "refresh" not in str(query)
+
+
+async def test_token_near_expiry_is_served_while_refreshed_behind_it(collection):
+    auth = FakeAuth(expires_in=1.5 * ACCESS_TOKEN_REFRESH_MARGIN.total_seconds())
+    manager = TokenManager(collection, auth.fetch_token)
+    assert await manager.get("refresh") == "access-1"
+    assert await manager.get("refresh") == "access-1"
+    await asyncio.sleep(0)
+    assert auth.calls == 2
+    assert await manager.get("refresh") == "access-2"
+
+
+async def test_expired_tokens_are_refreshed_before_use(collection):
+    auth = FakeAuth(expires_in=1)
+    manager = TokenManager(collection, auth.fetch_token)
+    assert [await manager.get("refresh") for _ in range(3)] == ["access-1", "access-2", "access-3"]
+
+
+async def test_a_failed_refresh_is_not_shared_with_later_callers(collection):
+    auth = FakeAuth(fail_first=True)
+    manager = TokenManager(collection, auth.fetch_token)
+    with pytest.raises(RuntimeError):
+        await manager.get("refresh")
+    assert await manager.get("refresh") == "access-2"
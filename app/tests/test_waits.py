@@ -0,0 +1,20 @@
+from types import SimpleNamespace
+import pytest
+import waits
+
+
+def response(url: str, method: str = "POST", resource_type: str = "xhr"):
+    return SimpleNamespace(url=url, request=SimpleNamespace(method=method, resource_type=resource_type))
+
+
+def test_xhr_only_matches_its_endpoint():
+    matches = waits.xhr("beds24.com/control3.php?pagetype=apiv2")
+    assert matches(response("https://beds24.com/control3.php?pagetype=apiv2&ajax=1"))
+    assert not matches(response("https://beds24.com/control3.php?pagetype=bookings"))
+    assert not matches(response("https://beds24.com/control3.php?pagetype=apiv2", method="GET"))
+    assert not matches(response("https://beds24.com/control3.php?pagetype=apiv2", resource_type="document"))
+
+
+def test_xhr_without_an_endpoint_is_refused():
+    with pytest.raises(ValueError):
+        waits.xhr("")
@@ -0,0 +1,109 @@
+import asyncio
+import datetime
+import hashlib
+import os
+from collections import OrderedDict
+from datetime import timezone
+from typing import Awaitable, Callable
+import metrics
+
+ACCESS_TOKEN_CACHE_SIZE = int(os.environ.get("ACCESS_TOKEN_CACHE_SIZE", "1000"))
+# Tokens closer than this to expiry are refreshed before use; within twice
+# this window the cached token is still served while a refresh runs behind it.
+ACCESS_TOKEN_REFRESH_MARGIN = datetime.timedelta(seconds=float(os.environ.get("ACCESS_TOKEN_REFRESH_MARGIN", "300")))
+# Beds24 documents 24h access tokens, used when a response omits expiresIn
+ACCESS_TOKEN_DEFAULT_TTL = 86400
+
+
+class TokenManager:
+    """
+    Access tokens per refresh token: an in-process LRU backed by MongoDB so
+    every worker shares them, with single-flight refreshes.
+
+    `fetch_token` performs the actual /authentication/token call and returns
+    its JSON body ({"token": ..., "expiresIn": ...}).
+    """
+
+    def __init__(self, collection, fetch_token: Callable[[str], Awaitable[dict]], size: int = ACCESS_TOKEN_CACHE_SIZE):
+        self.collection = collection
+        self.fetch_token = fetch_token
+        self.size = size
+        self._tokens = OrderedDict()
+        self._inflight = {}
+
+    @staticmethod
+    def _key(refresh_token: str) -> str:
+        # Never persist the refresh token itself
+        return hashlib.sha256(refresh_token.encode()).hexdigest()
+
+    def _remember(self, key: str, token: str, expires_at: datetime.datetime):
+        self._tokens[key] = (token, expires_at)
+        self._tokens.move_to_end(key)
+        while len(self._tokens) > self.size:
+            self._tokens.popitem(last=False)
+
+    def _usable(self, entry, margin: datetime.timedelta) -> bool:
+        return entry is not None and entry[1] - margin > datetime.datetime.now(timezone.utc)
+
+    async def get(self, refresh_token: str) -> str:
+        key = self._key(refresh_token)
+        entry = self._tokens.get(key)
+        if entry is None:
+            try:
+                doc = await self.collection.find_one({"_id": key})
+            except Exception as e:
+                print(f"Error reading cached access token: {e}")
+                doc = None
+            if doc and doc.get("access_token"):
+                entry = (doc["access_token"], doc["expires_at"].replace(tzinfo=timezone.utc))
+                self._remember(key, *entry)
+        else:
+            self._tokens.move_to_end(key)
+        if self._usable(entry, ACCESS_TOKEN_REFRESH_MARGIN):
+            metrics.counter("access_token_cache_hits").inc()
+            if not self._usable(entry, 2 * ACCESS_TOKEN_REFRESH_MARGIN):
+                self._refresh(key, refresh_token)
+            return entry[0]
+        metrics.counter("access_token_cache_misses").inc()
+        return await asyncio.shield(self._refresh(key, refresh_token))
+
+    def _refresh(self, key: str, refresh_token: str) -> asyncio.Task:
+        # Concurrent callers for the same account share one refresh
+        task = self._inflight.get(key)
+        # A finished task stays listed until its callbacks run, its token may be the stale one
+        if task is None or task.done():
+            task = asyncio.create_task(self._fetch(key, refresh_token))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._inflight.get(key) is done and self._inflight.pop(key))
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        return task
+
+    async def _fetch(self, key: str, refresh_token: str) -> str:
+        metrics.counter("access_token_refreshes").inc()
+        data = await self.fetch_token(refresh_token)
+        token = data.get("token")
+        expires_at = datetime.datetime.now(timezone.utc) + datetime.timedelta(
+            seconds=data.get("expiresIn") or ACCESS_TOKEN_DEFAULT_TTL
+        )
+        self._remember(key, token, expires_at)
+        try:
+            await self.collection.update_one(
+                {"_id": key},
+                {"$set": {
+                    "access_token": token,
+                    "expires_at": expires_at,
+                    "updated_at": datetime.datetime.now(timezone.utc)
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            print(f"Error saving access token: {e}")
+        return token
+
+    async def invalidate(self, refresh_token: str):
+        key = self._key(refresh_token)
+        self._tokens.pop(key, None)
+        try:
+            await self.collection.update_one({"_id": key}, {"$unset": {"access_token": "", "expires_at": ""}})
+        except Exception as e:
+            print(f"Error invalidating access token: {e}")
@@ -0,0 +1,129 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+import metrics
+
+# Upper bound for any completion signal, overridable per flow with
+# WAIT_TIMEOUT_<FLOW>_MS (e.g. WAIT_TIMEOUT_CHANNEL_PUSH_MS=20000)
+WAIT_TIMEOUT_MS = int(os.environ.get("WAIT_TIMEOUT_MS", "15000"))
+
+
+def flow_timeout(flow: str) -> int:
+    return int(os.environ.get(f"WAIT_TIMEOUT_{flow.upper()}_MS", WAIT_TIMEOUT_MS))
+
+
+def _record(flow: str, legacy_ms: int, start: float, timed_out: bool):
+    elapsed = (time.perf_counter() - start) * 1000
+    metrics.histogram(f"wait_ms.{flow}").observe(elapsed)
+    metrics.counter(f"wait_legacy_ms.{flow}").inc(legacy_ms)
+    metrics.counter(f"wait_saved_ms.{flow}").inc(round(legacy_ms - elapsed))
+    if timed_out:
+        metrics.counter(f"wait_timeouts.{flow}").inc()
+        print(f"Wait for flow {flow} hit its {flow_timeout(flow)} ms bound, continuing")
+
+
+# Conditions take the flow timeout in ms and return an awaitable
+def selector(page, css: str, state: str = "attached"):
+    return lambda timeout: page.wait_for_selector(css, state=state, timeout=timeout)
+
+
+def network_idle(page):
+    # Only meaningful right after a navigation, an already loaded page resolves at once
+    return lambda timeout: page.wait_for_load_state("networkidle", timeout=timeout)
+
+
+def xhr(url_contains: str, method: str = "POST"):
+    """Response predicate for the XHR/fetch requests an in-page action sends."""
+    if not url_contains:
+        # Matching every XHR would let any unrelated request end the wait
+        raise ValueError("An XHR wait needs the endpoint it waits for")
+    def matches(response):
+        request = response.request
+        return (
+            request.resource_type in ("xhr", "fetch")
+            and request.method == method
+            and url_contains in response.url
+        )
+    return matches
+
+
+def url_changed_from(page, url: str):
+    return lambda timeout: page.wait_for_url(lambda current: current != url, timeout=timeout)
+
+
+async def settle(flow: str, legacy_ms: int, *conditions, any_of: bool = False):
+    """
+    Replaces a fixed `wait_for_timeout(legacy_ms)`: waits for all (or the
+    first, with any_of) of the completion signals, bounded by the flow timeout.
+    Hitting the bound is logged and counted but not raised, like the old sleep.
+    """
+    timeout = flow_timeout(flow)
+    start = time.perf_counter()
+    deadline = time.monotonic() + timeout / 1000
+    pending = {asyncio.ensure_future(condition(timeout)) for condition in conditions}
+    tasks = set(pending)
+    satisfied = 0
+    try:
+        while pending and (satisfied == 0 or not any_of):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            satisfied += sum(1 for task in done if task.exception() is None)
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()
+        _record(flow, legacy_ms, start, satisfied == 0 if any_of else satisfied < len(tasks))
+
+
+class NavigationOutcome:
+    # Set once the wrapped block exits: True when the page never navigated
+    timed_out = False
+
+
+@asynccontextmanager
+async def navigation(page, flow: str, legacy_ms: int):
+    """
+    Wraps an action (click, select) that triggers a page navigation. The
+    yielded outcome tells afterwards whether the navigation actually happened.
+    """
+    timeout = flow_timeout(flow)
+    start = time.perf_counter()
+    outcome = NavigationOutcome()
+    action_done = False
+    try:
+        async with page.expect_navigation(wait_until="domcontentloaded", timeout=timeout):
+            yield outcome
+            action_done = True
+    except PlaywrightTimeoutError:
+        # Only a navigation that never came is tolerated, not a failing action
+        if not action_done:
+            raise
+        outcome.timed_out = True
+    finally:
+        _record(flow, legacy_ms, start, outcome.timed_out)
+
+
+@asynccontextmanager
+async def response(page, flow: str, legacy_ms: int, predicate):
+    """Wraps an action (click) that sends an XHR, until its response body has arrived."""
+    timeout = flow_timeout(flow)
+    start = time.perf_counter()
+    timed_out = False
+    action_done = False
+    try:
+        async with page.expect_response(predicate, timeout=timeout) as response_info:
+            yield
+            action_done = True
+        await (await response_info.value).finished()
+    except PlaywrightTimeoutError:
+        if not action_done:
+            raise
+        timed_out = True
+    finally:
+        _record(flow, legacy_ms, start, timed_out)
@@ -0,0 +1,110 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+import metrics
+
+# Number of authenticated master-account sessions kept ready, and the minimum
+# delay between two refill logins so we don't hammer the captcha solver/OTP inbox.
+WARM_POOL_SIZE = int(os.environ.get("WARM_POOL_SIZE", "2"))
+WARM_POOL_REFILL_INTERVAL = float(os.environ.get("WARM_POOL_REFILL_INTERVAL", "5"))
+WARM_POOL_CHECK_INTERVAL = float(os.environ.get("WARM_POOL_CHECK_INTERVAL", "60"))
+
+
+class WarmSessionPool:
+    """
+    Keeps authenticated sessions ready so /generate_session can hand one out
+    instead of running the whole login flow inside the request.
+
+    `create_session` returns (session_id, authentication result) or None when
+    the login failed; `is_alive` tells whether a ready session still exists.
+    """
+
+    def __init__(
+        self,
+        create_session: Callable[[], Awaitable[Optional[tuple]]],
+        is_alive: Callable[[str], bool],
+        size: int = WARM_POOL_SIZE,
+        refill_interval: float = WARM_POOL_REFILL_INTERVAL
+    ):
+        self.create_session = create_session
+        self.is_alive = is_alive
+        self.size = size
+        self.refill_interval = refill_interval
+        self._ready = deque()
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        if self.size > 0 and self._task is None:
+            self._task = asyncio.create_task(self._refill_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _prune(self):
+        alive = [entry for entry in self._ready if self.is_alive(entry[0])]
+        if len(alive) != len(self._ready):
+            metrics.counter("warm_pool_expired").inc(len(self._ready) - len(alive))
+            self._ready = deque(alive)
+        metrics.gauge("warm_pool_ready").set(len(self._ready))
+
+    async def _refill_loop(self):
+        while True:
+            self._prune()
+            while len(self._ready) < self.size:
+                start = time.perf_counter()
+                try:
+                    created = await self.create_session()
+                except Exception as e:
+                    print(f"Error refilling warm session pool: {e}")
+                    created = None
+                metrics.histogram("warm_pool_refill_ms").observe((time.perf_counter() - start) * 1000)
+                if created:
+                    self._ready.append(created)
+                    metrics.counter("warm_pool_refills").inc()
+                else:
+                    metrics.counter("warm_pool_refill_failures").inc()
+                metrics.gauge("warm_pool_ready").set(len(self._ready))
+                await asyncio.sleep(self.refill_interval)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=WARM_POOL_CHECK_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def acquire(self) -> Optional[tuple]:
+        self._prune()
+        entry = self._ready.popleft() if self._ready else None
+        if entry:
+            metrics.counter("warm_pool_hits").inc()
+        else:
+            metrics.counter("warm_pool_misses").inc()
+        metrics.gauge("warm_pool_ready").set(len(self._ready))
+        self._wakeup.set()
+        return entry
+
+    def owns(self, session_id: str) -> bool:
+        return any(entry[0] == session_id for entry in self._ready)
+
+    def stats(self) -> dict:
+        hits = metrics.counter("warm_pool_hits").value
+        misses = metrics.counter("warm_pool_misses").value
+        return {
+            "target_size": self.size,
+            "ready": len(self._ready),
+            "refill_interval": self.refill_interval,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / (hits + misses), 3) if hits + misses else None,
+            "refills": metrics.counter("warm_pool_refills").value,
+            "refill_failures": metrics.counter("warm_pool_refill_failures").value,
+            "refill_ms": metrics.histogram("warm_pool_refill_ms").snapshot()
+        }